@@ -8,14 +8,21 @@ and OAuth support.
 import markupsafe
 from flask import Flask
 from flask_login import LoginManager
-from flask_migrate import Migrate
 
 from app.config import config
-from app.models import db
 
 
-def create_app(config_name=None):
-    """Application factory pattern"""
+def create_app(config_name=None, bootstrap=None):
+    """Application factory pattern.
+
+    The database schema and default user are only set up here when
+    ``bootstrap`` is true (default: the ``BOOTSTRAP_ON_STARTUP`` setting, which
+    is only on for testing configurations). Otherwise the schema comes from
+    ``flask db upgrade`` and the default user from ``manage.py bootstrap``.
+
+    Subsystems are imported here rather than with the package, so importing
+    ``app`` (e.g. for ``from app.models import ...``) stays cheap.
+    """
     app = Flask(__name__, template_folder="templates", static_folder="static")
 
     # Load configuration
@@ -23,15 +30,33 @@ def create_app(config_name=None):
         config_name = "default"
     app.config.from_object(config[config_name])
 
+    from app.assets import init_assets
+    from app.cache import init_response_cache
+    from app.cli import init_migrate
+    from app.database import init_database
+    from app.jobs import init_jobs
+    from app.metrics import init_metrics
+    from app.models import db
+    from app.passwords import init_password_hasher
+    from app.ratelimit import init_rate_limiter
+    from app.templating import init_templates, warm_templates
+
+    # Template bytecode cache; must precede any use of app.jinja_env
+    init_templates(app)
+
     # Initialize extensions
-    db.init_app(app)
-    migrate = Migrate(app, db)
+    init_database(app, db)
+    init_migrate(app, db)
+    init_response_cache(app)
+    init_password_hasher(app)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
     login_manager.login_message = "Please log in to access this page."
     login_manager.login_message_category = "info"
+    # API clients get a JSON 401 instead of a redirect to the login page
+    login_manager.blueprint_login_views = {"api": None}
 
     # Register custom template filters
     @app.template_filter("nl2br")
@@ -41,6 +66,9 @@ def create_app(config_name=None):
             return ""
         return markupsafe.Markup(text.replace("\n", "<br>"))
 
+    # asset_url() and the fingerprinted, far-future cached asset route
+    init_assets(app)
+
     # Import and register blueprints
     from app.api import api_bp
     from app.auth import auth_bp
@@ -50,18 +78,38 @@ def create_app(config_name=None):
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix="/api")
 
-    # Register user loader
-    from app.models import get_user_by_id
+    # Register user loader, resolving identities through the identity cache
+    from app.identity import init_identity_cache, user_identity_cache
+
+    init_identity_cache(app)
 
     @login_manager.user_loader
     def load_user(user_id):
-        return get_user_by_id(user_id)
+        return user_identity_cache().load(user_id)
 
-    # Initialize database and default user
-    with app.app_context():
-        db.create_all()
-        from app.models import init_default_user
+    # Request, SQL and template instrumentation for /api/metrics
+    init_metrics(app, db)
+
+    # Admission control for login, registration and search; registered after
+    # the metrics hooks so that rejected requests are still counted
+    init_rate_limiter(app)
+
+    # Background jobs for the work that follows thought writes
+    init_jobs(app)
 
-        init_default_user()
+    # Compile every template before the worker takes its first request
+    if app.config.get("TEMPLATE_WARMUP", False):
+        warm_templates(app)
+
+    # Initialize database and default user
+    if bootstrap is None:
+        bootstrap = app.config.get("BOOTSTRAP_ON_STARTUP", app.testing)
+    if bootstrap:
+        from app.models import bootstrap_database
+
+        with app.app_context():
+            admin_user = bootstrap_database()
+            if admin_user is not None:
+                print(f"Created default admin user: {admin_user.username}")
 
     return app
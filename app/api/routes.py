@@ -1,6 +1,70 @@
-from flask import jsonify, request
+import hmac
+
+from flask import Response, current_app, jsonify, request, stream_with_context, url_for
+from flask_login import current_user, login_required
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from wtforms.validators import ValidationError
 
 from app.api import api_bp
+from app.exporter import CONTENT_TYPES, EXPORT_FORMATS, export_filename, export_thoughts
+from app.importer import IMPORT_FORMATS, import_thoughts
+from app.metrics import metrics
+from app.models import (
+    THOUGHT_FIELDS,
+    create_thought,
+    delete_thought,
+    get_public_thoughts,
+    get_public_thoughts_by_tag,
+    get_thought_by_id,
+    get_thoughts_by_ids,
+    get_thoughts_by_tag,
+    get_top_tags,
+    get_user_stats,
+    get_user_thoughts,
+    search_thoughts,
+    thought_field_options,
+    update_thought,
+)
+
+MAX_PER_PAGE = 100
+MAX_BATCH_IDS = 100
+MAX_TAGS = 100
+MAX_STATS_DAYS = 366
+
+# Import body types; none of them can be sent cross-site without a preflight
+IMPORT_CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/json": "ndjson",
+    "text/csv": "csv",
+}
+
+
+class APIError(Exception):
+    """Error answered with a JSON body and an HTTP status code"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+@api_bp.errorhandler(APIError)
+def handle_api_error(error):
+    return jsonify({"message": error.message, "status": "error"}), error.status_code
+
+
+@api_bp.errorhandler(401)
+def handle_unauthorized(error):
+    return jsonify({"message": "Authentication required", "status": "error"}), 401
+
+
+@api_bp.errorhandler(429)
+def handle_too_many_requests(error):
+    return (
+        jsonify({"message": "Too many requests", "status": "error"}),
+        429,
+        {"Retry-After": str(error.retry_after)},
+    )
 
 
 @api_bp.route("/hello")
@@ -25,3 +89,354 @@ def data():
             "status": "success",
         }
     )
+
+
+@api_bp.route("/csrf-token")
+def csrf_token():
+    """CSRF token of the current session, for the ``X-CSRFToken`` header"""
+    return jsonify({"data": {"csrf_token": generate_csrf()}, "status": "success"})
+
+
+@api_bp.route("/metrics")
+def metrics_endpoint():
+    """Metrics of every worker process in Prometheus text format"""
+    registry = metrics()
+    if registry is None:
+        raise APIError("Metrics are disabled", 404)
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        raise APIError("Invalid metrics token", 401)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@api_bp.route("/thoughts/import", methods=["POST"])
+@login_required
+def import_thoughts_endpoint():
+    """Bulk import thoughts for the current user from an NDJSON or CSV body"""
+    if request.mimetype not in IMPORT_CONTENT_TYPES:
+        raise APIError(
+            "Content-Type must be application/x-ndjson, application/json or text/csv",
+            415,
+        )
+    if current_app.config.get("WTF_CSRF_ENABLED", True):
+        # The session cookie authenticates the request
+        try:
+            validate_csrf(request.headers.get("X-CSRFToken"))
+        except ValidationError:
+            raise APIError("Missing or invalid CSRF token") from None
+    fmt = request.args.get("format", IMPORT_CONTENT_TYPES[request.mimetype])
+    if fmt not in IMPORT_FORMATS:
+        raise APIError(f"Unsupported format: {fmt}")
+
+    result = import_thoughts(
+        current_user.id,
+        request.stream,
+        fmt,
+        batch_size=current_app.config.get("IMPORT_BATCH_SIZE", 500),
+    )
+    return jsonify(
+        {
+            "message": f"Imported {result.imported} thoughts",
+            "data": result.to_dict(),
+            "status": "success",
+        }
+    )
+
+
+@api_bp.route("/thoughts/export")
+@login_required
+def export_thoughts_endpoint():
+    """Stream the current user's thoughts as NDJSON or CSV, optionally gzipped"""
+    fmt = request.args.get("format", "ndjson")
+    compress = request.args.get("compress")
+    if fmt not in EXPORT_FORMATS or compress not in (None, "gzip"):
+        raise APIError("Unsupported export format")
+
+    chunks = export_thoughts(
+        current_user.id,
+        fmt,
+        compress=compress == "gzip",
+        batch_size=current_app.config.get("EXPORT_BATCH_SIZE", 1000),
+    )
+    filename = export_filename(fmt, compress == "gzip")
+    return Response(
+        stream_with_context(chunks),
+        mimetype="application/gzip" if compress else CONTENT_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# Thought resources
+def _requested_fields():
+    """Parse the ``fields`` query argument into a tuple of thought fields"""
+    raw = request.args.get("fields")
+    if not raw:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    unknown = [field for field in fields if field not in THOUGHT_FIELDS]
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _per_page():
+    per_page = request.args.get("per_page", 10, type=int)
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def _page_response(pagination, fields):
+    return jsonify(
+        {
+            "data": [thought.to_dict(fields) for thought in pagination.items],
+            "pagination": {
+                "per_page": pagination.per_page,
+                "total": pagination.total,
+                "has_next": pagination.has_next,
+                "has_prev": pagination.has_prev,
+                "next_cursor": pagination.next_cursor,
+                "prev_cursor": pagination.prev_cursor,
+            },
+            "status": "success",
+        }
+    )
+
+
+def _require_login():
+    if not current_user.is_authenticated:
+        raise APIError("Authentication required", 401)
+
+
+def _visible_thought(thought_id):
+    """Get a thought the current user may view, or answer 404"""
+    thought = get_thought_by_id(thought_id)
+    if thought is None or not (
+        thought.is_public
+        or (current_user.is_authenticated and thought.user_id == current_user.id)
+    ):
+        raise APIError("Thought not found", 404)
+    return thought
+
+
+def _owned_thought(thought_id):
+    """Get a thought owned by the current user, or answer 403/404"""
+    thought = _visible_thought(thought_id)
+    if thought.user_id != current_user.id:
+        raise APIError("You don't have permission to modify this thought", 403)
+    return thought
+
+
+def _thought_input(partial=False):
+    """Validate a JSON thought payload into keyword arguments for the helpers"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise APIError("Expected a JSON object")
+
+    values = {}
+    for name, max_length in (("title", 200), ("content", None), ("category", 50)):
+        if name not in payload:
+            continue
+        value = payload[name]
+        if value is not None and not isinstance(value, str):
+            raise APIError(f"'{name}' must be a string")
+        value = (value or "").strip()
+        if max_length is not None and len(value) > max_length:
+            raise APIError(f"'{name}' is longer than {max_length} characters")
+        values[name] = value
+    for name in ("title", "content"):
+        if (not partial or name in values) and not values.get(name):
+            raise APIError(f"'{name}' is required")
+
+    if "tags" in payload:
+        tags = payload["tags"]
+        if isinstance(tags, list) and all(isinstance(tag, str) for tag in tags):
+            tags = ",".join(tags)
+        elif tags is not None and not isinstance(tags, str):
+            raise APIError("'tags' must be a string or a list of strings")
+        values["tags"] = tags or ""
+    if "is_public" in payload:
+        if not isinstance(payload["is_public"], bool):
+            raise APIError("'is_public' must be a boolean")
+        values["is_public"] = payload["is_public"]
+    return values
+
+
+@api_bp.route("/thoughts", methods=["GET"])
+def list_thoughts():
+    """List the current user's thoughts, or fetch a batch with ?ids=a,b,c"""
+    fields = _requested_fields()
+    options = thought_field_options(fields)
+
+    if "ids" in request.args:
+        ids = [i.strip() for i in request.args["ids"].split(",") if i.strip()]
+        if len(ids) > MAX_BATCH_IDS:
+            raise APIError(f"At most {MAX_BATCH_IDS} ids can be fetched at once")
+        viewer_id = current_user.id if current_user.is_authenticated else None
+        thoughts = get_thoughts_by_ids(ids, viewer_id, options=options)
+        found = {thought.id for thought in thoughts}
+        return jsonify(
+            {
+                "data": [thought.to_dict(fields) for thought in thoughts],
+                "missing": [i for i in dict.fromkeys(ids) if i not in found],
+                "status": "success",
+            }
+        )
+
+    _require_login()
+    cursor_args = {
+        "per_page": _per_page(),
+        "after": request.args.get("after"),
+        "before": request.args.get("before"),
+        "options": options,
+    }
+    tag = request.args.get("tag")
+    if tag:
+        pagination = get_thoughts_by_tag(current_user.id, tag, **cursor_args)
+    else:
+        pagination = get_user_thoughts(current_user.id, **cursor_args)
+    return _page_response(pagination, fields)
+
+
+@api_bp.route("/thoughts/public")
+def list_public_thoughts():
+    """List public thoughts, optionally filtered with ?tag="""
+    fields = _requested_fields()
+    cursor_args = {
+        "per_page": _per_page(),
+        "after": request.args.get("after"),
+        "before": request.args.get("before"),
+        "options": thought_field_options(fields),
+    }
+    tag = request.args.get("tag")
+    if tag:
+        pagination = get_public_thoughts_by_tag(tag, **cursor_args)
+    else:
+        pagination = get_public_thoughts(**cursor_args)
+    return _page_response(pagination, fields)
+
+
+@api_bp.route("/tags")
+def list_tags():
+    """Most used tags: over public thoughts, or the user's own with ?scope=mine"""
+    scope = request.args.get("scope", "public")
+    if scope not in ("public", "mine"):
+        raise APIError("'scope' must be 'public' or 'mine'")
+    user_id = None
+    if scope == "mine":
+        _require_login()
+        user_id = current_user.id
+    limit = max(1, min(request.args.get("limit", 20, type=int), MAX_TAGS))
+    tags = get_top_tags(user_id, limit)
+    return jsonify(
+        {
+            "data": [{"name": name, "count": count} for name, count in tags],
+            "status": "success",
+        }
+    )
+
+
+@api_bp.route("/stats")
+@login_required
+def user_stats():
+    """Thought counts of the current user: total, per category and per day
+    over the last ?days= days"""
+    days = max(1, min(request.args.get("days", 30, type=int), MAX_STATS_DAYS))
+    stats = get_user_stats(current_user.id, days)
+    return jsonify(
+        {
+            "data": {
+                "total": stats["total"],
+                "categories": [
+                    {"category": category, "count": count}
+                    for category, count in stats["categories"]
+                ],
+                "daily": [
+                    {"date": day.isoformat(), "count": count}
+                    for day, count in stats["daily"]
+                ],
+            },
+            "status": "success",
+        }
+    )
+
+
+@api_bp.route("/thoughts/search")
+@login_required
+def search_thoughts_endpoint():
+    """Search the current user's thoughts, ranked by relevance"""
+    fields = _requested_fields()
+    query = request.args.get("q", "").strip()
+    if not query:
+        raise APIError("'q' is required")
+    # Page numbers rather than cursors: results are ordered by relevance,
+    # which has no stored sort key to resume from (see search_thoughts)
+    page = max(1, request.args.get("page", 1, type=int))
+    pagination = search_thoughts(
+        current_user.id,
+        query,
+        page=page,
+        per_page=_per_page(),
+        options=thought_field_options(fields),
+    )
+    return jsonify(
+        {
+            "data": [thought.to_dict(fields) for thought in pagination.items],
+            "pagination": {
+                "page": pagination.page,
+                "per_page": pagination.per_page,
+                "total": pagination.total,
+                "has_next": pagination.has_next,
+                "has_prev": pagination.has_prev,
+            },
+            "status": "success",
+        }
+    )
+
+
+@api_bp.route("/thoughts", methods=["POST"])
+@login_required
+def create_thought_endpoint():
+    """Create a thought for the current user"""
+    values = _thought_input()
+    thought = create_thought(
+        title=values["title"],
+        content=values["content"],
+        user_id=current_user.id,
+        category=values.get("category") or None,
+        tags=values.get("tags") or None,
+        is_public=values.get("is_public", False),
+    )
+    response = jsonify({"data": thought.to_dict(), "status": "success"})
+    response.status_code = 201
+    response.headers["Location"] = url_for(
+        "api.get_thought_endpoint", thought_id=thought.id
+    )
+    return response
+
+
+@api_bp.route("/thoughts/<thought_id>", methods=["GET"])
+def get_thought_endpoint(thought_id):
+    """Get a thought the current user may view"""
+    fields = _requested_fields()
+    thought = _visible_thought(thought_id)
+    return jsonify({"data": thought.to_dict(fields), "status": "success"})
+
+
+@api_bp.route("/thoughts/<thought_id>", methods=["PUT", "PATCH"])
+@login_required
+def update_thought_endpoint(thought_id):
+    """Update a thought; PATCH changes only the fields given"""
+    thought = _owned_thought(thought_id)
+    values = _thought_input(partial=request.method == "PATCH")
+    thought = update_thought(thought.id, **values)
+    return jsonify({"data": thought.to_dict(), "status": "success"})
+
+
+@api_bp.route("/thoughts/<thought_id>", methods=["DELETE"])
+@login_required
+def delete_thought_endpoint(thought_id):
+    """Delete a thought owned by the current user"""
+    thought = _owned_thought(thought_id)
+    delete_thought(thought.id)
+    return jsonify({"message": "Thought deleted", "status": "success"})
@@ -0,0 +1,250 @@
+"""
+Fingerprinted, precompressed static assets with far-future caching.
+
+``python manage.py build-assets`` minifies the stylesheets and scripts under
+``app/static``, writes each file under a name containing a hash of its
+content (``css/style.3f2a9c1d7b10.css``) to ``ASSETS_DIR`` (default
+``app/static/dist``), next to gzip and, when the ``brotli`` package is
+installed, brotli variants, and records the names in ``manifest.json``.
+
+Templates link assets with ``asset_url("css/style.css")``. Names found in the
+manifest resolve to ``ASSETS_URL_PREFIX`` (default ``/assets``), where they
+are served with the best encoding the client accepts and
+``Cache-Control: public, max-age=31536000, immutable``: a changed file gets a
+new name, so browsers never need to revalidate. Without a manifest (assets
+not built), or with ``ASSETS_ENABLED = False`` (the default in debug mode),
+``asset_url`` falls back to Flask's static route.
+
+Builds keep the files of earlier builds, so pages rendered before a deploy
+can still load their assets; ``--clean`` removes them.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from flask import abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+MANIFEST_NAME = "manifest.json"
+ASSET_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt")
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _split_literals(source, quotes):
+    """Split source code into (is_literal, text) parts, dropping comments.
+
+    ``quotes`` are the string delimiters of the language; backslash escapes
+    are honoured. Handles ``/* */`` comments, and ``//`` comments when ``/``
+    cannot start a regular expression literal (there are none in our
+    scripts).
+    """
+    parts = []
+    code = []
+    i, length = 0, len(source)
+    line_comments = "`" in quotes  # JavaScript
+    while i < length:
+        char = source[i]
+        if char in quotes:
+            end = i + 1
+            while end < length and source[end] != char:
+                end += 2 if source[end] == "\\" else 1
+            parts.append((False, "".join(code)))
+            parts.append((True, source[i : end + 1]))
+            code = []
+            i = end + 1
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+            code.append(" ")
+        elif line_comments and source.startswith("//", i):
+            end = source.find("\n", i)
+            i = length if end == -1 else end
+        else:
+            code.append(char)
+            i += 1
+    parts.append((False, "".join(code)))
+    return parts
+
+
+def minify_css(source):
+    """Drop comments and the whitespace CSS does not need"""
+    out = []
+    for is_literal, text in _split_literals(source, "\"'"):
+        if not is_literal:
+            text = re.sub(r"\s+", " ", text)
+            text = re.sub(r" ?([{};,>]) ?", r"\1", text)
+            text = re.sub(r": ", ":", text)
+            text = text.replace(";}", "}")
+        out.append(text)
+    return "".join(out).strip()
+
+
+def minify_js(source):
+    """Drop comments, indentation and blank lines.
+
+    Line breaks are kept so that automatic semicolon insertion still
+    applies, and string and template literals are left untouched.
+    """
+    out = []
+    for is_literal, text in _split_literals(source, "\"'`"):
+        if not is_literal:
+            text = re.sub(r"[ \t]*\n\s*", "\n", text)
+        out.append(text)
+    return "".join(out).strip() + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build_assets(source_dir, output_dir, clean=False):
+    """Minify, fingerprint and compress the files under ``source_dir``.
+
+    Returns the manifest, a dict of source name to
+    ``{"path": fingerprinted name, "encodings": [...], "size": bytes}``.
+    """
+    output_dir = os.path.abspath(output_dir)
+    if clean and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(
+            d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir
+        )
+        for filename in sorted(files):
+            source_path = os.path.join(root, filename)
+            name = os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+            base, ext = os.path.splitext(name)
+            with open(source_path, "rb") as f:
+                data = f.read()
+            if ext in MINIFIERS:
+                data = MINIFIERS[ext](data.decode("utf-8")).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            path = f"{base}.{digest}{ext}"
+            target = os.path.join(output_dir, path)
+            _write(target, data)
+
+            encodings = []
+            if ext in COMPRESSIBLE:
+                variants = {"gzip": gzip.compress(data, 9, mtime=0)}
+                if brotli is not None:
+                    variants["br"] = brotli.compress(data, quality=11)
+                for encoding, suffix in ENCODINGS:
+                    compressed = variants.get(encoding)
+                    if compressed is not None and len(compressed) < len(data):
+                        _write(target + suffix, compressed)
+                        encodings.append(encoding)
+            manifest[name] = {"path": path, "encodings": encodings, "size": len(data)}
+
+    # Replaced atomically, so running servers never read half a manifest
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+    return manifest
+
+
+class AssetManifest:
+    """The built assets of an app, read from its manifest on first use"""
+
+    def __init__(self, app):
+        self.app = app
+        self.directory = None
+        self._lock = threading.Lock()
+        self._by_name = None
+        self._by_path = None
+
+    def _load(self):
+        with self._lock:
+            if self._by_name is None:
+                config = self.app.config
+                self.directory = config.get("ASSETS_DIR") or os.path.join(
+                    self.app.static_folder, "dist"
+                )
+                manifest = {}
+                if config.get("ASSETS_ENABLED", not self.app.debug):
+                    try:
+                        with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+                            manifest = json.load(f)
+                    except FileNotFoundError:
+                        pass
+                self._by_path = {entry["path"]: entry for entry in manifest.values()}
+                self._by_name = manifest
+
+    def lookup(self, name):
+        """Manifest entry of a source file name, or None"""
+        if self._by_name is None:
+            self._load()
+        return self._by_name.get(name)
+
+    def entry_for_path(self, path):
+        """Manifest entry of a fingerprinted file name, or None"""
+        if self._by_path is None:
+            self._load()
+        return self._by_path.get(path)
+
+
+def asset_url(filename):
+    """URL of a static file, fingerprinted when the assets are built"""
+    entry = assets().lookup(filename)
+    if entry is None:
+        return url_for("static", filename=filename)
+    return url_for("assets", filename=entry["path"])
+
+
+def serve_asset(filename):
+    """Serve a fingerprinted asset in the best encoding the client accepts"""
+    entry = assets().entry_for_path(filename)
+    if entry is None:
+        abort(404)
+
+    encoding, path = None, filename
+    for name, suffix in ENCODINGS:
+        if name in entry["encodings"] and request.accept_encodings[name]:
+            encoding, path = name, filename + suffix
+            break
+
+    response = send_from_directory(
+        assets().directory,
+        path,
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        max_age=ASSET_MAX_AGE,
+    )
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_assets(app):
+    """Register ``asset_url`` and the fingerprinted asset route"""
+    app.extensions["assets"] = AssetManifest(app)
+    prefix = app.config.get("ASSETS_URL_PREFIX", "/assets")
+    app.add_url_rule(f"{prefix}/<path:filename>", "assets", serve_asset)
+    app.add_template_global(asset_url)
+
+
+def assets():
+    """Get the asset manifest of the current application"""
+    return current_app.extensions["assets"]
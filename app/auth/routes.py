@@ -8,13 +8,19 @@ from app.models import (
     create_user,
     get_user_by_email,
     get_user_by_oauth,
+    get_user_stats,
+    update_user_password,
 )
-from app.oauth_config import (
-    get_google_auth_url,
-    get_google_token,
-    get_google_user_info,
-    is_google_oauth_enabled,
-)
+from app.passwords import PasswordHasherBusy
+
+# Weeks of activity shown on the profile page
+ACTIVITY_WEEKS = 53
+
+
+def _hasher_busy(template_name, **context):
+    """Answer 503 when the password hashing queue is full"""
+    flash("The server is busy. Please try again in a moment.", "warning")
+    return render_template(template_name, **context), 503, {"Retry-After": "5"}
 
 
 @auth_bp.route("/login", methods=["GET", "POST"])
@@ -25,7 +31,10 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
-        user = authenticate_user(form.username.data, form.password.data)
+        try:
+            user = authenticate_user(form.username.data, form.password.data)
+        except PasswordHasherBusy:
+            return _hasher_busy("auth/login.html", title="Login", form=form)
         if user:
             login_user(user, remember=form.remember_me.data)
             flash("Login successful!", "success")
@@ -45,7 +54,10 @@ def register():
 
     form = RegistrationForm()
     if form.validate_on_submit():
-        user = create_user(form.username.data, form.email.data, form.password.data)
+        try:
+            user = create_user(form.username.data, form.email.data, form.password.data)
+        except PasswordHasherBusy:
+            return _hasher_busy("auth/register.html", title="Register", form=form)
         login_user(user)
         flash("Registration successful! Welcome!", "success")
         return redirect(url_for("main.index"))
@@ -66,7 +78,28 @@ def logout():
 @login_required
 def profile():
     """User profile route"""
-    return render_template("auth/profile.html", title="Profile")
+    stats = get_user_stats(current_user.id, days=ACTIVITY_WEEKS * 7)
+    return render_template(
+        "auth/profile.html",
+        title="Profile",
+        stats=stats,
+        activity_weeks=activity_weeks(stats["daily"]),
+    )
+
+
+def activity_weeks(daily):
+    """Arrange ``(date, count)`` pairs into Monday-first week columns of
+    ``(date, count, level)`` cells for the activity heatmap.
+
+    ``level`` runs from 0 (no thoughts) to 4 (the busiest day); days before
+    the first date are ``None``.
+    """
+    busiest = max((count for _, count in daily), default=0)
+    cells = [None] * daily[0][0].weekday() if daily else []
+    for day, count in daily:
+        level = -(-4 * count // busiest) if count else 0
+        cells.append((day, count, level))
+    return [cells[i : i + 7] for i in range(0, len(cells), 7)]
 
 
 @auth_bp.route("/change-password", methods=["GET", "POST"])
@@ -80,21 +113,30 @@ def change_password():
 
     form = ChangePasswordForm()
     if form.validate_on_submit():
-        if current_user.check_password(form.current_password.data):
-            current_user.set_password(form.new_password.data)
-            flash("Password changed successfully!", "success")
-            return redirect(url_for("auth.profile"))
-        else:
-            flash("Current password is incorrect.", "danger")
+        try:
+            if current_user.check_password(form.current_password.data):
+                update_user_password(current_user, form.new_password.data)
+                flash("Password changed successfully!", "success")
+                return redirect(url_for("auth.profile"))
+            else:
+                flash("Current password is incorrect.", "danger")
+        except PasswordHasherBusy:
+            return _hasher_busy(
+                "auth/change_password.html", title="Change Password", form=form
+            )
 
     return render_template(
         "auth/change_password.html", title="Change Password", form=form
     )
 
 
+# The OAuth client (and the HTTP and JWT libraries it needs) is imported on
+# first use so it does not add to application startup time
 @auth_bp.route("/login/google")
 def google_login():
     """Initiate Google OAuth login"""
+    from app.oauth_config import get_google_auth_url, is_google_oauth_enabled
+
     if not is_google_oauth_enabled():
         flash("Google OAuth is not configured.", "warning")
         return redirect(url_for("auth.login"))
@@ -110,6 +152,12 @@ def google_login():
 @auth_bp.route("/login/google/callback")
 def google_callback():
     """Handle Google OAuth callback"""
+    from app.oauth_config import (
+        get_google_identity,
+        get_google_token,
+        is_google_oauth_enabled,
+    )
+
     if not is_google_oauth_enabled():
         flash("Google OAuth is not configured.", "warning")
         return redirect(url_for("auth.login"))
@@ -134,11 +182,11 @@ def google_callback():
             flash("Failed to get access token from Google.", "danger")
             return redirect(url_for("auth.login"))
 
-        # Get user info from Google
-        user_info = get_google_user_info(access_token)
+        # Identify the Google account from the verified id_token
+        user_info = get_google_identity(token_data)
         google_id = user_info.get("id")
         email = user_info.get("email")
-        name = user_info.get("name", email.split("@")[0])
+        name = user_info.get("name") or email.split("@")[0]
 
         # Check if user already exists
         user = get_user_by_oauth("google", google_id)
@@ -0,0 +1,368 @@
+"""
+Response cache for pages that are identical for every anonymous visitor.
+
+Rendered responses are stored in a pluggable backend:
+
+* ``memory`` - an in-process LRU with a TTL and an entry bound (default)
+* ``filesystem`` - files in ``RESPONSE_CACHE_DIR``, shared by every worker
+  process on the host
+* ``null`` - caching disabled
+
+Public thought writes invalidate all cached pages at once by bumping a
+generation counter that is part of every cache key. Concurrent misses for the
+same key are collapsed so only one request renders the page while the others
+wait for its result. A key whose last render could not be cached (e.g. a 404)
+is remembered for the TTL and rendered without waiting on other requests.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+class NullCache:
+    """Backend that never stores anything"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def get_generation(self):
+        return 0
+
+    def bump_generation(self):
+        pass
+
+    def lock(self, key):
+        return nullcontext()
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry expiry and a maximum size"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_generation(self):
+        return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def lock(self, key):
+        # Threads in this process are already serialized by ResponseCache
+        return nullcontext()
+
+
+class FileSystemCache:
+    """Cache stored as files in a directory shared by worker processes"""
+
+    GENERATION_FILE = "generation"
+
+    def __init__(self, directory, max_entries=4096):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix=".cache"):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest + suffix)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at = float(f.readline())
+                value = f.read()
+        except (OSError, ValueError):
+            return None
+        if expires_at <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self._write(self._path(key), f"{time.time() + ttl}\n".encode() + value)
+        self._prune()
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _prune(self):
+        """Drop the oldest entries once the directory exceeds its bound"""
+        entries = [
+            entry
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".cache")
+        ]
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get_generation(self):
+        try:
+            with open(os.path.join(self.directory, self.GENERATION_FILE)) as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump_generation(self):
+        with self.lock(self.GENERATION_FILE):
+            generation = self.get_generation() + 1
+            self._write(
+                os.path.join(self.directory, self.GENERATION_FILE),
+                str(generation).encode(),
+            )
+
+    @contextmanager
+    def lock(self, key):
+        """Exclusive lock on a key across processes (no-op without fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(key, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ResponseCache:
+    """Caches rendered responses and collapses concurrent misses per key"""
+
+    def __init__(self, backend, ttl=60, max_uncacheable=1024):
+        self.backend = backend
+        self.ttl = ttl
+        self._key_locks = {}
+        self._key_locks_guard = threading.Lock()
+        # Keys whose last render was not cacheable; collapsing their misses
+        # would only serialize requests that all have to render anyway
+        self._uncacheable = MemoryCache(max_uncacheable)
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def _count(self, counter):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @contextmanager
+    def _single_flight(self, key):
+        with self._key_locks_guard:
+            lock, waiters = self._key_locks.get(key, (threading.Lock(), 0))
+            self._key_locks[key] = (lock, waiters + 1)
+        try:
+            with lock, self.backend.lock(key):
+                yield
+        finally:
+            with self._key_locks_guard:
+                lock, waiters = self._key_locks[key]
+                if waiters == 1:
+                    del self._key_locks[key]
+                else:
+                    self._key_locks[key] = (lock, waiters - 1)
+
+    def get_or_set(self, key, render):
+        """Return the cached bytes for ``key``, rendering them on a miss.
+
+        ``render`` returns the bytes to cache, or None to skip caching.
+        """
+        key = f"{self.backend.get_generation()}:{key}"
+        value = self.backend.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        if self._uncacheable.get(key) is not None:
+            self._count("misses")
+            return self._render(key, render)
+
+        with self._single_flight(key):
+            value = self.backend.get(key)
+            if value is not None:
+                self._count("hits")
+                return value
+            self._count("misses")
+            return self._render(key, render)
+
+    def _render(self, key, render):
+        value = render()
+        if value is None:
+            self._count("uncacheable")
+            self._uncacheable.set(key, True, self.ttl)
+        else:
+            self._uncacheable.delete(key)
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self):
+        """Invalidate every cached page"""
+        self.backend.bump_generation()
+
+    def stats(self):
+        with self._counter_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "uncacheable": self.uncacheable,
+            }
+
+
+def init_response_cache(app):
+    """Create the response cache configured for the application"""
+    cache_type = app.config.get("RESPONSE_CACHE_TYPE", "memory")
+    if cache_type == "filesystem":
+        directory = app.config.get("RESPONSE_CACHE_DIR") or os.path.join(
+            app.instance_path, "response_cache"
+        )
+        backend = FileSystemCache(
+            directory, app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 4096)
+        )
+    elif cache_type == "memory":
+        backend = MemoryCache(app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 512))
+    else:
+        backend = NullCache()
+
+    app.extensions["response_cache"] = ResponseCache(
+        backend, app.config.get("RESPONSE_CACHE_TTL", 60)
+    )
+
+
+def response_cache():
+    """Get the response cache for the current application"""
+    return current_app.extensions.get("response_cache")
+
+
+def invalidate_public_pages():
+    """Drop cached anonymous pages after public content changed"""
+    cache = response_cache()
+    if cache is not None:
+        cache.invalidate()
+
+
+# Response headers stored with a cached page so conditional GETs keep working
+CACHED_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "Vary")
+
+
+def _serialize(response):
+    meta = {
+        "status": response.status_code,
+        "content_type": response.content_type,
+        "headers": {
+            name: response.headers[name]
+            for name in CACHED_HEADERS
+            if name in response.headers
+        },
+    }
+    return json.dumps(meta).encode() + b"\n" + response.get_data()
+
+
+def _deserialize(value):
+    meta, body = value.split(b"\n", 1)
+    meta = json.loads(meta)
+    response = make_response(body, meta["status"])
+    response.content_type = meta["content_type"]
+    response.headers.update(meta.get("headers", {}))
+    response.headers["X-Cache"] = "HIT"
+    return response.make_conditional(request)
+
+
+def cache_anonymous_page(view):
+    """Serve a view from the response cache for anonymous GET requests.
+
+    Logged-in users, requests with pending flash messages and non-200
+    responses always bypass the cache.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = response_cache()
+        if (
+            cache is None
+            or request.method != "GET"
+            or current_user.is_authenticated
+            or session.get("_flashes")
+        ):
+            return view(*args, **kwargs)
+
+        rendered = []
+
+        def render():
+            response = make_response(view(*args, **kwargs))
+            rendered.append(response)
+            if response.status_code != 200 or response.direct_passthrough:
+                return None
+            return _serialize(response)
+
+        value = cache.get_or_set(f"page:{request.full_path}", render)
+        if rendered:
+            response = rendered[0]
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return _deserialize(value)
+
+    return wrapper
@@ -0,0 +1,47 @@
+"""
+Command line integration that stays cheap at application startup.
+
+Flask-Migrate pulls in Alembic, which is a large share of the import time of
+the application. Web workers never run migrations, so the ``flask db`` command
+group is registered as a placeholder that imports Flask-Migrate and sets it up
+only when a ``db`` command is actually invoked.
+"""
+
+import click
+
+
+class LazyMigrateGroup(click.Group):
+    """Stand-in for Flask-Migrate's ``db`` group, loaded on first use"""
+
+    def __init__(self, app, db, **kwargs):
+        super().__init__(name="db", help="Perform database migrations.", **kwargs)
+        self._app = app
+        self._db = db
+        self._group = None
+
+    def _load(self):
+        if self._group is None:
+            from flask_migrate import Migrate
+            from flask_migrate.cli import db as db_cli_group
+
+            Migrate(self._app, self._db)
+            self._group = db_cli_group
+            # Take over the group's own options (--directory, --x-arg)
+            self.params = list(db_cli_group.params)
+            self.callback = db_cli_group.callback
+        return self._group
+
+    def get_params(self, ctx):
+        self._load()
+        return super().get_params(ctx)
+
+    def list_commands(self, ctx):
+        return self._load().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._load().get_command(ctx, name)
+
+
+def init_migrate(app, db):
+    """Register the ``flask db`` command group without importing Alembic"""
+    app.cli.add_command(LazyMigrateGroup(app, db))
@@ -0,0 +1,89 @@
+"""
+Conditional GET support for thought pages.
+
+Pages derive a weak ETag from the ``updated_at`` of the thoughts they show,
+and thought pages also a Last-Modified date. When the client's cached copy is
+still current the view answers ``304 Not Modified`` before rendering any
+template.
+"""
+
+import hashlib
+from datetime import timezone
+
+from flask import make_response, render_template, request, session
+from flask_login import current_user
+
+
+def _viewer():
+    """Identify the viewer, since pages differ between users"""
+    if current_user.is_authenticated:
+        return current_user.get_id()
+    return "anonymous"
+
+
+def _http_date(value):
+    """Naive UTC datetime -> aware datetime truncated to whole seconds"""
+    if value is None:
+        return None
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def thought_validators(thought):
+    """ETag and Last-Modified for a single thought page"""
+    updated_at = thought.updated_at or thought.created_at
+    etag = _etag(_viewer(), thought.id, updated_at)
+    return etag, _http_date(updated_at)
+
+
+def listing_validators(thoughts, *extra):
+    """ETag for a page of thoughts (and no Last-Modified).
+
+    The ETag covers the ids and versions of every thought on the page, so
+    additions and deletions change it as well as edits. A date cannot: once a
+    thought is deleted the newest remaining ``updated_at`` is no later than
+    before, and ``If-Modified-Since`` would keep the deleted thought cached.
+    """
+    stamps = [t.updated_at or t.created_at for t in thoughts]
+    etag = _etag(
+        _viewer(),
+        request.full_path,
+        *extra,
+        *(f"{t.id}@{stamp}" for t, stamp in zip(thoughts, stamps)),
+    )
+    return etag, None
+
+
+def _etag(*parts):
+    return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def is_not_modified(etag, last_modified):
+    """Check the request's validators against the current page version"""
+    if session.get("_flashes"):
+        # The page would show (and consume) pending flash messages
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+def conditional_render(validators, template_name, **context):
+    """Render a template, or answer 304 if the client's copy is current"""
+    etag, last_modified = validators
+    if is_not_modified(etag, last_modified):
+        response = make_response("", 304)
+    else:
+        response = make_response(render_template(template_name, **context))
+    return set_validators(response, etag, last_modified)
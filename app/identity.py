@@ -0,0 +1,143 @@
+"""
+Cached identity resolution for the Flask-Login user loader.
+
+Loading ``current_user`` used to cost a ``users`` primary-key query on every
+authenticated request. The loader now keeps a bounded, TTL'd per-process cache
+of user column snapshots and re-attaches them to the request's session
+without querying (``Session.merge(load=False)``), so routes can still modify
+and commit ``current_user`` as before.
+
+Any flushed update or delete of a ``User`` (password, ``is_active``, profile
+fields) invalidates that user's entry in the writing process. With
+``USER_CACHE_SHARED_DIR`` set, the commit also writes a new stamp for that user
+to the directory. The stamp is part of the user's cache key, so every worker
+process on the host drops its entry for that user, and only that user.
+Without it, other worker processes pick the change up - a deactivated user
+stays logged in there - within ``USER_CACHE_TTL`` seconds (default 30).
+"""
+
+import threading
+from uuid import uuid4
+
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+from sqlalchemy.orm import attributes, make_transient_to_detached
+
+from app.cache import FileSystemCache, MemoryCache
+from app.models import User, db, get_user_by_id
+
+
+class UserIdentityCache:
+    """Bounded cache of user snapshots with hit/miss counters"""
+
+    def __init__(self, max_entries=1024, ttl=30, shared=None):
+        self.ttl = ttl
+        self._entries = MemoryCache(max_entries)
+        # Backend holding the per-user stamps shared with the other workers
+        self.shared = shared
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _count(self, counter):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _key(self, user_id):
+        if self.shared is None:
+            return user_id
+        # A stamp outlives the entries cached before it was written, so an
+        # expired stamp only costs a miss
+        stamp = self.shared.get(f"user:{user_id}")
+        return f"{stamp.decode() if stamp else 0}:{user_id}"
+
+    def load(self, user_id):
+        """Return the user for ``user_id`` bound to the current session"""
+        if not self.ttl:
+            return get_user_by_id(user_id)
+
+        key = self._key(user_id)
+        snapshot = self._entries.get(key)
+        if snapshot is not None:
+            self._count("hits")
+            return _attach(snapshot)
+
+        self._count("misses")
+        user = get_user_by_id(user_id)
+        if user is not None:
+            self._entries.set(key, _snapshot(user), self.ttl)
+        return user
+
+    def invalidate(self, user_id, everywhere=True):
+        """Drop the cached user; ``everywhere`` also drops it in the other
+        worker processes sharing ``shared``"""
+        self._entries.delete(self._key(user_id))
+        if everywhere and self.shared is not None:
+            self.shared.set(f"user:{user_id}", uuid4().hex.encode(), self.ttl)
+        self._count("invalidations")
+
+    def stats(self):
+        with self._counter_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+def _snapshot(user):
+    """Copy a user's column values into a plain dict"""
+    return {attr.key: getattr(user, attr.key) for attr in sa.inspect(User).column_attrs}
+
+
+def _attach(snapshot):
+    """Rebuild a clean User from a snapshot and add it to the session"""
+    user = User.__mapper__.class_manager.new_instance()
+    for key, value in snapshot.items():
+        attributes.set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def init_identity_cache(app):
+    """Create the user identity cache configured for the application"""
+    directory = app.config.get("USER_CACHE_SHARED_DIR")
+    app.extensions["user_identity_cache"] = UserIdentityCache(
+        app.config.get("USER_CACHE_MAX_ENTRIES", 1024),
+        # Per process only without a shared directory: other workers see a
+        # user update (e.g. a deactivation) only after this many seconds
+        app.config.get("USER_CACHE_TTL", 30),
+        FileSystemCache(directory) if directory else None,
+    )
+
+
+def user_identity_cache():
+    """Get the user identity cache for the current application"""
+    return current_app.extensions["user_identity_cache"]
+
+
+@sa.event.listens_for(User, "after_update")
+@sa.event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, user):
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get("user_identity_cache")
+    if cache is not None:
+        # Other workers are told once the change is committed
+        cache.invalidate(user.id, everywhere=False)
+        # A request may re-cache the old row before this transaction commits
+        session = sa.orm.object_session(user)
+        if session is not None:
+            session.info.setdefault("invalidated_user_ids", set()).add(user.id)
+
+
+@sa.event.listens_for(db.session, "after_commit")
+def _invalidate_committed_users(session):
+    user_ids = session.info.pop("invalidated_user_ids", None)
+    if not user_ids or not has_app_context():
+        return
+    cache = current_app.extensions.get("user_identity_cache")
+    if cache is not None:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
@@ -0,0 +1,299 @@
+"""
+Bulk thought import from NDJSON or CSV.
+
+Rows are read from a stream one at a time, validated, and written in batches
+of ``IMPORT_BATCH_SIZE`` (default 500) rows. Each batch is one transaction of
+Core ``executemany`` inserts into ``thoughts``, ``thought_tags`` and the search
+index, so memory stays flat however large the input is. Invalid rows are
+reported with their line number and skipped; they never abort the import.
+
+Accepted fields per row: ``title`` and ``content`` (required), ``category``,
+``tags`` (comma-separated string or list), ``is_public``, and ISO 8601
+``created_at``/``updated_at`` to keep the timestamps of migrated notes.
+"""
+
+import csv
+import json
+import uuid
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+from app.cache import invalidate_public_pages
+from app.models import (
+    Tag,
+    Thought,
+    apply_daily_count_deltas,
+    apply_tag_count_deltas,
+    daily_count_deltas,
+    db,
+    make_excerpt,
+    normalize_tag,
+    parse_tags,
+    search_index_enabled,
+    search_rowid,
+    tag_count_deltas,
+    thought_search_index,
+    thought_tags,
+)
+from app.pagination import thought_count_cache
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# Only the first errors are kept in the result; the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+FALSE_VALUES = {"", "0", "false", "no", "n", "off"}
+
+# Thought content has no length limit, so a CSV field (e.g. from an export)
+# may be far longer than the csv module's default limit of 128 KiB
+CSV_FIELD_SIZE_LIMIT = 2**31 - 1
+
+
+class ImportRowError(ValueError):
+    """A single input row could not be imported"""
+
+
+class ImportResult:
+    """Counts and per-row errors of an import run"""
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self):
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _text_lines(stream):
+    """Yield decoded lines from a binary or text stream, dropping a UTF-8 BOM"""
+    binary = not hasattr(stream, "encoding")
+    for index, line in enumerate(iter(stream.readline, b"" if binary else "")):
+        if binary:
+            line = line.decode("utf-8", errors="replace")
+        yield line.lstrip("\ufeff") if index == 0 else line
+
+
+def iter_ndjson_rows(stream):
+    """Yield (line number, row dict or ImportRowError) from NDJSON input"""
+    for line_number, line in enumerate(_text_lines(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ImportRowError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ImportRowError("Expected a JSON object")
+            continue
+        yield line_number, row
+
+
+def iter_csv_rows(stream):
+    """Yield (line number, row dict or ImportRowError) from CSV input with a
+    header row"""
+    csv.field_size_limit(max(csv.field_size_limit(), CSV_FIELD_SIZE_LIMIT))
+    reader = csv.DictReader(_text_lines(stream))
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # The reader resumes at the next line, so one malformed record
+            # does not end the import
+            yield reader.reader.line_num, ImportRowError(f"Invalid CSV: {e}")
+            continue
+        yield reader.line_num, row
+
+
+def iter_rows(stream, fmt):
+    if fmt == "csv":
+        return iter_csv_rows(stream)
+    return iter_ndjson_rows(stream)
+
+
+def _text_field(row, name, max_length=None, required=False):
+    value = row.get(name)
+    if value is None or value == "":
+        if required:
+            raise ImportRowError(f"'{name}' is required")
+        return None
+    if not isinstance(value, str):
+        raise ImportRowError(f"'{name}' must be a string")
+    value = value.strip()
+    if required and not value:
+        raise ImportRowError(f"'{name}' is required")
+    if max_length is not None and len(value) > max_length:
+        raise ImportRowError(f"'{name}' is longer than {max_length} characters")
+    return value or None
+
+
+def _bool_field(row, name):
+    value = row.get(name)
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if str(value).strip().lower() in TRUE_VALUES:
+        return True
+    if str(value).strip().lower() in FALSE_VALUES:
+        return False
+    raise ImportRowError(f"'{name}' must be a boolean")
+
+
+def _datetime_field(row, name):
+    value = row.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ImportRowError(f"'{name}' must be an ISO 8601 date") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def validate_row(row, user_id, now):
+    """Turn an input row into column values for the thoughts table"""
+    tags = row.get("tags")
+    if isinstance(tags, list):
+        if not all(isinstance(tag, str) for tag in tags):
+            raise ImportRowError("'tags' must be strings")
+        tags = ",".join(tags)
+    elif tags is not None and not isinstance(tags, str):
+        raise ImportRowError("'tags' must be a string or a list of strings")
+    tag_names = parse_tags(tags)
+    tags = ", ".join(tag_names) or None
+    if tags is not None and len(tags) > 500:
+        raise ImportRowError("'tags' is longer than 500 characters")
+
+    created_at = _datetime_field(row, "created_at") or now
+    return {
+        "id": str(uuid.uuid4()),
+        "title": _text_field(row, "title", 200, required=True),
+        "content": _text_field(row, "content", required=True),
+        "category": _text_field(row, "category", 50),
+        "tags": tags,
+        "is_public": _bool_field(row, "is_public"),
+        "created_at": created_at,
+        "updated_at": _datetime_field(row, "updated_at") or created_at,
+        "user_id": user_id,
+    }
+
+
+def _tag_ids(names):
+    """Map normalized tag names to tag ids, inserting missing tags"""
+    if not names:
+        return {}
+    select = sa.select(Tag.id, Tag.name).where(Tag.name.in_(names))
+    ids = {name: tag_id for tag_id, name in db.session.execute(select)}
+    missing = [name for name in names if name not in ids]
+    if missing:
+        db.session.execute(sa.insert(Tag), [{"name": name} for name in missing])
+        ids.update(
+            (name, tag_id)
+            for tag_id, name in db.session.execute(
+                sa.select(Tag.id, Tag.name).where(Tag.name.in_(missing))
+            )
+        )
+    return ids
+
+
+def write_thought_rows(batch):
+    """Insert thought rows with their excerpts, tag links, tag and daily counts
+    and index entries, in one transaction"""
+    tag_links = []
+    for values in batch:
+        values["excerpt"] = make_excerpt(values["content"])
+        for name in dict.fromkeys(map(normalize_tag, parse_tags(values["tags"]))):
+            tag_links.append((values, name))
+
+    try:
+        tag_ids = _tag_ids(list(dict.fromkeys(name for _, name in tag_links)))
+        db.session.execute(sa.insert(Thought.__table__), batch)
+        apply_daily_count_deltas(daily_count_deltas(batch))
+        if tag_links:
+            links = [
+                {
+                    "thought_id": values["id"],
+                    "tag_id": tag_ids[name],
+                    "user_id": values["user_id"],
+                    "is_public": values["is_public"],
+                    "created_at": values["created_at"],
+                }
+                for values, name in tag_links
+            ]
+            db.session.execute(sa.insert(thought_tags), links)
+            apply_tag_count_deltas(tag_count_deltas(links))
+        if search_index_enabled():
+            db.session.execute(
+                sa.insert(thought_search_index),
+                [
+                    {
+                        "rowid": search_rowid(values["id"]),
+                        "thought_id": values["id"],
+                        "user_id": values["user_id"],
+                        "title": values["title"],
+                        "content": values["content"],
+                        "tags": values["tags"] or "",
+                    }
+                    for values in batch
+                ],
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def import_thoughts(user_id, stream, fmt="ndjson", batch_size=500):
+    """Import thoughts for a user from an NDJSON or CSV stream"""
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    result = ImportResult()
+    now = datetime.utcnow()
+    batch = []
+    any_public = False
+
+    def flush():
+        nonlocal batch
+        write_thought_rows(batch)
+        result.imported += len(batch)
+        batch = []
+
+    try:
+        for line_number, row in iter_rows(stream, fmt):
+            try:
+                if isinstance(row, ImportRowError):
+                    raise row
+                values = validate_row(row, user_id, now)
+            except ImportRowError as e:
+                result.add_error(line_number, str(e))
+                continue
+            batch.append(values)
+            any_public = any_public or values["is_public"]
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if result.imported:
+            thought_count_cache().clear()
+            if any_public:
+                invalidate_public_pages()
+    return result
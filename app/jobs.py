@@ -0,0 +1,406 @@
+"""
+Background jobs for the work that follows a thought write.
+
+The thought write helpers in ``app.models`` commit the thought and its tag
+links, and hand the rest - refreshing its search index entry and applying the
+tag and daily count changes - to ``enqueue``. ``JOBS_MODE`` decides when that
+work runs:
+
+* ``inline`` - right away, in the transaction of the write (the default of
+  testing configurations, so tests see the work done when the write returns)
+* ``thread`` - the job is stored in the ``jobs`` table in the transaction of
+  the write, and a pool of ``JOBS_WORKERS`` threads (default 2) in each app
+  process runs it once the write has committed (the default otherwise)
+* ``external`` - the job is stored, and ``python manage.py worker`` processes
+  run it
+
+Stored jobs are claimed with a conditional UPDATE, so any number of worker
+threads and processes can share the table. The work of a job and the update
+marking it done commit in one transaction, so finished work is never
+repeated, and a job whose worker died is claimed again once its lock is
+older than ``JOBS_LOCK_TIMEOUT`` seconds (default 300). A failing job is
+retried after ``JOBS_RETRY_BASE_SECONDS`` (default 5), doubling per attempt
+up to ``JOBS_RETRY_MAX_SECONDS`` (default 600), and is left ``failed`` after
+its ``max_attempts``. A job enqueued with the idempotency key of a stored job
+is dropped; finished jobs and their keys are purged after
+``JOBS_RETENTION_SECONDS`` (default one day). Idle workers poll the table
+every ``JOBS_POLL_INTERVAL`` seconds (default 1).
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import count
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import models
+from app.models import db, jobs
+
+JOBS_MODES = ("inline", "thread", "external")
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+PURGE_INTERVAL = 60
+
+# Job name: function called with the job's payload in an app context. It
+# must not commit; its changes commit together with the job's completion.
+JOB_HANDLERS = {
+    "refresh_search_index": models.refresh_search_index,
+    "apply_count_changes": models.apply_count_changes,
+}
+
+logger = logging.getLogger(__name__)
+_worker_ids = count(1)
+
+
+def jobs_mode(app):
+    """The ``JOBS_MODE`` of an app, ``thread`` unless it is testing"""
+    return app.config.get("JOBS_MODE", "inline" if app.testing else "thread")
+
+
+def enqueue(name, payload, key=None, delay=0, max_attempts=5):
+    """Queue a job in the current transaction (caller commits).
+
+    In inline mode the job runs right away instead. Returns False if a job
+    with the same idempotency ``key`` is already stored.
+    """
+    if name not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job: {name}")
+    if jobs_mode(current_app) == "inline":
+        JOB_HANDLERS[name](payload)
+        return True
+
+    now = datetime.utcnow()
+    values = {
+        "name": name,
+        "payload": json.dumps(payload),
+        "idempotency_key": key,
+        "status": PENDING,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now + timedelta(seconds=delay),
+        "created_at": now,
+    }
+    insert = models._upsert(jobs) if key is not None else None
+    if insert is not None:
+        result = db.session.execute(
+            insert.values(values).on_conflict_do_nothing(
+                index_elements=["idempotency_key"]
+            )
+        )
+        if not result.rowcount:
+            return False
+    else:
+        if (
+            key is not None
+            and db.session.execute(
+                sa.select(jobs.c.id).where(jobs.c.idempotency_key == key)
+            ).first()
+        ):
+            return False
+        db.session.execute(sa.insert(jobs).values(values))
+    db.session.info["jobs_enqueued"] = True
+    return True
+
+
+def retry_delay(attempts, base=5, maximum=600):
+    """Seconds to wait before the next attempt of a job that failed
+    ``attempts`` times"""
+    return min(maximum, base * 2 ** (attempts - 1))
+
+
+def _due(now, lock_timeout):
+    return sa.or_(
+        sa.and_(jobs.c.status == PENDING, jobs.c.run_at <= now),
+        sa.and_(
+            jobs.c.status == RUNNING,
+            jobs.c.locked_at < now - timedelta(seconds=lock_timeout),
+        ),
+    )
+
+
+class JobWorker:
+    """Claims due jobs from the jobs table and runs them, one at a time"""
+
+    def __init__(self, app, worker_id=None):
+        self.app = app
+        self.worker_id = worker_id or (
+            f"{socket.gethostname()}:{os.getpid()}:{next(_worker_ids)}"
+        )
+        config = app.config
+        self.lock_timeout = config.get("JOBS_LOCK_TIMEOUT", 300)
+        self.retry_base = config.get("JOBS_RETRY_BASE_SECONDS", 5)
+        self.retry_max = config.get("JOBS_RETRY_MAX_SECONDS", 600)
+        self.retention = config.get("JOBS_RETENTION_SECONDS", 86400)
+        self.poll_interval = config.get("JOBS_POLL_INTERVAL", 1.0)
+        self._last_purge = 0.0
+
+    def _claim(self):
+        """Mark the next due job as running by this worker; returns its row"""
+        while True:
+            now = datetime.utcnow()
+            job_id = db.session.execute(
+                sa.select(jobs.c.id)
+                .where(_due(now, self.lock_timeout))
+                .order_by(jobs.c.run_at, jobs.c.id)
+                .limit(1)
+            ).scalar()
+            if job_id is None:
+                db.session.commit()
+                return None
+            # Another worker may have claimed it since; then try the next one
+            claimed = db.session.execute(
+                sa.update(jobs)
+                .where(jobs.c.id == job_id, _due(now, self.lock_timeout))
+                .values(
+                    status=RUNNING,
+                    attempts=jobs.c.attempts + 1,
+                    locked_at=now,
+                    locked_by=self.worker_id,
+                )
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.execute(
+                    sa.select(jobs).where(jobs.c.id == job_id)
+                ).first()
+
+    def _finish(self, job, values):
+        """Update a job claimed by this worker; False if it was reclaimed"""
+        return bool(
+            db.session.execute(
+                sa.update(jobs)
+                .where(
+                    jobs.c.id == job.id,
+                    jobs.c.status == RUNNING,
+                    jobs.c.locked_by == self.worker_id,
+                )
+                .values(locked_at=None, locked_by=None, **values)
+            ).rowcount
+        )
+
+    def run_once(self):
+        """Run the next due job, if any; returns whether one was run"""
+        with self.app.app_context():
+            try:
+                job = self._claim()
+                if job is None:
+                    return False
+                self._run(job)
+                return True
+            finally:
+                db.session.remove()
+
+    def _run(self, job):
+        started = time.perf_counter()
+        result = "done"
+        try:
+            JOB_HANDLERS[job.name](json.loads(job.payload))
+            if not self._finish(
+                job, {"status": DONE, "finished_at": datetime.utcnow()}
+            ):
+                # The lock timed out and another worker owns the job now
+                db.session.rollback()
+                result = "reclaimed"
+            else:
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts >= job.max_attempts:
+                result = "failed"
+                values = {"status": FAILED, "finished_at": datetime.utcnow()}
+                logger.error("Job %s (%s) failed: %s", job.id, job.name, error)
+            else:
+                result = "retried"
+                delay = retry_delay(job.attempts, self.retry_base, self.retry_max)
+                values = {
+                    "status": PENDING,
+                    "run_at": datetime.utcnow() + timedelta(seconds=delay),
+                }
+                logger.warning(
+                    "Job %s (%s) failed, retrying in %ss: %s",
+                    job.id,
+                    job.name,
+                    delay,
+                    error,
+                )
+            self._finish(job, {"last_error": error[:2000], **values})
+            db.session.commit()
+        _record(
+            self.app,
+            job.name,
+            result,
+            (job.locked_at - job.run_at).total_seconds(),
+            time.perf_counter() - started,
+        )
+
+    def purge(self):
+        """Delete jobs finished longer than the retention period ago"""
+        with self.app.app_context():
+            try:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+                deleted = db.session.execute(
+                    sa.delete(jobs).where(
+                        jobs.c.status.in_((DONE, FAILED)), jobs.c.finished_at < cutoff
+                    )
+                ).rowcount
+                db.session.commit()
+                return deleted
+            finally:
+                db.session.remove()
+
+    def run(self, stop, wake=None, burst=False):
+        """Run jobs until ``stop`` is set, or with ``burst`` until none is
+        due; an idle worker sleeps until ``wake`` is set or for the poll
+        interval"""
+        while not stop.is_set():
+            if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+                self._last_purge = time.monotonic()
+                self._safely(self.purge)
+            if self._safely(self.run_once):
+                continue
+            if burst:
+                return
+            if wake is None:
+                stop.wait(self.poll_interval)
+            elif wake.wait(self.poll_interval):
+                wake.clear()
+
+    def _safely(self, operation):
+        # A database error (e.g. a locked database) must not end the worker
+        try:
+            return operation()
+        except sa.exc.SQLAlchemyError:
+            logger.exception("Job worker %s: database error", self.worker_id)
+            time.sleep(self.poll_interval)
+            return False
+
+
+def _record(app, name, result, wait, duration):
+    metrics = app.extensions.get("metrics")
+    if metrics is None:
+        return
+    labels = [("job", name)]
+    metrics.registry.inc("ideas_jobs_total", labels + [("result", result)])
+    metrics.registry.observe("ideas_job_wait_seconds", max(0.0, wait), labels)
+    metrics.registry.observe("ideas_job_duration_seconds", duration, labels)
+    metrics.flush()
+
+
+class JobQueue:
+    """The worker threads of thread mode, and the depth of the job table"""
+
+    def __init__(self, app):
+        self.app = app
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    @property
+    def mode(self):
+        return jobs_mode(self.app)
+
+    def notify(self):
+        """Wake the worker threads after a commit that stored jobs, starting
+        them on first use and again in forked children"""
+        if self.mode != "thread":
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._stop = threading.Event()
+                self._wake = threading.Event()
+                self._threads = [
+                    threading.Thread(
+                        target=JobWorker(self.app).run,
+                        args=(self._stop, self._wake),
+                        name=f"job-worker-{i}",
+                        daemon=True,
+                    )
+                    for i in range(self.app.config.get("JOBS_WORKERS", 2))
+                ]
+                for thread in self._threads:
+                    thread.start()
+                self._pid = os.getpid()
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """Stop the worker threads after their current job"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._pid = None
+
+    def depth(self):
+        """Stored jobs by (name, status), with the age in seconds of the
+        oldest due pending job of each name"""
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            sa.select(
+                jobs.c.name,
+                jobs.c.status,
+                sa.func.count(),
+                sa.func.min(jobs.c.run_at),
+            )
+            .where(jobs.c.status != DONE)
+            .group_by(jobs.c.name, jobs.c.status)
+        ).all()
+        depth = {(name, status): total for name, status, total, _ in rows}
+        oldest = {
+            name: max(0.0, (now - run_at).total_seconds())
+            for name, status, _, run_at in rows
+            if status == PENDING
+        }
+        return depth, oldest
+
+
+def _depth_collector(queue):
+    def collect():
+        if queue.mode == "inline":
+            return []
+        depth, oldest = queue.depth()
+        samples = [
+            ("gauge", "ideas_job_queue_depth", (("job", name), ("status", status)), n)
+            for (name, status), n in sorted(depth.items())
+        ]
+        samples += [
+            ("gauge", "ideas_job_oldest_pending_seconds", (("job", name),), age)
+            for name, age in sorted(oldest.items())
+        ]
+        return samples
+
+    return collect
+
+
+def init_jobs(app):
+    """Set up the job queue of an app from ``JOBS_MODE``"""
+    if jobs_mode(app) not in JOBS_MODES:
+        raise ValueError(f"Unknown JOBS_MODE: {app.config['JOBS_MODE']}")
+    queue = JobQueue(app)
+    app.extensions["job_queue"] = queue
+
+    metrics = app.extensions.get("metrics")
+    if metrics is not None:
+        # The table is shared, so the scraping process reads it for everyone
+        metrics.scrape_collectors.append(_depth_collector(queue))
+
+
+@sa.event.listens_for(db.session, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("jobs_enqueued", False):
+        queue = current_app.extensions.get("job_queue")
+        if queue is not None:
+            queue.notify()
+
+
+def job_queue():
+    """Get the job queue of the current application"""
+    return current_app.extensions["job_queue"]
@@ -3,8 +3,13 @@ import random
 from flask import flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
+from app.cache import cache_anonymous_page
+from app.conditional import conditional_render, listing_validators, thought_validators
 from app.main import main_bp
 from app.models import (
+    THOUGHT_LIST_COLUMNS,
+    THOUGHT_LIST_COLUMNS_WITH_AUTHOR,
+    WITH_AUTHOR,
     create_thought,
     delete_thought,
     get_public_thoughts,
@@ -86,7 +91,7 @@ def get_random_inspirational_quote():
 
 @main_bp.route("/")
 def index():
-    """Main page route"""
+    """Main page route (not cached: every visit draws a new quote)"""
     inspirational_quote = get_random_inspirational_quote()
     return render_template(
         "main/index.html", title="Welcome to Ideas", quote=inspirational_quote
@@ -94,6 +99,7 @@ def index():
 
 
 @main_bp.route("/about")
+@cache_anonymous_page
 def about():
     """About page route"""
     return render_template("main/about.html", title="About")
@@ -104,36 +110,46 @@ def about():
 @login_required
 def thoughts_list():
     """List all thoughts for the current user"""
-    page = request.args.get("page", 1, type=int)
     per_page = 10
 
-    # Get thoughts with database-level pagination
-    pagination = get_user_thoughts(current_user.id, page=page, per_page=per_page)
+    # Get thoughts with database-level keyset pagination
+    pagination = get_user_thoughts(
+        current_user.id,
+        per_page=per_page,
+        columns=THOUGHT_LIST_COLUMNS,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
-    return render_template(
+    return conditional_render(
+        listing_validators(pagination.items, pagination.total),
         "main/thoughts/list.html",
         thoughts=pagination.items,
         pagination=pagination,
-        page=page,
         per_page=per_page,
         title="My Thoughts",
     )
 
 
 @main_bp.route("/thoughts/public")
+@cache_anonymous_page
 def public_thoughts():
     """List all public thoughts"""
-    page = request.args.get("page", 1, type=int)
     per_page = 10
 
-    # Get public thoughts with database-level pagination
-    pagination = get_public_thoughts(page=page, per_page=per_page)
+    # Get public thoughts with database-level keyset pagination
+    pagination = get_public_thoughts(
+        per_page=per_page,
+        columns=THOUGHT_LIST_COLUMNS_WITH_AUTHOR,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
-    return render_template(
+    return conditional_render(
+        listing_validators(pagination.items, pagination.total),
         "main/thoughts/public.html",
         thoughts=pagination.items,
         pagination=pagination,
-        page=page,
         per_page=per_page,
         title="Public Thoughts",
     )
@@ -174,7 +190,7 @@ def thought_create():
 @main_bp.route("/thoughts/<thought_id>")
 def thought_detail(thought_id):
     """View a specific thought"""
-    thought = get_thought_by_id(thought_id)
+    thought = get_thought_by_id(thought_id, options=WITH_AUTHOR)
     if not thought:
         flash("Thought not found.", "error")
         return redirect(url_for("main.thoughts_list"))
@@ -186,8 +202,11 @@ def thought_detail(thought_id):
         flash("You don't have permission to view this thought.", "error")
         return redirect(url_for("main.thoughts_list"))
 
-    return render_template(
-        "main/thoughts/detail.html", thought=thought, title=thought.title
+    return conditional_render(
+        thought_validators(thought),
+        "main/thoughts/detail.html",
+        thought=thought,
+        title=thought.title,
     )
 
 
@@ -272,9 +291,16 @@ def thought_search():
         return redirect(url_for("main.thoughts_list"))
 
     # Search thoughts with database-level pagination
-    pagination = search_thoughts(current_user.id, query, page=page, per_page=per_page)
+    pagination = search_thoughts(
+        current_user.id,
+        query,
+        page=page,
+        per_page=per_page,
+        columns=THOUGHT_LIST_COLUMNS,
+    )
 
-    return render_template(
+    return conditional_render(
+        listing_validators(pagination.items, pagination.total),
         "main/thoughts/search.html",
         thoughts=pagination.items,
         pagination=pagination,
@@ -289,38 +315,50 @@ def thought_search():
 @login_required
 def thoughts_by_tag(tag):
     """List thoughts filtered by a specific tag for the current user"""
-    page = request.args.get("page", 1, type=int)
     per_page = 10
 
-    # Get thoughts by tag with database-level pagination
-    pagination = get_thoughts_by_tag(current_user.id, tag, page=page, per_page=per_page)
+    # Get thoughts by tag with database-level keyset pagination
+    pagination = get_thoughts_by_tag(
+        current_user.id,
+        tag,
+        per_page=per_page,
+        columns=THOUGHT_LIST_COLUMNS,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
-    return render_template(
+    return conditional_render(
+        listing_validators(pagination.items, pagination.total),
         "main/thoughts/tag.html",
         thoughts=pagination.items,
         pagination=pagination,
         tag=tag,
-        page=page,
         per_page=per_page,
         title=f"Thoughts tagged '{tag}'",
     )
 
 
 @main_bp.route("/thoughts/public/tag/<tag>")
+@cache_anonymous_page
 def public_thoughts_by_tag(tag):
     """List public thoughts filtered by a specific tag"""
-    page = request.args.get("page", 1, type=int)
     per_page = 10
 
-    # Get public thoughts by tag with database-level pagination
-    pagination = get_public_thoughts_by_tag(tag, page=page, per_page=per_page)
+    # Get public thoughts by tag with database-level keyset pagination
+    pagination = get_public_thoughts_by_tag(
+        tag,
+        per_page=per_page,
+        columns=THOUGHT_LIST_COLUMNS_WITH_AUTHOR,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
-    return render_template(
+    return conditional_render(
+        listing_validators(pagination.items, pagination.total),
         "main/thoughts/public_tag.html",
         thoughts=pagination.items,
         pagination=pagination,
         tag=tag,
-        page=page,
         per_page=per_page,
         title=f"Public thoughts tagged '{tag}'",
     )
@@ -0,0 +1,629 @@
+"""
+Request, SQL and template metrics in Prometheus text format.
+
+``init_metrics`` instruments the application with:
+
+* per-endpoint request counts and latency histograms
+* SQL statements per request and cumulative statement time, from SQLAlchemy
+  cursor events, plus a sample of the most recent statements slower than
+  ``METRICS_SLOW_QUERY_MS`` (default 100)
+* template render time, from Flask's template signals, and template load
+  (compile) time, recorded by ``app.templating``
+* connection pool checkout time and the number of checked out connections
+* the password hasher, user identity cache, response cache and rate limiter
+  counters
+* background job runs, wait and run time, and the depth of the job queue
+
+Each process records into its own in-memory registry. With ``METRICS_DIR``
+set, every process also writes a snapshot of its registry to that directory
+(at most every ``METRICS_FLUSH_INTERVAL`` seconds, default 1) and a scrape of
+``/api/metrics`` sums the snapshots of all worker processes, so any worker can
+answer for the whole server. Counters of exited processes are kept, gauges
+only count live processes. Empty the directory when the server is restarted.
+
+``METRICS_TOKEN`` optionally requires scrapers to send it as a bearer token,
+and ``METRICS_ENABLED = False`` turns the instrumentation off.
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+import sqlalchemy as sa
+from flask import (
+    before_render_template,
+    current_app,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+JOB_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "ideas_http_requests_total": (
+        "counter",
+        "HTTP requests by endpoint, method and status",
+        None,
+    ),
+    "ideas_http_request_duration_seconds": (
+        "histogram",
+        "Request latency by endpoint",
+        LATENCY_BUCKETS,
+    ),
+    "ideas_db_statements_per_request": (
+        "histogram",
+        "SQL statements issued per request by endpoint",
+        STATEMENT_BUCKETS,
+    ),
+    "ideas_db_statements_total": ("counter", "SQL statements by endpoint", None),
+    "ideas_db_seconds_total": (
+        "counter",
+        "Time spent executing SQL statements by endpoint",
+        None,
+    ),
+    "ideas_db_slow_queries_total": (
+        "counter",
+        "SQL statements slower than the slow query threshold",
+        None,
+    ),
+    "ideas_db_slow_query_seconds": (
+        "gauge",
+        "Duration of the most recent slow SQL statements",
+        None,
+    ),
+    "ideas_db_pool_checkout_seconds": (
+        "histogram",
+        "Time to check a connection out of the pool",
+        CHECKOUT_BUCKETS,
+    ),
+    "ideas_db_pool_checked_out": (
+        "gauge",
+        "Connections currently checked out of the pool",
+        None,
+    ),
+    "ideas_template_render_seconds": (
+        "histogram",
+        "Template render time by template",
+        LATENCY_BUCKETS,
+    ),
+    "ideas_template_load_seconds": (
+        "histogram",
+        "Time to load a template: compile it, or read its cached bytecode",
+        LATENCY_BUCKETS,
+    ),
+    "ideas_password_hash_jobs_total": (
+        "counter",
+        "Password hashing jobs by outcome",
+        None,
+    ),
+    "ideas_password_hash_seconds_total": (
+        "counter",
+        "Time spent waiting for password hashing jobs",
+        None,
+    ),
+    "ideas_password_hash_in_flight": (
+        "gauge",
+        "Password hashing jobs currently queued or running",
+        None,
+    ),
+    "ideas_user_cache_requests_total": (
+        "counter",
+        "User identity cache lookups by result",
+        None,
+    ),
+    "ideas_user_cache_invalidations_total": (
+        "counter",
+        "User identity cache invalidations",
+        None,
+    ),
+    "ideas_response_cache_requests_total": (
+        "counter",
+        "Response cache lookups by result",
+        None,
+    ),
+    "ideas_rate_limit_checks_total": (
+        "counter",
+        "Rate limit checks by endpoint, scope and result",
+        None,
+    ),
+    "ideas_jobs_total": ("counter", "Background job runs by job and result", None),
+    "ideas_job_wait_seconds": (
+        "histogram",
+        "Time from a background job being due to a worker starting it",
+        JOB_WAIT_BUCKETS,
+    ),
+    "ideas_job_duration_seconds": (
+        "histogram",
+        "Background job run time by job",
+        LATENCY_BUCKETS,
+    ),
+    "ideas_job_queue_depth": (
+        "gauge",
+        "Stored background jobs not yet done, by job and status",
+        None,
+    ),
+    "ideas_job_oldest_pending_seconds": (
+        "gauge",
+        "Age of the oldest due pending background job",
+        None,
+    ),
+}
+
+MAX_STATEMENT_LABEL = 200
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of one process"""
+
+    def __init__(self, slow_query_samples=20):
+        self._lock = threading.Lock()
+        self._slow_query_samples = slow_query_samples
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}
+        self._histograms = {}
+        self._slow_queries = deque(maxlen=self._slow_query_samples)
+
+    def _check_fork(self):
+        # A forked worker starts from its own zero, not from the parent's counts
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self._check_fork()
+            key = (name, tuple(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        buckets = METRICS[name][2]
+        with self._lock:
+            self._check_fork()
+            key = (name, tuple(labels))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def add_slow_query(self, statement, seconds, endpoint):
+        with self._lock:
+            self._check_fork()
+            self._slow_queries.append(
+                {
+                    "statement": statement,
+                    "seconds": seconds,
+                    "endpoint": endpoint,
+                    "at": time.time(),
+                }
+            )
+
+    def snapshot(self):
+        """JSON-serializable copy of the recorded values"""
+        with self._lock:
+            self._check_fork()
+            return {
+                "pid": self._pid,
+                "counters": [
+                    [name, list(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    [name, list(labels), list(buckets), total, count]
+                    for (name, labels), (buckets, total, count) in (
+                        self._histograms.items()
+                    )
+                ],
+                "gauges": [],
+                "slow_queries": list(self._slow_queries),
+            }
+
+
+class Metrics:
+    """Application instrumentation and multi-process aggregation"""
+
+    def __init__(
+        self,
+        directory=None,
+        flush_interval=1.0,
+        slow_query_seconds=0.1,
+        slow_query_samples=20,
+        logger=None,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.slow_query_seconds = slow_query_seconds
+        self.slow_query_samples = slow_query_samples
+        self.logger = logger or logging.getLogger(__name__)
+        self.registry = MetricsRegistry(slow_query_samples)
+        self.collectors = []
+        # Read only by the process answering a scrape, for values that are
+        # the same in every process (such as database-wide counts)
+        self.scrape_collectors = []
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def snapshot(self):
+        """This process' values, including those read from the collectors"""
+        snapshot = self.registry.snapshot()
+        for collect in self.collectors:
+            for kind, name, labels, value in collect():
+                snapshot["counters" if kind == "counter" else "gauges"].append(
+                    [name, list(labels), value]
+                )
+        return snapshot
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def flush(self, force=False):
+        """Write this process' snapshot to the metrics directory"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = now
+            snapshot = self.snapshot()
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self._path(snapshot["pid"]))
+            except OSError:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Snapshots of every process, this one read live"""
+        snapshots = [self.snapshot()]
+        if not self.directory:
+            return snapshots
+        own = self._path(os.getpid())
+        for entry in os.scandir(self.directory):
+            if not entry.name.startswith("metrics-") or entry.path == own:
+                continue
+            try:
+                with open(entry.path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """All processes' metrics in Prometheus text exposition format"""
+        merged = merge_snapshots(self.collect(), self.slow_query_samples)
+        for collect in self.scrape_collectors:
+            for kind, name, labels, value in collect():
+                kind = "counters" if kind == "counter" else "gauges"
+                merged[kind][(name, tuple(labels))] = value
+        return render_prometheus(merged)
+
+    # Recording
+    def record_statement(self, statement, seconds):
+        endpoint = ""
+        if has_request_context():
+            endpoint = _endpoint()
+            g._metrics_statements = g.get("_metrics_statements", 0) + 1
+            g._metrics_db_seconds = g.get("_metrics_db_seconds", 0.0) + seconds
+        if seconds >= self.slow_query_seconds:
+            statement = " ".join(statement.split())
+            self.registry.inc("ideas_db_slow_queries_total", [("endpoint", endpoint)])
+            self.registry.add_slow_query(statement, seconds, endpoint)
+            self.logger.warning(
+                "Slow query (%.1f ms) on %s: %s",
+                seconds * 1000,
+                endpoint or "-",
+                statement[:1000],
+            )
+
+    def record_request(self, response):
+        started = g.pop("_metrics_started", None)
+        if started is None:
+            return response
+        endpoint = _endpoint()
+        statements = g.pop("_metrics_statements", 0)
+        db_seconds = g.pop("_metrics_db_seconds", 0.0)
+        labels = [("endpoint", endpoint)]
+        self.registry.inc(
+            "ideas_http_requests_total",
+            labels
+            + [("method", request.method), ("status", str(response.status_code))],
+        )
+        self.registry.observe(
+            "ideas_http_request_duration_seconds",
+            time.perf_counter() - started,
+            labels,
+        )
+        self.registry.observe("ideas_db_statements_per_request", statements, labels)
+        if statements:
+            self.registry.inc("ideas_db_statements_total", labels, statements)
+            self.registry.inc("ideas_db_seconds_total", labels, db_seconds)
+        self.flush()
+        return response
+
+
+def _endpoint():
+    return request.endpoint or "unmatched"
+
+
+def merge_snapshots(snapshots, slow_query_samples=20):
+    """Sum the snapshots of several processes into one"""
+    counters, gauges, histograms, slow_queries = {}, {}, {}, []
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        if _is_alive(snapshot["pid"]):
+            for name, labels, value in snapshot["gauges"]:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+        slow_queries.extend(snapshot["slow_queries"])
+
+    slow_queries.sort(key=lambda sample: sample["at"])
+    for sample in slow_queries[len(slow_queries) - slow_query_samples :]:
+        labels = (
+            ("endpoint", sample["endpoint"]),
+            ("statement", sample["statement"][:MAX_STATEMENT_LABEL]),
+        )
+        gauges[("ideas_db_slow_query_seconds", labels)] = sample["seconds"]
+    return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def _is_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(merged):
+    """Format merged metrics in the Prometheus text exposition format"""
+    series = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for (name, labels), value in merged[kind].items():
+            series.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        if name not in series:
+            continue
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series[name]):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket in zip(buckets, counts):
+                cumulative += bucket
+                bucket_labels = labels + (("le", _number(float(bound))),)
+                lines.append(f"{name}_bucket{_labels(bucket_labels)} {cumulative}")
+            inf_labels = labels + (("le", "+Inf"),)
+            lines.append(f"{name}_bucket{_labels(inf_labels)} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+# Instrumentation
+def _instrument_engine(engine, metrics):
+    """Time statements and pool checkouts of an engine"""
+
+    @sa.event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("_metrics_started", []).append(time.perf_counter())
+
+    @sa.event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        started = conn.info["_metrics_started"].pop()
+        metrics.record_statement(statement, time.perf_counter() - started)
+
+    @sa.event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("_metrics_started"):
+            conn.info["_metrics_started"].pop()
+
+    # The pool has no event before a checkout, so its connect() is wrapped;
+    # dispose() replaces the pool, and the new one is wrapped again
+    @sa.event.listens_for(engine, "engine_disposed")
+    def engine_disposed(engine):
+        _time_checkouts(engine.pool, metrics)
+
+    _time_checkouts(engine.pool, metrics)
+
+    def collect():
+        checked_out = getattr(engine.pool, "checkedout", None)
+        if checked_out is not None:
+            yield "gauge", "ideas_db_pool_checked_out", (), checked_out()
+
+    metrics.collectors.append(collect)
+
+
+def _time_checkouts(pool, metrics):
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            metrics.registry.observe(
+                "ideas_db_pool_checkout_seconds", time.perf_counter() - started
+            )
+
+    pool.connect = timed_connect
+
+
+def _app_collector(app):
+    """Counters kept by other components of the application"""
+
+    def collect():
+        samples = []
+        hasher = app.extensions.get("password_hasher")
+        if hasher is not None:
+            stats = hasher.stats()
+            samples += [
+                ("counter", "ideas_password_hash_jobs_total", (("state", s),), stats[s])
+                for s in ("submitted", "completed", "failed", "rejected")
+            ]
+            samples.append(
+                (
+                    "counter",
+                    "ideas_password_hash_seconds_total",
+                    (),
+                    stats["seconds_total"],
+                )
+            )
+            samples.append(
+                ("gauge", "ideas_password_hash_in_flight", (), stats["in_flight"])
+            )
+
+        for name, key in (
+            ("ideas_user_cache_requests_total", "user_identity_cache"),
+            ("ideas_response_cache_requests_total", "response_cache"),
+        ):
+            cache = app.extensions.get(key)
+            if cache is not None:
+                stats = cache.stats()
+                samples.append(("counter", name, (("result", "hit"),), stats["hits"]))
+                samples.append(
+                    ("counter", name, (("result", "miss"),), stats["misses"])
+                )
+                if "invalidations" in stats:
+                    samples.append(
+                        (
+                            "counter",
+                            "ideas_user_cache_invalidations_total",
+                            (),
+                            stats["invalidations"],
+                        )
+                    )
+
+        limiter = app.extensions.get("rate_limiter")
+        if limiter is not None:
+            stats = limiter.stats()
+            for (endpoint, scope), checked in stats["checked"].items():
+                limited = stats["limited"].get((endpoint, scope), 0)
+                labels = (("endpoint", endpoint), ("scope", scope))
+                for result, value in (
+                    ("admitted", checked - limited),
+                    ("limited", limited),
+                ):
+                    samples.append(
+                        (
+                            "counter",
+                            "ideas_rate_limit_checks_total",
+                            labels + (("result", result),),
+                            value,
+                        )
+                    )
+        return samples
+
+    return collect
+
+
+def init_metrics(app, db):
+    """Instrument the application and create its metrics registry"""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    metrics = Metrics(
+        app.config.get("METRICS_DIR"),
+        app.config.get("METRICS_FLUSH_INTERVAL", 1.0),
+        app.config.get("METRICS_SLOW_QUERY_MS", 100) / 1000,
+        app.config.get("METRICS_SLOW_QUERY_SAMPLES", 20),
+        app.logger,
+    )
+    app.extensions["metrics"] = metrics
+    metrics.collectors.append(_app_collector(app))
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_engine(engine, metrics)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    app.after_request(metrics.record_request)
+
+    def before_render(sender, template, context, **extra):
+        g.setdefault("_metrics_templates", []).append(time.perf_counter())
+
+    def rendered(sender, template, context, **extra):
+        started = g.get("_metrics_templates")
+        if started:
+            metrics.registry.observe(
+                "ideas_template_render_seconds",
+                time.perf_counter() - started.pop(),
+                [("template", template.name or "")],
+            )
+
+    # Signal receivers are held weakly, so keep references on the registry
+    metrics.signal_receivers = (before_render, rendered)
+    before_render_template.connect(before_render, app)
+    template_rendered.connect(rendered, app)
+
+    if metrics.directory:
+        atexit.register(metrics.flush, force=True)
+
+
+def metrics():
+    """Get the metrics of the current application, or None when disabled"""
+    return current_app.extensions.get("metrics")
@@ -1,9 +1,17 @@
+import hashlib
+import re
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 
+import markupsafe
+import sqlalchemy as sa
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.cache import invalidate_public_pages
+from app.pagination import keyset_paginate, thought_count_cache
+from app.passwords import hash_password, needs_rehash, verify_password
 
 db = SQLAlchemy()
 
@@ -25,6 +33,10 @@ class User(UserMixin, db.Model):  # type: ignore[name-defined]
     )
     is_active = db.Column(db.Boolean, default=True)
 
+    __table_args__ = (
+        db.Index("ix_users_oauth_provider_oauth_id", "oauth_provider", "oauth_id"),
+    )
+
     def __init__(
         self, username, email, password=None, oauth_provider=None, oauth_id=None
     ):
@@ -36,10 +48,10 @@ class User(UserMixin, db.Model):  # type: ignore[name-defined]
             self.set_password(password)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def to_dict(self):
         return {
@@ -94,23 +106,192 @@ def get_user_by_oauth(oauth_provider, oauth_id):
     ).first()
 
 
+def update_user_password(user, password):
+    """Set a new password for a user"""
+    user.set_password(password)
+    db.session.commit()
+    return user
+
+
 def authenticate_user(username, password):
-    """Authenticate user with username and password"""
+    """Authenticate user with username and password.
+
+    A password hash made with an outdated method is upgraded to the current
+    ``PASSWORD_HASH_METHOD`` on successful login.
+    """
     user = get_user_by_username(username)
     if user and user.check_password(password):
+        if needs_rehash(user.password_hash):
+            update_user_password(user, password)
         return user
     return None
 
 
 def init_default_user():
     """Initialize a default admin user if no users exist"""
-    if User.query.count() == 0:
-        admin_user = create_user("admin", "admin@example.com", "admin123")
-        print(f"Created default admin user: {admin_user.username}")
-        return admin_user
+    if not db.session.query(User.query.exists()).scalar():
+        return create_user("admin", "admin@example.com", "admin123")
     return None
 
 
+def bootstrap_database(create_schema=True):
+    """Create any missing tables and the default admin user"""
+    if create_schema:
+        db.create_all()
+    return init_default_user()
+
+
+# Association table linking thoughts to their normalized tags. The composite
+# primary key serves thought -> tags lookups. The owner, visibility and
+# creation time are copied from the thought so that tag listings can be read
+# in order straight from the (tag_id, user_id|is_public, created_at) indexes.
+thought_tags = db.Table(
+    "thought_tags",
+    db.Column(
+        "thought_id",
+        db.String(36),
+        db.ForeignKey("thoughts.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column(
+        "tag_id",
+        db.Integer,
+        db.ForeignKey("tags.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("user_id", db.String(36), nullable=False),
+    db.Column("is_public", db.Boolean, nullable=False, default=False),
+    db.Column("created_at", db.DateTime, nullable=False),
+    db.Index(
+        "ix_thought_tags_tag_user_created",
+        "tag_id",
+        "user_id",
+        "created_at",
+        "thought_id",
+    ),
+    db.Index(
+        "ix_thought_tags_tag_public_created",
+        "tag_id",
+        "is_public",
+        "created_at",
+        "thought_id",
+    ),
+)
+
+
+# Tag frequencies, kept up to date by every write to thought_tags. Each scope
+# is either a user id (all of that user's thoughts) or PUBLIC_TAG_SCOPE (public
+# thoughts of every user), so a top-N list is a short index range scan.
+PUBLIC_TAG_SCOPE = "public"
+
+tag_counts = db.Table(
+    "tag_counts",
+    db.Column("scope", db.String(36), primary_key=True),
+    db.Column(
+        "tag_id",
+        db.Integer,
+        db.ForeignKey("tags.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("thought_count", db.Integer, nullable=False),
+)
+# In the order get_top_tags reads it, so ties need no extra sort
+db.Index(
+    "ix_tag_counts_scope_thought_count",
+    tag_counts.c.scope,
+    tag_counts.c.thought_count.desc(),
+    tag_counts.c.tag_id,
+)
+
+
+# Thoughts created per user, day and category, kept up to date by the thought
+# write helpers like tag_counts. Thoughts without a category are counted under
+# NO_CATEGORY. Statistics over a date range read one row per active day and
+# category instead of every thought.
+NO_CATEGORY = ""
+
+thought_daily_counts = db.Table(
+    "thought_daily_counts",
+    db.Column(
+        "user_id",
+        db.String(36),
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("day", db.Date, primary_key=True),
+    db.Column("category", db.String(50), primary_key=True),
+    db.Column("thought_count", db.Integer, nullable=False),
+)
+
+
+# Durable background jobs (see app/jobs.py). Workers pick due jobs in run_at
+# order from the (status, run_at) index. The idempotency key of a job stays
+# taken until the finished job is purged.
+jobs = db.Table(
+    "jobs",
+    db.Column("id", db.Integer, primary_key=True),
+    db.Column("name", db.String(100), nullable=False),
+    db.Column("payload", db.Text, nullable=False),
+    db.Column("idempotency_key", db.String(200), unique=True),
+    db.Column("status", db.String(20), nullable=False),
+    db.Column("attempts", db.Integer, nullable=False, default=0),
+    db.Column("max_attempts", db.Integer, nullable=False),
+    db.Column("run_at", db.DateTime, nullable=False),
+    db.Column("created_at", db.DateTime, nullable=False),
+    db.Column("locked_at", db.DateTime),
+    db.Column("locked_by", db.String(100)),
+    db.Column("finished_at", db.DateTime),
+    db.Column("last_error", db.Text),
+    db.Index("ix_jobs_status_run_at", "status", "run_at"),
+)
+
+
+class Tag(db.Model):  # type: ignore[name-defined]
+    """Tag model holding one row per distinct (lowercased) tag name"""
+
+    __tablename__ = "tags"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"<Tag {self.name}>"
+
+
+def parse_tags(tags):
+    """Split a comma-separated tag string into unique, stripped tag names"""
+    if not tags:
+        return []
+    names = []
+    seen = set()
+    for raw in tags.split(","):
+        name = raw.strip()[:100]
+        if name and normalize_tag(name) not in seen:
+            seen.add(normalize_tag(name))
+            names.append(name)
+    return names
+
+
+def normalize_tag(name):
+    """Normalize a tag name for storage and lookup"""
+    return name.strip().lower()
+
+
+# Characters of content kept in Thought.excerpt for list pages
+EXCERPT_LENGTH = 100
+
+
+def make_excerpt(content):
+    """The start of ``content`` shown on list pages, with "..." if cut"""
+    content = content or ""
+    if len(content) > EXCERPT_LENGTH:
+        return content[:EXCERPT_LENGTH] + "..."
+    return content
+
+
 class Thought(db.Model):  # type: ignore[name-defined]
     """Thought model for storing ideas and thoughts"""
 
@@ -119,8 +300,12 @@ class Thought(db.Model):  # type: ignore[name-defined]
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    # Kept in step with content, so list pages never need to load content
+    excerpt = db.Column(
+        db.String(EXCERPT_LENGTH + 3), nullable=False, default="", server_default=""
+    )
     category = db.Column(db.String(50))  # e.g., 'idea', 'note', 'inspiration', 'todo'
-    tags = db.Column(db.String(500))  # comma-separated tags
+    tags = db.Column(db.String(500))  # comma-separated tags, as displayed
     is_public = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
@@ -130,6 +315,14 @@ class Thought(db.Model):  # type: ignore[name-defined]
     # Foreign key to User
     user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
     user = db.relationship("User", backref=db.backref("thoughts", lazy=True))
+    tag_objects = db.relationship(
+        "Tag", secondary=thought_tags, lazy=True, viewonly=True
+    )
+
+    __table_args__ = (
+        db.Index("ix_thoughts_user_id_created_at", "user_id", "created_at", "id"),
+        db.Index("ix_thoughts_is_public_created_at", "is_public", "created_at", "id"),
+    )
 
     def __init__(
         self, title, content, user_id, category=None, tags=None, is_public=False
@@ -141,23 +334,565 @@ class Thought(db.Model):  # type: ignore[name-defined]
         self.tags = tags
         self.is_public = is_public
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "content": self.content,
-            "category": self.category,
-            "tags": [tag.strip() for tag in self.tags.split(",")] if self.tags else [],
-            "is_public": self.is_public,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "user_id": self.user_id,
+    @sa.orm.validates("content")
+    def _update_excerpt(self, key, content):
+        self.excerpt = make_excerpt(content)
+        return content
+
+    def to_dict(self, fields=None):
+        """Serialize the thought, optionally only the given ``THOUGHT_FIELDS``"""
+        serializers = {
+            "id": lambda: self.id,
+            "title": lambda: self.title,
+            "content": lambda: self.content,
+            "category": lambda: self.category,
+            "tags": lambda: self.tag_names,
+            "is_public": lambda: self.is_public,
+            "created_at": lambda: (
+                self.created_at.isoformat() if self.created_at else None
+            ),
+            "updated_at": lambda: (
+                self.updated_at.isoformat() if self.updated_at else None
+            ),
+            "user_id": lambda: self.user_id,
         }
+        return {field: serializers[field]() for field in fields or THOUGHT_FIELDS}
+
+    @property
+    def tag_names(self):
+        return parse_tags(self.tags)
 
     def __repr__(self):
         return f"<Thought {self.title}>"
 
 
+# Fields of Thought.to_dict, in output order
+THOUGHT_FIELDS = (
+    "id",
+    "title",
+    "content",
+    "category",
+    "tags",
+    "is_public",
+    "created_at",
+    "updated_at",
+    "user_id",
+)
+
+
+# Loads each thought's author in the same query, for pages that show it
+WITH_AUTHOR = (sa.orm.joinedload(Thought.user, innerjoin=True),)
+
+# Columns read by the thought list templates. Listing helpers given
+# ``columns=THOUGHT_LIST_COLUMNS`` return plain result rows with these
+# attributes instead of Thought objects, so list pages neither load the full
+# ``content`` nor build and track ORM instances.
+THOUGHT_LIST_COLUMNS = (
+    Thought.id,
+    Thought.title,
+    Thought.excerpt,
+    Thought.category,
+    Thought.tags,
+    Thought.is_public,
+    Thought.created_at,
+    Thought.updated_at,
+    Thought.user_id,
+)
+# The same plus the author's username as ``author``, for public listings
+THOUGHT_LIST_COLUMNS_WITH_AUTHOR = (
+    *THOUGHT_LIST_COLUMNS,
+    sa.select(User.username)
+    .where(User.id == Thought.user_id)
+    .scalar_subquery()
+    .label("author"),
+)
+
+
+def thought_field_options(fields):
+    """Query options loading only the columns needed for ``fields``.
+
+    The primary key and ``created_at`` are always loaded because pagination
+    cursors are built from them.
+    """
+    if not fields:
+        return ()
+    columns = {"id", "created_at", *fields}
+    return (sa.orm.load_only(*(getattr(Thought, name) for name in sorted(columns))),)
+
+
+# Full-text search index (SQLite FTS5). The virtual table is not part of the
+# ORM metadata, so it is described here as a lightweight table for Core
+# statements and created alongside the thoughts table. Each thought's entry
+# has the rowid ``search_rowid(thought.id)``: FTS5 only looks rows up by rowid,
+# so finding an entry by its UNINDEXED ``thought_id`` would scan the index.
+thought_search_index = sa.table(
+    "thoughts_fts",
+    sa.column("rowid"),
+    sa.column("thought_id"),
+    sa.column("user_id"),
+    sa.column("title"),
+    sa.column("content"),
+    sa.column("tags"),
+)
+
+THOUGHT_SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS thoughts_fts USING fts5("
+    "thought_id UNINDEXED, user_id UNINDEXED, title, content, tags, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+sa.event.listen(
+    Thought.__table__,
+    "after_create",
+    sa.DDL(THOUGHT_SEARCH_INDEX_DDL).execute_if(dialect="sqlite"),
+)
+sa.event.listen(
+    Thought.__table__,
+    "before_drop",
+    sa.DDL("DROP TABLE IF EXISTS thoughts_fts").execute_if(dialect="sqlite"),
+)
+
+# bm25() weights per FTS column: title matches rank above tag and body matches
+SEARCH_RANK_WEIGHTS = (0.0, 0.0, 10.0, 1.0, 5.0)
+SNIPPET_START, SNIPPET_END = "\x02", "\x03"
+
+
+def search_index_enabled():
+    """Check if the full-text search index is available for the database"""
+    return db.engine.dialect.name == "sqlite"
+
+
+def search_rowid(thought_id):
+    """Rowid of a thought's search index entry, derived from its id.
+
+    ``thoughts.rowid`` cannot be used since ``VACUUM`` may renumber it. The
+    63 bits of a SHA-256 of the id collide with negligible probability.
+    """
+    digest = hashlib.sha256(thought_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def _search_index_values(thought):
+    return {
+        "rowid": search_rowid(thought.id),
+        "thought_id": thought.id,
+        "user_id": thought.user_id,
+        "title": thought.title,
+        "content": thought.content,
+        "tags": thought.tags or "",
+    }
+
+
+def _index_thought(thought):
+    """Add or refresh a thought in the search index (caller commits)"""
+    if not search_index_enabled():
+        return
+    _unindex_thought(thought.id)
+    db.session.execute(
+        sa.insert(thought_search_index).values(**_search_index_values(thought))
+    )
+
+
+def _unindex_thought(thought_id):
+    """Remove a thought from the search index (caller commits)"""
+    if not search_index_enabled():
+        return
+    db.session.execute(
+        sa.delete(thought_search_index).where(
+            thought_search_index.c.rowid == search_rowid(thought_id)
+        )
+    )
+
+
+def rebuild_search_index(batch_size=1000):
+    """Recreate the search index from the thoughts table"""
+    db.session.execute(sa.text("DROP TABLE IF EXISTS thoughts_fts"))
+    db.session.execute(sa.text(THOUGHT_SEARCH_INDEX_DDL))
+
+    indexed = 0
+    batch = []
+    for thought in Thought.query.yield_per(batch_size):
+        batch.append(_search_index_values(thought))
+        if len(batch) >= batch_size:
+            db.session.execute(sa.insert(thought_search_index), batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(sa.insert(thought_search_index), batch)
+        indexed += len(batch)
+
+    db.session.execute(
+        sa.text("INSERT INTO thoughts_fts(thoughts_fts) VALUES ('optimize')")
+    )
+    db.session.commit()
+    return indexed
+
+
+def build_search_match(query):
+    """Turn free-text user input into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so operators and punctuation typed
+    by the user are never interpreted as FTS syntax.
+    """
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _render_snippet(raw):
+    """Escape a raw FTS snippet and turn the match markers into <mark> tags"""
+    escaped = str(markupsafe.escape(raw))
+    return markupsafe.Markup(
+        escaped.replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+    )
+
+
+# Tag helper functions
+def get_or_create_tags(names):
+    """Get Tag rows for the given names, creating any that do not exist"""
+    normalized = list(dict.fromkeys(normalize_tag(name) for name in names))
+    if not normalized:
+        return []
+    existing = {
+        tag.name: tag for tag in Tag.query.filter(Tag.name.in_(normalized)).all()
+    }
+    tags = []
+    for name in normalized:
+        tag = existing.get(name)
+        if tag is None:
+            tag = Tag(name=name)
+            db.session.add(tag)
+        tags.append(tag)
+    return tags
+
+
+def tag_count_deltas(links, sign=1):
+    """Count changes per (scope, tag_id) for added (+1) or removed (-1) links.
+
+    ``links`` are thought_tags rows (mappings with ``tag_id``, ``user_id`` and
+    ``is_public``).
+    """
+    deltas = {}
+    for link in links:
+        scopes = [link["user_id"]]
+        if link["is_public"]:
+            scopes.append(PUBLIC_TAG_SCOPE)
+        for scope in scopes:
+            key = (scope, link["tag_id"])
+            deltas[key] = deltas.get(key, 0) + sign
+    return deltas
+
+
+def _upsert(table):
+    """INSERT ... ON CONFLICT for the current database, if it supports it"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert(table)
+
+
+def apply_tag_count_deltas(deltas):
+    """Add count changes to tag_counts (caller commits)"""
+    _apply_count_deltas(tag_counts, ("scope", "tag_id"), deltas)
+
+
+def _apply_count_deltas(table, key_names, deltas):
+    """Add ``{key tuple: delta}`` changes to the thought_count column of a
+    rollup table keyed by ``key_names``; rows that reach zero are deleted"""
+    changes = [
+        {**dict(zip(key_names, key)), "delta": delta}
+        for key, delta in sorted(deltas.items())
+        if delta
+    ]
+    if not changes:
+        return
+    column = table.c.thought_count
+    increments = [c for c in changes if c["delta"] > 0]
+    if increments:
+        insert = _upsert(table)
+        if insert is not None:
+            db.session.execute(
+                insert.values(
+                    {
+                        **{name: sa.bindparam(name) for name in key_names},
+                        "thought_count": sa.bindparam("delta"),
+                    }
+                ).on_conflict_do_update(
+                    index_elements=[table.c[name] for name in key_names],
+                    set_={column: column + insert.excluded.thought_count},
+                ),
+                increments,
+            )
+        else:
+            for change in increments:
+                _add_count(table, key_names, change)
+
+    decrements = [c for c in changes if c["delta"] < 0]
+    if decrements:
+        matches = sa.and_(
+            *(table.c[name] == sa.bindparam(f"b_{name}") for name in key_names)
+        )
+        params = [
+            {f"b_{name}": value for name, value in change.items()}
+            for change in decrements
+        ]
+        db.session.execute(
+            sa.update(table)
+            .where(matches)
+            .values(thought_count=column + sa.bindparam("b_delta")),
+            params,
+        )
+        db.session.execute(sa.delete(table).where(matches, column <= 0), params)
+
+
+def _add_count(table, key_names, change):
+    """Portable update-then-insert for databases without ON CONFLICT"""
+    column = table.c.thought_count
+    updated = db.session.execute(
+        sa.update(table)
+        .where(*(table.c[name] == change[name] for name in key_names))
+        .values(thought_count=column + change["delta"])
+    )
+    if not updated.rowcount:
+        db.session.execute(
+            sa.insert(table).values(
+                {
+                    **{name: change[name] for name in key_names},
+                    "thought_count": change["delta"],
+                }
+            )
+        )
+
+
+def _thought_tag_links(thought_id):
+    return (
+        db.session.execute(
+            sa.select(
+                thought_tags.c.tag_id, thought_tags.c.user_id, thought_tags.c.is_public
+            ).where(thought_tags.c.thought_id == thought_id)
+        )
+        .mappings()
+        .all()
+    )
+
+
+def rebuild_tag_counts():
+    """Recompute tag_counts from thought_tags; returns the number of rows"""
+    db.session.execute(sa.delete(tag_counts))
+    count = sa.func.count().label("thought_count")
+    db.session.execute(
+        sa.insert(tag_counts).from_select(
+            ["scope", "tag_id", "thought_count"],
+            sa.select(thought_tags.c.user_id, thought_tags.c.tag_id, count).group_by(
+                thought_tags.c.user_id, thought_tags.c.tag_id
+            ),
+        )
+    )
+    db.session.execute(
+        sa.insert(tag_counts).from_select(
+            ["scope", "tag_id", "thought_count"],
+            sa.select(sa.literal(PUBLIC_TAG_SCOPE), thought_tags.c.tag_id, count)
+            .where(thought_tags.c.is_public.is_(True))
+            .group_by(thought_tags.c.tag_id),
+        )
+    )
+    db.session.commit()
+    return db.session.execute(
+        sa.select(sa.func.count()).select_from(tag_counts)
+    ).scalar()
+
+
+def get_top_tags(user_id=None, limit=20):
+    """Most used tags with their thought counts, most frequent first.
+
+    Without ``user_id`` the counts are over public thoughts of every user.
+    Reads at most ``limit`` rows of the tag_counts index.
+    """
+    scope = user_id or PUBLIC_TAG_SCOPE
+    return db.session.execute(
+        sa.select(Tag.name, tag_counts.c.thought_count)
+        .join(Tag, Tag.id == tag_counts.c.tag_id)
+        .where(tag_counts.c.scope == scope)
+        .order_by(tag_counts.c.thought_count.desc(), tag_counts.c.tag_id)
+        .limit(limit)
+    ).all()
+
+
+def daily_count_deltas(rows, sign=1):
+    """Count changes per (user_id, day, category) for created (+1) or deleted
+    (-1) thoughts; ``rows`` are mappings with ``user_id``, ``created_at`` and
+    ``category``"""
+    deltas = {}
+    for row in rows:
+        key = (row["user_id"], row["created_at"].date(), row["category"] or NO_CATEGORY)
+        deltas[key] = deltas.get(key, 0) + sign
+    return deltas
+
+
+def apply_daily_count_deltas(deltas):
+    """Add count changes to thought_daily_counts (caller commits)"""
+    _apply_count_deltas(thought_daily_counts, ("user_id", "day", "category"), deltas)
+
+
+def _daily_count_row(thought):
+    return {
+        "user_id": thought.user_id,
+        "created_at": thought.created_at,
+        "category": thought.category,
+    }
+
+
+def rebuild_daily_counts():
+    """Recompute thought_daily_counts from thoughts; returns the number of rows"""
+    db.session.execute(sa.delete(thought_daily_counts))
+    if db.session.get_bind().dialect.name == "sqlite":
+        day = sa.func.date(Thought.created_at)
+    else:
+        day = sa.cast(Thought.created_at, sa.Date)
+    category = sa.func.coalesce(Thought.category, NO_CATEGORY)
+    db.session.execute(
+        sa.insert(thought_daily_counts).from_select(
+            ["user_id", "day", "category", "thought_count"],
+            sa.select(Thought.user_id, day, category, sa.func.count()).group_by(
+                Thought.user_id, day, category
+            ),
+        )
+    )
+    db.session.commit()
+    return db.session.execute(
+        sa.select(sa.func.count()).select_from(thought_daily_counts)
+    ).scalar()
+
+
+def get_user_stats(user_id, days=365, today=None):
+    """Thought statistics of a user from the daily rollups.
+
+    Returns a dict with the all-time ``total``, the all-time count per
+    ``category`` (``None`` for uncategorized thoughts, most used first) and
+    the ``daily`` counts of the ``days`` days up to ``today`` (UTC) as a list
+    of ``(date, count)`` pairs, including days without thoughts. Reads one row
+    per active day and category, however many thoughts there are.
+    """
+    today = today or datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    count = sa.func.sum(thought_daily_counts.c.thought_count)
+    by_category = db.session.execute(
+        sa.select(thought_daily_counts.c.category, count)
+        .where(thought_daily_counts.c.user_id == user_id)
+        .group_by(thought_daily_counts.c.category)
+        .order_by(count.desc(), thought_daily_counts.c.category)
+    ).all()
+    active_days = dict(
+        db.session.execute(
+            sa.select(thought_daily_counts.c.day, count)
+            .where(
+                thought_daily_counts.c.user_id == user_id,
+                thought_daily_counts.c.day.between(first_day, today),
+            )
+            .group_by(thought_daily_counts.c.day)
+        ).all()
+    )
+    return {
+        "total": sum(total for _, total in by_category),
+        "categories": [(category or None, total) for category, total in by_category],
+        "daily": [
+            (day, active_days.get(day, 0))
+            for day in (first_day + timedelta(days=i) for i in range(days))
+        ],
+    }
+
+
+def set_thought_tags(thought, tags):
+    """Set a thought's tag string and its normalized tag links.
+
+    The thought must already be in the session; the caller commits.
+    """
+    names = parse_tags(tags)
+    thought.tags = ", ".join(names) if names else None
+    return sync_thought_tags(thought)
+
+
+def sync_thought_tags(thought):
+    """Rewrite the thought_tags rows of a thought from its current state.
+
+    Returns the resulting tag count changes, for the caller to apply.
+    """
+    db.session.flush()
+    deltas = tag_count_deltas(_thought_tag_links(thought.id), -1)
+    db.session.execute(
+        sa.delete(thought_tags).where(thought_tags.c.thought_id == thought.id)
+    )
+    tags = get_or_create_tags(thought.tag_names)
+    if tags:
+        db.session.flush()
+        links = [
+            {
+                "thought_id": thought.id,
+                "tag_id": tag.id,
+                "user_id": thought.user_id,
+                "is_public": bool(thought.is_public),
+                "created_at": thought.created_at,
+            }
+            for tag in tags
+        ]
+        db.session.execute(sa.insert(thought_tags), links)
+        for key, delta in tag_count_deltas(links).items():
+            deltas[key] = deltas.get(key, 0) + delta
+    db.session.expire(thought, ["tag_objects"])
+    return deltas
+
+
+def _defer_thought_work(thought, tag_deltas, daily_deltas, deleted=False):
+    """Queue the search index refresh and count changes that follow a thought
+    write (caller commits)"""
+    from app.jobs import enqueue  # app.jobs imports this module
+
+    version = "deleted" if deleted else thought.updated_at.isoformat()
+    enqueue(
+        "refresh_search_index",
+        {"thought_id": thought.id},
+        key=f"refresh_search_index:{thought.id}:{version}",
+    )
+    tag_changes = [[*key, delta] for key, delta in sorted(tag_deltas.items()) if delta]
+    daily_changes = [
+        [user_id, day.isoformat(), category, delta]
+        for (user_id, day, category), delta in sorted(daily_deltas.items())
+        if delta
+    ]
+    if tag_changes or daily_changes:
+        enqueue(
+            "apply_count_changes",
+            {"tags": tag_changes, "daily": daily_changes},
+            key=f"apply_count_changes:{thought.id}:{version}",
+        )
+
+
+def refresh_search_index(payload):
+    """Job: bring the search index entry of ``payload["thought_id"]`` up to
+    date with the thought, or remove it if the thought is gone"""
+    thought = get_thought_by_id(payload["thought_id"])
+    if thought is None:
+        _unindex_thought(payload["thought_id"])
+    else:
+        _index_thought(thought)
+
+
+def apply_count_changes(payload):
+    """Job: apply the tag and daily count changes of a thought write"""
+    apply_tag_count_deltas(
+        {(scope, tag_id): delta for scope, tag_id, delta in payload["tags"]}
+    )
+    apply_daily_count_deltas(
+        {
+            (user_id, datetime.strptime(day, "%Y-%m-%d").date(), category): delta
+            for user_id, day, category, delta in payload["daily"]
+        }
+    )
+
+
 # Thought helper functions
 def create_thought(title, content, user_id, category=None, tags=None, is_public=False):
     """Create a new thought"""
@@ -166,29 +901,118 @@ def create_thought(title, content, user_id, category=None, tags=None, is_public=
         content=content,
         user_id=user_id,
         category=category,
-        tags=tags,
         is_public=is_public,
     )
     db.session.add(thought)
+    tag_deltas = set_thought_tags(thought, tags)
+    _defer_thought_work(
+        thought, tag_deltas, daily_count_deltas([_daily_count_row(thought)])
+    )
     db.session.commit()
+    thought_count_cache().clear()
+    if thought.is_public:
+        invalidate_public_pages()
     return thought
 
 
-def get_thought_by_id(thought_id):
+def get_thought_by_id(thought_id, options=()):
     """Get thought by ID"""
-    return Thought.query.get(thought_id)
+    return db.session.get(Thought, thought_id, options=options)
+
+
+def get_thoughts_by_ids(thought_ids, viewer_id=None, options=()):
+    """Get the thoughts with the given IDs visible to a viewer in one query.
+
+    A thought is visible if it is public or owned by ``viewer_id``. Results
+    follow the order of ``thought_ids``; unknown or hidden IDs are left out.
+    """
+    thought_ids = list(dict.fromkeys(thought_ids))
+    if not thought_ids:
+        return []
+    visible = Thought.is_public.is_(True)
+    if viewer_id is not None:
+        visible = sa.or_(visible, Thought.user_id == viewer_id)
+    thoughts = (
+        Thought.query.options(*options)
+        .filter(Thought.id.in_(thought_ids), visible)
+        .all()
+    )
+    by_id = {thought.id: thought for thought in thoughts}
+    return [by_id[thought_id] for thought_id in thought_ids if thought_id in by_id]
 
 
-def get_user_thoughts(user_id, page=1, per_page=10):
+def _paginate_thoughts(
+    query,
+    count_key,
+    page=None,
+    per_page=10,
+    after=None,
+    before=None,
+    sort_columns=(Thought.created_at, Thought.id),
+    options=(),
+    columns=None,
+):
+    """Paginate a thought query.
+
+    By default pages are keyset-paginated with ``after``/``before`` cursors and
+    a cached total. Passing ``page`` selects classic OFFSET pagination.
+    ``options`` are ORM loader options for the page query, e.g. from
+    ``thought_field_options``. ``columns`` (e.g. ``THOUGHT_LIST_COLUMNS``)
+    selects only those columns; the page items are then result rows and
+    ``options`` are not used.
+    """
+    # Counting only needs the key, not every column of the rows
+    count_query = query.with_entities(sort_columns[1])
+    query = query.with_entities(*columns) if columns else query.options(*options)
+    if page is not None:
+        created_at, item_id = sort_columns
+        return query.order_by(created_at.desc(), item_id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+
+    total = thought_count_cache().get(count_key, count_query)
+    return keyset_paginate(
+        query,
+        sort_columns,
+        after=after,
+        before=before,
+        per_page=per_page,
+        total=total,
+    )
+
+
+def get_user_thoughts(
+    user_id, page=None, per_page=10, after=None, before=None, options=(), columns=None
+):
     """Get thoughts for a user with pagination"""
-    query = Thought.query.filter_by(user_id=user_id).order_by(Thought.created_at.desc())
-    return query.paginate(page=page, per_page=per_page, error_out=False)
+    query = Thought.query.filter_by(user_id=user_id)
+    return _paginate_thoughts(
+        query,
+        ("user", user_id),
+        page,
+        per_page,
+        after=after,
+        before=before,
+        options=options,
+        columns=columns,
+    )
 
 
-def get_public_thoughts(page=1, per_page=10):
-    """Get public thoughts with pagination"""
-    query = Thought.query.filter_by(is_public=True).order_by(Thought.created_at.desc())
-    return query.paginate(page=page, per_page=per_page, error_out=False)
+def get_public_thoughts(
+    page=None, per_page=10, after=None, before=None, options=WITH_AUTHOR, columns=None
+):
+    """Get public thoughts with pagination, with their authors by default"""
+    query = Thought.query.filter_by(is_public=True)
+    return _paginate_thoughts(
+        query,
+        ("public",),
+        page,
+        per_page,
+        after=after,
+        before=before,
+        options=options,
+        columns=columns,
+    )
 
 
 def update_thought(
@@ -197,17 +1021,26 @@ def update_thought(
     """Update a thought"""
     thought = get_thought_by_id(thought_id)
     if thought:
+        was_public = thought.is_public
+        deltas = daily_count_deltas([_daily_count_row(thought)], -1)
         if title is not None:
             thought.title = title
         if content is not None:
             thought.content = content
         if category is not None:
-            thought.category = category
+            thought.category = category or None
         if tags is not None:
-            thought.tags = tags
+            thought.tags = ", ".join(parse_tags(tags)) or None
         if is_public is not None:
             thought.is_public = is_public
+        tag_deltas = sync_thought_tags(thought)
+        for key, delta in daily_count_deltas([_daily_count_row(thought)]).items():
+            deltas[key] = deltas.get(key, 0) + delta
+        _defer_thought_work(thought, tag_deltas, deltas)
         db.session.commit()
+        thought_count_cache().clear()
+        if was_public or thought.is_public:
+            invalidate_public_pages()
     return thought
 
 
@@ -215,14 +1048,91 @@ def delete_thought(thought_id):
     """Delete a thought"""
     thought = get_thought_by_id(thought_id)
     if thought:
+        was_public = thought.is_public
+        _defer_thought_work(
+            thought,
+            tag_count_deltas(_thought_tag_links(thought.id), -1),
+            daily_count_deltas([_daily_count_row(thought)], -1),
+            deleted=True,
+        )
+        db.session.execute(
+            sa.delete(thought_tags).where(thought_tags.c.thought_id == thought.id)
+        )
         db.session.delete(thought)
         db.session.commit()
+        thought_count_cache().clear()
+        if was_public:
+            invalidate_public_pages()
         return True
     return False
 
 
-def search_thoughts(user_id, query, page=1, per_page=10):
-    """Search thoughts by title or content with pagination"""
+def search_thoughts(user_id, query, page=1, per_page=10, columns=None, options=()):
+    """Search thoughts by title, content or tags with pagination.
+
+    Uses the FTS5 index when available: results are ordered by relevance and
+    each thought on the page gets a highlighted ``search_snippet``. Other
+    databases fall back to ILIKE matching ordered by date. With ``columns``
+    only those columns are loaded and the items are plain objects with those
+    attributes (and ``search_snippet``) instead of Thought objects; otherwise
+    ``options`` (e.g. from ``thought_field_options``) apply to the query.
+
+    Unlike the listings, search pages by OFFSET: results are ordered by their
+    bm25 rank, which is computed per query and not stored, so there is no
+    indexed sort key a keyset cursor could resume from. Deep pages are rare
+    since the most relevant results come first.
+    """
+    if not search_index_enabled():
+        return _search_thoughts_ilike(user_id, query, page, per_page, columns, options)
+
+    match = build_search_match(query)
+    if not match:
+        return Thought.query.filter(sa.false()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+
+    fts = sa.literal_column("thoughts_fts")
+    query_filter = (
+        Thought.query.join(
+            thought_search_index, thought_search_index.c.thought_id == Thought.id
+        )
+        .filter(Thought.user_id == user_id, fts.op("MATCH")(match))
+        .order_by(sa.func.bm25(fts, *SEARCH_RANK_WEIGHTS), Thought.created_at.desc())
+    )
+    if columns:
+        query_filter = query_filter.with_entities(*columns)
+    else:
+        query_filter = query_filter.options(*options)
+    pagination = query_filter.paginate(page=page, per_page=per_page, error_out=False)
+
+    if pagination.items:
+        snippets = db.session.execute(
+            sa.select(
+                thought_search_index.c.thought_id,
+                sa.func.snippet(fts, 3, SNIPPET_START, SNIPPET_END, "…", 24),
+            ).where(
+                fts.op("MATCH")(match),
+                thought_search_index.c.thought_id.in_(
+                    [thought.id for thought in pagination.items]
+                ),
+            )
+        ).all()
+        snippet_map = dict(snippets)
+        if columns:
+            # Result rows are read-only; copy them to attach the snippet
+            pagination.items = [
+                SimpleNamespace(**row._mapping) for row in pagination.items
+            ]
+        for thought in pagination.items:
+            thought.search_snippet = _render_snippet(snippet_map.get(thought.id, ""))
+
+    return pagination
+
+
+def _search_thoughts_ilike(
+    user_id, query, page=1, per_page=10, columns=None, options=()
+):
+    """Search thoughts with ILIKE scans (databases without FTS5)"""
     search_term = f"%{query}%"
     query_filter = Thought.query.filter(
         Thought.user_id == user_id,
@@ -232,25 +1142,71 @@ def search_thoughts(user_id, query, page=1, per_page=10):
             Thought.tags.ilike(search_term),
         ),
     ).order_by(Thought.created_at.desc())
+    if columns:
+        query_filter = query_filter.with_entities(*columns)
+    else:
+        query_filter = query_filter.options(*options)
 
     return query_filter.paginate(page=page, per_page=per_page, error_out=False)
 
 
-def get_thoughts_by_tag(user_id, tag, page=1, per_page=10):
+def _thoughts_with_tag(tag):
+    """Query thoughts linked to the given tag through the tag index"""
+    tag_id = sa.select(Tag.id).where(Tag.name == normalize_tag(tag)).scalar_subquery()
+    return Thought.query.join(
+        thought_tags, thought_tags.c.thought_id == Thought.id
+    ).filter(thought_tags.c.tag_id == tag_id)
+
+
+TAG_SORT_COLUMNS = (thought_tags.c.created_at, thought_tags.c.thought_id)
+
+
+def get_thoughts_by_tag(
+    user_id,
+    tag,
+    page=None,
+    per_page=10,
+    after=None,
+    before=None,
+    options=(),
+    columns=None,
+):
     """Get thoughts filtered by a specific tag for a user"""
-    tag_pattern = f"%{tag}%"
-    query_filter = Thought.query.filter(
-        Thought.user_id == user_id, Thought.tags.ilike(tag_pattern)
-    ).order_by(Thought.created_at.desc())
+    query_filter = _thoughts_with_tag(tag).filter(thought_tags.c.user_id == user_id)
 
-    return query_filter.paginate(page=page, per_page=per_page, error_out=False)
+    return _paginate_thoughts(
+        query_filter,
+        ("user_tag", user_id, normalize_tag(tag)),
+        page,
+        per_page,
+        after=after,
+        before=before,
+        sort_columns=TAG_SORT_COLUMNS,
+        options=options,
+        columns=columns,
+    )
 
 
-def get_public_thoughts_by_tag(tag, page=1, per_page=10):
-    """Get public thoughts filtered by a specific tag"""
-    tag_pattern = f"%{tag}%"
-    query_filter = Thought.query.filter(
-        Thought.is_public.is_(True), Thought.tags.ilike(tag_pattern)
-    ).order_by(Thought.created_at.desc())
+def get_public_thoughts_by_tag(
+    tag,
+    page=None,
+    per_page=10,
+    after=None,
+    before=None,
+    options=WITH_AUTHOR,
+    columns=None,
+):
+    """Get public thoughts filtered by a specific tag, with their authors"""
+    query_filter = _thoughts_with_tag(tag).filter(thought_tags.c.is_public.is_(True))
 
-    return query_filter.paginate(page=page, per_page=per_page, error_out=False)
+    return _paginate_thoughts(
+        query_filter,
+        ("public_tag", normalize_tag(tag)),
+        page,
+        per_page,
+        after=after,
+        before=before,
+        sort_columns=TAG_SORT_COLUMNS,
+        options=options,
+        columns=columns,
+    )
@@ -1,10 +1,36 @@
+"""
+Google OAuth client.
+
+All calls to Google share one keep-alive ``requests.Session`` per process.
+The OpenID discovery document and the JWKS signing keys are cached according
+to their ``Cache-Control``/``Expires`` headers and revalidated with their
+``ETag``. The ``id_token`` returned by the token endpoint is verified locally
+against the cached keys, so a login costs a single round trip to Google; the
+userinfo endpoint is only used when PyJWT is not installed or the token has
+no ``id_token``. A token signed with an unknown key refetches the keys (Google
+rotates them), but at most once per ``OAUTH_JWKS_REFRESH_INTERVAL`` seconds
+(default 60), so tokens with made-up key IDs cannot make every request call
+Google. Accounts are only identified by a verified email address.
+"""
+
+import email.utils
+import os
+import re
+import threading
+import time
 from urllib.parse import urlencode
 
 import requests
 from flask import current_app
+from requests.adapters import HTTPAdapter
+
+try:
+    import jwt
+except ImportError:  # pragma: no cover - PyJWT is optional
+    jwt = None
 
 # Google OAuth Configuration
-GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid_configuration"
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
 
 
 def get_google_client_id():
@@ -17,10 +43,131 @@ def get_google_client_secret():
     return current_app.config.get("GOOGLE_CLIENT_SECRET", "")
 
 
-# OAuth endpoints
+# OAuth endpoints, used when the discovery document cannot be fetched
 GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/auth"
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"  # nosec B105
 GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+# (connect, read) timeouts in seconds, overridable with OAUTH_HTTP_TIMEOUT
+DEFAULT_TIMEOUT = (3.05, 10)
+# Lifetime of cached documents that come without cache headers
+DEFAULT_DOCUMENT_TTL = 3600
+# Minimum seconds between JWKS refetches forced by an unknown key ID
+DEFAULT_JWKS_REFRESH_INTERVAL = 60
+
+
+class OAuthError(Exception):
+    """An OAuth request failed or returned an invalid response"""
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """Get the keep-alive HTTP session shared by this process"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def _timeout():
+    return current_app.config.get("OAUTH_HTTP_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def _max_age(response):
+    """Seconds a response may be cached for according to its headers"""
+    cache_control = response.headers.get("Cache-Control", "")
+    if re.search(r"\b(no-store|no-cache)\b", cache_control):
+        return 0
+    match = re.search(r"\bmax-age=(\d+)", cache_control)
+    if match:
+        age = int(response.headers.get("Age", 0) or 0)
+        return max(0, int(match.group(1)) - age)
+    expires = response.headers.get("Expires")
+    if expires:
+        try:
+            expires_at = email.utils.parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        return max(0, expires_at - time.time())
+    return DEFAULT_DOCUMENT_TTL
+
+
+class DocumentCache:
+    """Cache of JSON documents keyed by URL that honors HTTP cache headers"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, force_refresh=False, min_refresh_interval=0):
+        """Get a document, from the cache while it is fresh.
+
+        ``force_refresh`` revalidates a fresh document, unless it was fetched
+        less than ``min_refresh_interval`` seconds ago.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+        now = time.time()
+        if (
+            entry is not None
+            and entry["expires_at"] > now
+            and (not force_refresh or now - entry["fetched_at"] < min_refresh_interval)
+        ):
+            return entry["document"]
+
+        headers = {}
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        response = http_session().get(url, headers=headers, timeout=_timeout())
+
+        if response.status_code == 304 and entry is not None:
+            document, etag = entry["document"], entry["etag"]
+        elif response.status_code == 200:
+            document, etag = response.json(), response.headers.get("ETag")
+        else:
+            raise OAuthError(f"Failed to fetch {url}: HTTP {response.status_code}")
+
+        with self._lock:
+            self._entries[url] = {
+                "document": document,
+                "etag": etag,
+                "fetched_at": time.time(),
+                "expires_at": time.time() + _max_age(response),
+            }
+        return document
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+document_cache = DocumentCache()
+
+
+def get_google_discovery():
+    """Get Google's OpenID discovery document, or None if unavailable"""
+    url = current_app.config.get("GOOGLE_DISCOVERY_URL", GOOGLE_DISCOVERY_URL)
+    try:
+        return document_cache.get(url)
+    except (OAuthError, requests.RequestException, ValueError):
+        current_app.logger.warning("Google OpenID discovery failed", exc_info=True)
+        return None
+
+
+def _endpoint(name, default):
+    discovery = get_google_discovery() or {}
+    return discovery.get(name, default)
 
 
 def get_google_auth_url(redirect_uri, state=None):
@@ -37,7 +184,8 @@ def get_google_auth_url(redirect_uri, state=None):
     if state:
         params["state"] = state
 
-    return f"{GOOGLE_AUTH_URL}?{urlencode(params)}"
+    auth_url = _endpoint("authorization_endpoint", GOOGLE_AUTH_URL)
+    return f"{auth_url}?{urlencode(params)}"
 
 
 def get_google_token(code, redirect_uri):
@@ -50,22 +198,104 @@ def get_google_token(code, redirect_uri):
         "redirect_uri": redirect_uri,
     }
 
-    response = requests.post(GOOGLE_TOKEN_URL, data=data, timeout=30)
+    response = http_session().post(
+        _endpoint("token_endpoint", GOOGLE_TOKEN_URL), data=data, timeout=_timeout()
+    )
     if response.status_code == 200:
         return response.json()
     else:
-        raise Exception(f"Failed to get token: {response.text}")
+        raise OAuthError(f"Failed to get token: {response.text}")
 
 
 def get_google_user_info(access_token):
     """Get user information from Google"""
     headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(GOOGLE_USERINFO_URL, headers=headers, timeout=30)
+    response = http_session().get(
+        _endpoint("userinfo_endpoint", GOOGLE_USERINFO_URL),
+        headers=headers,
+        timeout=_timeout(),
+    )
 
     if response.status_code == 200:
-        return response.json()
+        user_info = response.json()
+        # The OpenID userinfo endpoint names the Google account ID "sub"
+        user_info.setdefault("id", user_info.get("sub"))
+        return user_info
+    else:
+        raise OAuthError(f"Failed to get user info: {response.text}")
+
+
+def _signing_key(kid):
+    """Find the JWKS key with the given ID, refetching once for key rotation"""
+    jwks_url = _endpoint("jwks_uri", GOOGLE_JWKS_URL)
+    interval = current_app.config.get(
+        "OAUTH_JWKS_REFRESH_INTERVAL", DEFAULT_JWKS_REFRESH_INTERVAL
+    )
+    for force_refresh in (False, True):
+        jwks = document_cache.get(
+            jwks_url, force_refresh=force_refresh, min_refresh_interval=interval
+        )
+        for key in jwks.get("keys", []):
+            if key.get("kid") == kid:
+                return jwt.PyJWK(key).key
+    raise OAuthError("id_token is signed with an unknown key")
+
+
+def verify_google_id_token(id_token):
+    """Verify a Google id_token locally and return its claims"""
+    if jwt is None:
+        raise OAuthError("PyJWT is required to verify id_tokens")
+    try:
+        header = jwt.get_unverified_header(id_token)
+        claims = jwt.decode(
+            id_token,
+            _signing_key(header.get("kid")),
+            algorithms=["RS256"],
+            audience=get_google_client_id(),
+            leeway=60,
+            options={"require": ["iss", "sub", "aud", "exp", "iat"]},
+        )
+    except jwt.PyJWTError as e:
+        raise OAuthError(f"Invalid id_token: {e}") from e
+
+    issuers = set(GOOGLE_ISSUERS)
+    discovery = get_google_discovery()
+    if discovery and discovery.get("issuer"):
+        issuers.add(discovery["issuer"])
+    if claims["iss"] not in issuers:
+        raise OAuthError("id_token has an unexpected issuer")
+    return claims
+
+
+def _is_true(value):
+    # Some Google responses send booleans as strings
+    return value is True or str(value).lower() == "true"
+
+
+def get_google_identity(token_data):
+    """Get the Google account behind a token response.
+
+    Returns a dict with ``id``, ``email`` and ``name``. The id_token is
+    verified locally when possible; otherwise the userinfo endpoint is asked.
+    Accounts without a verified email address are rejected, since the email
+    is used to match existing users.
+    """
+    id_token = token_data.get("id_token")
+    if id_token and jwt is not None:
+        claims = verify_google_id_token(id_token)
+        identity = {
+            "id": claims["sub"],
+            "email": claims.get("email"),
+            "name": claims.get("name"),
+        }
+        verified = claims.get("email_verified")
     else:
-        raise Exception(f"Failed to get user info: {response.text}")
+        identity = get_google_user_info(token_data["access_token"])
+        # "email_verified" from the OpenID endpoint, "verified_email" from v2
+        verified = identity.get("email_verified", identity.get("verified_email"))
+    if not identity.get("email") or not _is_true(verified):
+        raise OAuthError("Google account has no verified email address")
+    return identity
 
 
 def is_google_oauth_enabled():
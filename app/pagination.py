@@ -0,0 +1,131 @@
+"""
+Keyset (cursor) pagination for thought listings.
+
+Listings are ordered newest first on ``(created_at, id)``. Instead of an
+``OFFSET`` each page carries opaque cursors pointing at its first and last
+rows, so fetching any page is an index range scan of ``per_page + 1`` rows.
+Totals come from a short-lived count cache rather than a ``COUNT(*)`` per view.
+"""
+
+import base64
+import threading
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import current_app
+
+
+class KeysetPagination:
+    """One page of keyset-paginated results"""
+
+    def __init__(self, items, per_page, has_next, has_prev, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+
+    @property
+    def next_cursor(self):
+        """Cursor for the page after this one (older rows)"""
+        if self.has_next and self.items:
+            return encode_cursor(self.items[-1])
+        return None
+
+    @property
+    def prev_cursor(self):
+        """Cursor for the page before this one (newer rows)"""
+        if self.has_prev and self.items:
+            return encode_cursor(self.items[0])
+        return None
+
+
+def encode_cursor(item):
+    """Encode an item's (created_at, id) sort key as an opaque cursor"""
+    raw = f"{item.created_at.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into a (created_at, id) tuple, or None if invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = (
+            base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        )
+        return datetime.fromisoformat(created_at), item_id
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_paginate(
+    query, sort_columns, after=None, before=None, per_page=10, total=None
+):
+    """Paginate a query newest first on (created_at, id) using cursors.
+
+    ``sort_columns`` are the ``(created_at, id)`` columns to order and seek on.
+    ``after`` fetches the page of rows older than the cursor, ``before`` the
+    page of rows newer than it. Invalid cursors fall back to the first page.
+    """
+    created_at, item_id = sort_columns
+    sort_key = sa.tuple_(created_at, item_id)
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key is not None:
+        rows = (
+            query.filter(sort_key > sa.tuple_(*before_key))
+            .order_by(created_at.asc(), item_id.asc())
+            .limit(per_page + 1)
+            .all()
+        )
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPagination(items, per_page, True, has_prev, total)
+
+    if after_key is not None:
+        query = query.filter(sort_key < sa.tuple_(*after_key))
+    rows = query.order_by(created_at.desc(), item_id.desc()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    return KeysetPagination(
+        rows[:per_page], per_page, has_next, after_key is not None, total
+    )
+
+
+class CountCache:
+    """Thread-safe cache of listing totals with a time-to-live.
+
+    Totals shown next to keyset pages are allowed to lag behind by up to
+    ``THOUGHT_COUNT_CACHE_TTL`` seconds (default 60). A TTL of 0 disables the
+    cache and counts on every request.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, query):
+        ttl = current_app.config.get("THOUGHT_COUNT_CACHE_TTL", 60)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if ttl and entry is not None and entry[1] > now:
+            return entry[0]
+
+        total = query.order_by(None).count()
+        if ttl:
+            with self._lock:
+                self._entries[key] = (total, now + ttl)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def thought_count_cache():
+    """Get the count cache for the current application"""
+    return current_app.extensions.setdefault("thought_counts", CountCache())
@@ -0,0 +1,172 @@
+"""
+Password hashing off the request thread, with a configurable hash policy.
+
+Hashing and verification run in a small process pool so a login spike cannot
+pin every request thread (or the GIL) on key derivation. The number of
+operations waiting for the pool is bounded: when ``PASSWORD_HASH_MAX_PENDING``
+operations are already queued, a new one waits up to
+``PASSWORD_HASH_QUEUE_TIMEOUT`` seconds and then fails with
+``PasswordHasherBusy`` instead of growing the queue without limit.
+
+Configuration:
+
+* ``PASSWORD_HASH_METHOD`` - Werkzeug hash method for new hashes
+  (default ``pbkdf2:sha256:600000``); stored hashes made with any other
+  method are upgraded on the next successful login
+* ``PASSWORD_HASH_WORKERS`` - pool processes (default: CPU count, at most 4);
+  0 hashes inline on the calling thread
+* ``PASSWORD_HASH_MAX_PENDING`` - queued plus running operations
+  (default: 8 per worker)
+* ``PASSWORD_HASH_QUEUE_TIMEOUT`` - seconds to wait for a queue slot (default 5)
+"""
+
+import atexit
+import functools
+import os
+import threading
+import time
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = "pbkdf2:sha256:600000"
+
+
+class PasswordHasherBusy(RuntimeError):
+    """The hashing queue stayed full for longer than the queue timeout"""
+
+
+class PasswordHasher:
+    """Bounded process pool for password hashing with usage metrics"""
+
+    def __init__(self, workers=None, max_pending=None, queue_timeout=5):
+        if workers is None:
+            workers = min(4, os.cpu_count() or 1)
+        self.workers = workers
+        self.max_pending = max_pending or max(1, workers) * 8
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "seconds_total": 0.0,
+        }
+
+    def _get_executor(self):
+        """Create the pool on first use, and again in forked children"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # Imported here as it is only needed once a hash is computed
+                from concurrent.futures import ProcessPoolExecutor
+                from multiprocessing import get_context
+
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=get_context("spawn"),
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._record(rejected=1)
+            raise PasswordHasherBusy("Password hashing queue is full")
+        started = time.perf_counter()
+        self._record(submitted=1, in_flight=1)
+        try:
+            if self.workers:
+                result = self._get_executor().submit(fn, *args).result()
+            else:
+                result = fn(*args)
+        except Exception:
+            self._record(failed=1)
+            raise
+        else:
+            self._record(completed=1)
+            return result
+        finally:
+            self._record(in_flight=-1, seconds_total=time.perf_counter() - started)
+            self._slots.release()
+
+    def _record(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._metrics[name] += delta
+            self._metrics["peak_in_flight"] = max(
+                self._metrics["peak_in_flight"], self._metrics["in_flight"]
+            )
+
+    def hash(self, password, method=DEFAULT_HASH_METHOD):
+        return self._run(generate_password_hash, password, method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics, workers=self.workers)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def init_password_hasher(app):
+    """Create the password hasher configured for the application"""
+    hasher = PasswordHasher(
+        app.config.get("PASSWORD_HASH_WORKERS"),
+        app.config.get("PASSWORD_HASH_MAX_PENDING"),
+        app.config.get("PASSWORD_HASH_QUEUE_TIMEOUT", 5),
+    )
+    app.extensions["password_hasher"] = hasher
+    atexit.register(hasher.shutdown)
+
+
+def password_hasher():
+    """Get the password hasher for the current application"""
+    return current_app.extensions["password_hasher"]
+
+
+def hash_method():
+    """The hash method new passwords are stored with"""
+    if not has_app_context():
+        return DEFAULT_HASH_METHOD
+    return current_app.config.get("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)
+
+
+def hash_password(password):
+    """Hash a password with the configured method"""
+    if not has_app_context() or "password_hasher" not in current_app.extensions:
+        return generate_password_hash(password, hash_method())
+    return password_hasher().hash(password, hash_method())
+
+
+def verify_password(pwhash, password):
+    """Check a password against a stored hash"""
+    if not pwhash:
+        return False
+    if not has_app_context() or "password_hasher" not in current_app.extensions:
+        return check_password_hash(pwhash, password)
+    return password_hasher().verify(pwhash, password)
+
+
+@functools.lru_cache(maxsize=16)
+def _stored_method(method):
+    """The method prefix Werkzeug writes for ``method`` (defaults filled in)"""
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def needs_rehash(pwhash):
+    """Check whether a stored hash was made with an outdated method"""
+    if not pwhash:
+        return False
+    return pwhash.split("$", 1)[0] != _stored_method(hash_method())
@@ -0,0 +1,242 @@
+"""
+Token-bucket rate limiting for the expensive endpoints.
+
+Logging in (a password hash), registering (uniqueness lookups and a hash)
+and searching (an FTS or ILIKE scan) are admitted through token buckets, so
+a burst from a few clients cannot take the CPU and the database from
+everyone else. Each endpoint has a budget per client IP and per user: the
+logged-in user, or for the login form the username being tried. A budget of
+``(capacity, period)`` allows ``capacity`` requests at once and refills at
+``capacity`` per ``period`` seconds. A request finding an empty bucket is
+answered with ``429 Too Many Requests`` and a ``Retry-After`` header (JSON
+under ``/api``), before the view runs.
+
+Buckets are kept in a pluggable store:
+
+* ``memory`` - per process (default)
+* ``sqlite`` - a SQLite file at ``RATE_LIMIT_STORAGE_PATH`` (default
+  ``instance/ratelimit.db``) shared by every worker process on the host;
+  each check is one short ``BEGIN IMMEDIATE`` transaction
+* ``null`` - limiting disabled
+
+``RATE_LIMITS`` overrides the budgets of ``DEFAULT_RATE_LIMITS`` per endpoint
+(``None`` removes an endpoint's limits). Requests are keyed by
+``request.remote_addr``, so behind a reverse proxy the app must be wrapped
+in ``ProxyFix``. If the store fails, requests are let through.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+# endpoint: {"methods": limited HTTP methods, scope: (capacity, period)}
+DEFAULT_RATE_LIMITS = {
+    "auth.login": {"methods": ("POST",), "ip": (20, 60), "user": (10, 60)},
+    "auth.register": {"methods": ("POST",), "ip": (10, 600)},
+    "main.thought_search": {"ip": (60, 60), "user": (30, 60)},
+    "api.search_thoughts_endpoint": {"ip": (60, 60), "user": (30, 60)},
+}
+SCOPES = ("ip", "user")
+
+logger = logging.getLogger(__name__)
+
+
+def _take(tokens, updated, capacity, rate, now):
+    """Refill a bucket and take a token from it.
+
+    Returns the bucket's new token count and the seconds until a token is
+    available (0 when one was taken).
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class NullBuckets:
+    """Store that admits everything"""
+
+    def take(self, key, capacity, rate):
+        return 0.0
+
+
+class MemoryBuckets:
+    """Buckets of one process, bounded to the most recently used keys"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens, retry_after = _take(tokens, updated, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file shared by the worker processes of a host"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path, max_idle=3600):
+        self.path = path
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._calls = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self):
+        """One connection per thread, opened again in forked children"""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            local.connection.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=OFF;"
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL"
+                ") WITHOUT ROWID;"
+            )
+            local.pid = os.getpid()
+        return local.connection
+
+    def take(self, key, capacity, rate):
+        connection = self._connection()
+        # The write lock is taken up front, so concurrent checks of one key
+        # cannot both spend the same token
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, retry_after = _take(*(row or (None, now)), capacity, rate, now)
+            connection.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                # Idle buckets are full again; forgetting them changes nothing
+                connection.execute(
+                    "DELETE FROM buckets WHERE updated < ?", (now - self.max_idle,)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return retry_after
+
+
+class RateLimiter:
+    """Checks requests against the budgets of their endpoint"""
+
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = limits
+        self._lock = threading.Lock()
+        self.checked = {}
+        self.limited = {}
+
+    def _identity(self, scope):
+        if scope == "ip":
+            return request.remote_addr or "-"
+        if current_user.is_authenticated:
+            return current_user.get_id()
+        # The account a login attempt targets
+        username = request.form.get("username", "").strip().lower()
+        return f"login:{username}" if username else None
+
+    def check(self):
+        """Seconds the current request has to wait, or 0 to admit it"""
+        limits = self.limits.get(request.endpoint)
+        if not limits or request.method not in limits.get("methods", ("GET", "POST")):
+            return 0.0
+
+        retry_after = 0.0
+        for scope in SCOPES:
+            if scope not in limits:
+                continue
+            identity = self._identity(scope)
+            if identity is None:
+                continue
+            capacity, period = limits[scope]
+            key = f"{request.endpoint}:{scope}:{identity}"
+            try:
+                wait = self.store.take(key, capacity, capacity / period)
+            except (sqlite3.Error, OSError):
+                logger.exception("Rate limit store failed; request admitted")
+                return 0.0
+            self._count(request.endpoint, scope, wait > 0)
+            retry_after = max(retry_after, wait)
+        return retry_after
+
+    def _count(self, endpoint, scope, limited):
+        with self._lock:
+            key = (endpoint, scope)
+            self.checked[key] = self.checked.get(key, 0) + 1
+            if limited:
+                self.limited[key] = self.limited.get(key, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {"checked": dict(self.checked), "limited": dict(self.limited)}
+
+
+def init_rate_limiter(app):
+    """Create the rate limiter configured for the application"""
+    storage = app.config.get("RATE_LIMIT_STORAGE", "memory")
+    if not app.config.get("RATE_LIMIT_ENABLED", True):
+        storage = "null"
+    if storage == "sqlite":
+        store = SQLiteBuckets(
+            app.config.get("RATE_LIMIT_STORAGE_PATH")
+            or os.path.join(app.instance_path, "ratelimit.db")
+        )
+    elif storage == "memory":
+        store = MemoryBuckets(app.config.get("RATE_LIMIT_MAX_KEYS", 10000))
+    elif storage == "null":
+        store = NullBuckets()
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_STORAGE: {storage}")
+
+    limits = {**DEFAULT_RATE_LIMITS, **app.config.get("RATE_LIMITS", {})}
+    limiter = RateLimiter(
+        store, {endpoint: budget for endpoint, budget in limits.items() if budget}
+    )
+    app.extensions["rate_limiter"] = limiter
+
+    @app.before_request
+    def limit_request():
+        retry_after = limiter.check()
+        if retry_after:
+            raise TooManyRequests(retry_after=math.ceil(retry_after))
+
+
+def rate_limiter():
+    """Get the rate limiter of the current application"""
+    return current_app.extensions.get("rate_limiter")
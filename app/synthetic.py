@@ -0,0 +1,239 @@
+"""
+Deterministic synthetic data shaped like production.
+
+Generates users and their thoughts with a skewed (Zipf) number of thoughts per
+user, log-normally distributed content lengths, a Zipf-distributed tag
+vocabulary, a configurable share of public thoughts and creation dates spread
+over a time span. Rows are produced in fixed-size chunks, each from its own
+random stream derived from the seed, so the output for a given seed and shape
+is identical whether the chunks are generated in one process or several.
+Writes go through the importer's batched Core inserts.
+"""
+
+import math
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from app.cache import invalidate_public_pages
+from app.importer import write_thought_rows
+from app.models import User, db
+from app.pagination import thought_count_cache
+from app.passwords import hash_password
+
+# Thoughts per generated chunk. Changing it changes the generated data.
+CHUNK_SIZE = 1000
+# Fixed end of the date span, so that output does not depend on the clock
+DEFAULT_END = datetime(2025, 1, 1)
+MAX_CONTENT_WORDS = 2000
+
+WORDS = (
+    "idea note flask python garden music travel recipe project book design "
+    "sqlite cache index query latency memory thread process queue worker "
+    "coffee morning river mountain city planning review release feature bug "
+    "customer meeting sketch poem draft question answer lesson habit focus "
+    "walk weekend family budget kitchen plant library podcast article paper "
+    "server deploy backup migration schema test refactor debug profile"
+).split()
+CATEGORIES = ["idea", "note", "inspiration", "todo", "question", "project", None]
+
+
+def zipf_weights(count, exponent):
+    """Weights proportional to 1 / rank ** exponent for ranks 1..count"""
+    return [1 / rank**exponent for rank in range(1, count + 1)]
+
+
+def allocate(total, weights):
+    """Split ``total`` into integers proportional to ``weights``"""
+    scale = total / sum(weights)
+    shares = [weight * scale for weight in weights]
+    counts = [int(share) for share in shares]
+    # Hand out what rounding down left over to the largest remainders
+    by_remainder = sorted(range(len(shares)), key=lambda i: counts[i] - shares[i])
+    for i in by_remainder[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def tag_vocabulary(size):
+    """Tag names ordered from most to least frequent"""
+    return [f"tag{rank}" for rank in range(size)]
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def generate_chunk(task):
+    """Generate the thought rows of one chunk; runs in worker processes"""
+    seed, user_index, chunk_index, user_id, count, shape = task
+    rng = random.Random(f"{seed}:{user_index}:{chunk_index}")
+    vocabulary = tag_vocabulary(shape["tag_vocabulary"])
+    tag_weights = list(_cumulative(zipf_weights(len(vocabulary), shape["tag_skew"])))
+    end = shape["end"]
+    span = int(shape["days"] * 86400)
+    median = math.log(shape["content_words"])
+
+    rows = []
+    for _ in range(count):
+        tag_count = rng.randint(0, shape["max_tags"]) if vocabulary else 0
+        tags = list(
+            dict.fromkeys(rng.choices(vocabulary, cum_weights=tag_weights, k=tag_count))
+        )
+        words = rng.lognormvariate(median, shape["content_sigma"])
+        created_at = end - timedelta(seconds=rng.randrange(span))
+        updated_at = created_at
+        if rng.random() < 0.2:
+            edited = rng.randrange(max(1, int((end - created_at).total_seconds())))
+            updated_at = created_at + timedelta(seconds=edited)
+        rows.append(
+            {
+                "id": _uuid(rng),
+                "title": _words(rng, rng.randint(2, 8)).capitalize(),
+                "content": _words(rng, max(1, min(MAX_CONTENT_WORDS, round(words)))),
+                "category": rng.choice(CATEGORIES),
+                "tags": ", ".join(tags) or None,
+                "is_public": rng.random() < shape["public_ratio"],
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "user_id": user_id,
+            }
+        )
+    return rows
+
+
+def _cumulative(weights):
+    total = 0
+    for weight in weights:
+        total += weight
+        yield total
+
+
+def generate(
+    users=10,
+    thoughts_per_user=100,
+    user_skew=1.0,
+    content_words=40,
+    content_sigma=0.8,
+    tag_vocabulary_size=200,
+    tag_skew=1.1,
+    max_tags=4,
+    public_ratio=0.3,
+    days=730,
+    end=DEFAULT_END,
+    seed=1234,
+    username_prefix="user",
+    password="password",  # nosec B107
+    batch_size=5000,
+    processes=1,
+):
+    """Insert ``users`` users and ``users * thoughts_per_user`` thoughts
+
+    The number of thoughts of each user follows a Zipf distribution with
+    ``user_skew`` (0 gives every user the same number). Content lengths in
+    words are log-normal around the median ``content_words``. Each thought gets
+    up to ``max_tags`` tags drawn from a vocabulary of ``tag_vocabulary_size``
+    names with Zipf exponent ``tag_skew``. Creation dates are uniform over the
+    ``days`` before ``end``. With ``processes`` > 1, rows are generated in a
+    process pool while this process writes them.
+
+    Returns a dict with the number of users and thoughts created.
+    """
+    first_username = f"{username_prefix}0"
+    if db.session.execute(
+        sa.select(User.id).where(User.username == first_username)
+    ).first():
+        raise ValueError(f"User {first_username} already exists")
+
+    rng = random.Random(f"{seed}:users")
+    created_at = end - timedelta(days=days)
+    # Hashing is slow on purpose, so all generated users share one hash
+    password_hash = hash_password(password)
+    user_ids = [_uuid(rng) for _ in range(users)]
+    for start in range(0, users, batch_size):
+        db.session.execute(
+            sa.insert(User.__table__),
+            [
+                {
+                    "id": user_ids[i],
+                    "username": f"{username_prefix}{i}",
+                    "email": f"{username_prefix}{i}@example.com",
+                    "password_hash": password_hash,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                    "is_active": True,
+                }
+                for i in range(start, min(users, start + batch_size))
+            ],
+        )
+    db.session.commit()
+
+    shape = {
+        "tag_vocabulary": tag_vocabulary_size,
+        "tag_skew": tag_skew,
+        "max_tags": max_tags,
+        "content_words": content_words,
+        "content_sigma": content_sigma,
+        "public_ratio": public_ratio,
+        "days": days,
+        "end": end,
+    }
+    counts = allocate(users * thoughts_per_user, zipf_weights(users, user_skew))
+    tasks = [
+        (seed, user_index, chunk_index, user_ids[user_index], chunk, shape)
+        for user_index, count in enumerate(counts)
+        for chunk_index, chunk in enumerate(_chunk_sizes(count))
+    ]
+
+    written = 0
+    batch = []
+    try:
+        for rows in _generate_chunks(tasks, processes):
+            batch.extend(rows)
+            if len(batch) >= batch_size:
+                write_thought_rows(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            write_thought_rows(batch)
+            written += len(batch)
+    finally:
+        if written:
+            thought_count_cache().clear()
+            invalidate_public_pages()
+    return {"users": users, "thoughts": written}
+
+
+def _generate_chunks(tasks, processes):
+    """Yield generated chunks in task order"""
+    if processes <= 1:
+        yield from map(generate_chunk, tasks)
+        return
+
+    import multiprocessing
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=context) as pool:
+        # Keep a few chunks per worker in flight so that memory stays bounded
+        # when writing is slower than generating
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(generate_chunk, task))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _chunk_sizes(count):
+    while count > 0:
+        yield min(CHUNK_SIZE, count)
+        count -= CHUNK_SIZE
@@ -0,0 +1,79 @@
+"""
+Jinja template compilation: a shared bytecode cache and warm-up at startup.
+
+A template is parsed and compiled to Python code the first time a process
+loads it, which made the first request for each page in every new worker
+slow. ``init_templates`` gives the Jinja environment a filesystem bytecode
+cache, so a template compiled by one worker (or by ``python manage.py
+warm-templates`` during a deploy) is loaded from its bytecode by all the
+others. Jinja checks the template source against the cached bytecode, so an
+edited template is compiled again.
+
+With ``TEMPLATE_WARMUP`` the app factory also loads every template before it
+returns, so a worker compiles nothing once it accepts traffic. The load time
+of each template is recorded as ``ideas_template_load_seconds`` next to the
+render time in ``/api/metrics``.
+
+Configuration:
+
+* ``TEMPLATE_BYTECODE_CACHE`` - use the bytecode cache (default True)
+* ``TEMPLATE_CACHE_DIR`` - directory of the cache, shared by the workers
+  (default: Jinja's per-user directory in the system temp directory)
+* ``TEMPLATE_WARMUP`` - load every template in ``create_app`` (default False)
+"""
+
+import os
+import time
+
+from jinja2 import BaseLoader, FileSystemBytecodeCache
+
+
+class TimedLoader(BaseLoader):
+    """Loader recording how long each template takes to load: reading and
+    compiling its source, or reading its bytecode"""
+
+    has_source_access = True
+
+    def __init__(self, loader, app):
+        self.loader = loader
+        self.app = app
+
+    def get_source(self, environment, template):
+        return self.loader.get_source(environment, template)
+
+    def list_templates(self):
+        return self.loader.list_templates()
+
+    def load(self, environment, name, globals=None):
+        started = time.perf_counter()
+        try:
+            return super().load(environment, name, globals)
+        finally:
+            metrics = self.app.extensions.get("metrics")
+            if metrics is not None:
+                metrics.registry.observe(
+                    "ideas_template_load_seconds",
+                    time.perf_counter() - started,
+                    [("template", name)],
+                )
+
+
+def init_templates(app):
+    """Configure template loading; call before anything uses ``jinja_env``"""
+    if app.config.get("TEMPLATE_BYTECODE_CACHE", True):
+        directory = app.config.get("TEMPLATE_CACHE_DIR")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        app.jinja_options = {
+            **app.jinja_options,
+            "bytecode_cache": FileSystemBytecodeCache(directory),
+        }
+    app.jinja_env.loader = TimedLoader(app.jinja_env.loader, app)
+
+
+def warm_templates(app):
+    """Load every template of the app; returns how many there are"""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
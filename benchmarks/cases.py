@@ -0,0 +1,240 @@
+"""
+Benchmark cases: repository helpers in app/models.py and the routes in
+app/main/routes.py and app/auth/routes.py.
+
+Each case is a callable performing one operation. Helper cases run inside an
+application context with a fresh session per call, so the identity map never
+answers for the database. Route cases go through the Flask test client, as
+the logged-in benchmark user unless they are marked anonymous.
+"""
+
+import sqlalchemy as sa
+
+from app import models
+from app.models import Thought, db, get_user_thoughts
+from app.pagination import encode_cursor
+from benchmarks.seed import BENCH_PASSWORD, BENCH_USERNAME
+
+
+class Case:
+    """One benchmarked operation"""
+
+    def __init__(self, name, kind, run, iterations=None):
+        self.name = name
+        self.kind = kind
+        self.run = run
+        self.iterations = iterations
+
+
+class Fixtures:
+    """IDs, names and cursors picked from the seeded database"""
+
+    def __init__(self):
+        user = models.get_user_by_username(BENCH_USERNAME)
+        self.user_id = user.id
+        self.username = user.username
+        self.email = user.email
+        latest = get_user_thoughts(self.user_id, per_page=1).items[0]
+        self.thought_id = latest.id
+        self.public_thought_id = db.session.execute(
+            sa.select(Thought.id)
+            .where(Thought.is_public.is_(True))
+            .order_by(Thought.created_at.desc())
+            .limit(1)
+        ).scalar()
+        self.thought_ids = list(
+            db.session.execute(
+                sa.select(Thought.id)
+                .where(Thought.user_id == self.user_id)
+                .order_by(Thought.created_at.desc())
+                .limit(50)
+            ).scalars()
+        )
+        self.tag = "tag1"
+        self.search_term = "garden"
+        # A cursor halfway through the user's thoughts
+        total = get_user_thoughts(self.user_id).total
+        middle = (
+            Thought.query.filter_by(user_id=self.user_id)
+            .order_by(Thought.created_at.desc(), Thought.id.desc())
+            .offset(total // 2)
+            .first()
+        )
+        self.deep_cursor = encode_cursor(middle)
+        db.session.remove()
+
+
+def _helper(fn):
+    def run():
+        try:
+            fn()
+        finally:
+            db.session.remove()
+
+    return run
+
+
+def helper_cases(f):
+    """Cases calling the repository helpers directly"""
+
+    def create_and_delete():
+        thought = models.create_thought(
+            "Benchmark", "benchmark content", f.user_id, tags="bench, tag1"
+        )
+        models.delete_thought(thought.id)
+
+    toggle = {"title": 0}
+
+    def update():
+        toggle["title"] ^= 1
+        models.update_thought(f.thought_id, title=f"Updated {toggle['title']}")
+
+    cases = [
+        ("get_user_by_id", lambda: models.get_user_by_id(f.user_id)),
+        ("get_user_by_username", lambda: models.get_user_by_username(f.username)),
+        ("get_user_by_email", lambda: models.get_user_by_email(f.email)),
+        ("get_user_by_oauth", lambda: models.get_user_by_oauth("google", "missing")),
+        ("get_thought_by_id", lambda: models.get_thought_by_id(f.thought_id)),
+        (
+            "get_thoughts_by_ids",
+            lambda: models.get_thoughts_by_ids(f.thought_ids, f.user_id),
+        ),
+        ("get_user_thoughts", lambda: models.get_user_thoughts(f.user_id)),
+        (
+            "get_user_thoughts[deep]",
+            lambda: models.get_user_thoughts(f.user_id, after=f.deep_cursor),
+        ),
+        (
+            "get_user_thoughts[list columns]",
+            lambda: models.get_user_thoughts(
+                f.user_id, columns=models.THOUGHT_LIST_COLUMNS
+            ),
+        ),
+        ("get_public_thoughts", lambda: models.get_public_thoughts()),
+        (
+            "get_public_thoughts[list columns]",
+            lambda: models.get_public_thoughts(
+                columns=models.THOUGHT_LIST_COLUMNS_WITH_AUTHOR
+            ),
+        ),
+        ("get_thoughts_by_tag", lambda: models.get_thoughts_by_tag(f.user_id, f.tag)),
+        (
+            "get_public_thoughts_by_tag",
+            lambda: models.get_public_thoughts_by_tag(f.tag),
+        ),
+        ("search_thoughts", lambda: models.search_thoughts(f.user_id, f.search_term)),
+        ("get_top_tags", lambda: models.get_top_tags()),
+        ("get_top_tags[user]", lambda: models.get_top_tags(f.user_id)),
+        ("get_user_stats", lambda: models.get_user_stats(f.user_id)),
+        ("create_thought+delete_thought", create_and_delete),
+        ("update_thought", update),
+    ]
+    result = [Case(name, "helper", _helper(fn)) for name, fn in cases]
+    result.append(
+        Case(
+            "authenticate_user",
+            "helper",
+            _helper(lambda: models.authenticate_user(f.username, BENCH_PASSWORD)),
+            iterations=10,
+        )
+    )
+    return result
+
+
+def _request(client, method, url, expected=(200,), **kwargs):
+    def run():
+        response = client.open(url, method=method, **kwargs)
+        if response.status_code not in expected:
+            raise AssertionError(f"{method} {url} returned {response.status_code}")
+
+    return run
+
+
+def route_cases(app, f):
+    """Cases requesting every page through the test client"""
+    anonymous = app.test_client()
+    client = app.test_client()
+    _request(
+        client,
+        "POST",
+        "/login",
+        expected=(302,),
+        data={"username": f.username, "password": BENCH_PASSWORD},
+    )()
+
+    def create_and_delete():
+        response = client.post(
+            "/thoughts/new", data={"title": "Benchmark", "content": "body"}
+        )
+        thought_id = response.location.rsplit("/", 1)[-1]
+        client.post(f"/thoughts/{thought_id}/delete")
+
+    thought = f"/thoughts/{f.thought_id}"
+    cases = [
+        ("GET / (anonymous)", _request(anonymous, "GET", "/")),
+        ("GET /about (anonymous)", _request(anonymous, "GET", "/about")),
+        (
+            "GET /thoughts/public (anonymous)",
+            _request(anonymous, "GET", "/thoughts/public"),
+        ),
+        (
+            "GET /thoughts/public/tag/<tag> (anonymous)",
+            _request(anonymous, "GET", f"/thoughts/public/tag/{f.tag}"),
+        ),
+        (
+            "GET /thoughts/<id> (anonymous)",
+            _request(anonymous, "GET", f"/thoughts/{f.public_thought_id}"),
+        ),
+        ("GET /", _request(client, "GET", "/")),
+        ("GET /thoughts", _request(client, "GET", "/thoughts")),
+        (
+            "GET /thoughts?after=<deep>",
+            _request(client, "GET", f"/thoughts?after={f.deep_cursor}"),
+        ),
+        ("GET /thoughts/public", _request(client, "GET", "/thoughts/public")),
+        ("GET /thoughts/new", _request(client, "GET", "/thoughts/new")),
+        ("POST /thoughts/new + delete", create_and_delete),
+        ("GET /thoughts/<id>", _request(client, "GET", thought)),
+        ("GET /thoughts/<id>/edit", _request(client, "GET", f"{thought}/edit")),
+        (
+            "POST /thoughts/<id>/edit",
+            _request(
+                client,
+                "POST",
+                f"{thought}/edit",
+                expected=(302,),
+                data={"title": "Edited", "content": "edited content", "tags": "x"},
+            ),
+        ),
+        (
+            "GET /thoughts/search",
+            _request(client, "GET", f"/thoughts/search?q={f.search_term}"),
+        ),
+        ("GET /thoughts/tag/<tag>", _request(client, "GET", f"/thoughts/tag/{f.tag}")),
+        (
+            "GET /thoughts/public/tag/<tag>",
+            _request(client, "GET", f"/thoughts/public/tag/{f.tag}"),
+        ),
+        ("GET /api/tags (anonymous)", _request(anonymous, "GET", "/api/tags")),
+        ("GET /login (anonymous)", _request(anonymous, "GET", "/login")),
+        ("GET /register (anonymous)", _request(anonymous, "GET", "/register")),
+        ("GET /profile", _request(client, "GET", "/profile")),
+        ("GET /api/stats", _request(client, "GET", "/api/stats?days=365")),
+        ("GET /change-password", _request(client, "GET", "/change-password")),
+    ]
+    result = [Case(name, "route", run) for name, run in cases]
+
+    login_client = app.test_client()
+
+    def login_logout():
+        _request(
+            login_client,
+            "POST",
+            "/login",
+            expected=(302,),
+            data={"username": f.username, "password": BENCH_PASSWORD},
+        )()
+        login_client.get("/logout")
+
+    result.append(Case("POST /login + GET /logout", "route", login_logout, 10))
+    return result
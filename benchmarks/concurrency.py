@@ -0,0 +1,190 @@
+"""
+Concurrent reader/writer benchmark for the SQLite connection profiles.
+
+Runs reader and writer processes against the same SQLite database file for a
+fixed time, once per ``SQLITE_PROFILE``, and reports operations per second,
+latency and ``database is locked`` errors for each role. Readers fetch a page
+of a user's thoughts and one thought; writers create a thought and update
+another.
+
+Usage:
+    python -m benchmarks.concurrency [--size 10000] [--readers 4]
+        [--writers 2] [--duration 10] [--profiles default,production]
+
+A seeded database is kept in ``--data-dir`` (default ``benchmarks/.data``)
+and copied for every profile, so each run starts from the same file.
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from benchmarks.run import DEFAULT_DATA_DIR, parse_size, percentile
+
+ROLES = ("reader", "writer")
+
+
+def create_bench_app(path, profile):
+    """App on the database file at ``path`` with the given SQLite profile"""
+    from app import create_app
+    from app.config import config
+
+    config["concurrency-bench"] = type(
+        "ConcurrencyBenchConfig",
+        (config["default"],),
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "SQLITE_PROFILE": None if profile == "default" else profile,
+            "RESPONSE_CACHE_TYPE": "null",
+            "METRICS_ENABLED": False,
+        },
+    )
+    return create_app("concurrency-bench", bootstrap=False)
+
+
+def seed_database(path, size):
+    """Worker process: fill a new database file with about ``size`` thoughts"""
+    from benchmarks.seed import seed
+
+    app = create_bench_app(path, "default")
+    with app.app_context():
+        seed(size)
+
+
+def run_worker(role, path, profile, duration, barrier, results):
+    """Worker process: run one role's operation in a loop for ``duration``"""
+    import random
+
+    import sqlalchemy as sa
+
+    from app import models
+
+    app = create_bench_app(path, profile)
+    rng = random.Random(f"{role}:{os.getpid()}")
+    with app.app_context():
+        user_ids = list(models.db.session.execute(sa.select(models.User.id)).scalars())
+        thought_ids = list(
+            models.db.session.execute(
+                sa.select(models.Thought.id).limit(1000)
+            ).scalars()
+        )
+        models.db.session.remove()
+
+        def read():
+            page = models.get_user_thoughts(
+                rng.choice(user_ids), columns=models.THOUGHT_LIST_COLUMNS
+            )
+            models.get_thought_by_id(rng.choice(thought_ids))
+            return page
+
+        def write():
+            models.create_thought(
+                "Concurrent", "written by the benchmark", rng.choice(user_ids)
+            )
+            models.update_thought(rng.choice(thought_ids), title="Updated")
+
+        operation = read if role == "reader" else write
+        latencies = []
+        errors = 0
+        barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                operation()
+            except sa.exc.OperationalError:
+                errors += 1
+                models.db.session.rollback()
+            else:
+                latencies.append(time.perf_counter() - started)
+            finally:
+                models.db.session.remove()
+    results.put((role, latencies, errors))
+
+
+def run_profile(profile, base_path, data_dir, readers, writers, duration):
+    """Copy the seeded database and run all workers on it"""
+    path = os.path.join(data_dir, f"concurrency-{profile}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(base_path, path)
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(readers + writers)
+    results = context.Queue()
+    roles = ["reader"] * readers + ["writer"] * writers
+    workers = [
+        context.Process(
+            target=run_worker,
+            args=(role, path, profile, duration, barrier, results),
+        )
+        for role in roles
+    ]
+    for worker in workers:
+        worker.start()
+    collected = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    summary = {}
+    for role in ROLES:
+        latencies = [s for r, samples, _ in collected if r == role for s in samples]
+        errors = sum(e for r, _, e in collected if r == role)
+        summary[role] = {
+            "ops_per_s": len(latencies) / duration,
+            "p50_ms": percentile(latencies, 0.5) * 1000 if latencies else 0.0,
+            "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else 0.0,
+            "errors": errors,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", default="10000")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--profiles", default="default,production")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    size = parse_size(args.size)
+    base_path = os.path.join(args.data_dir, f"concurrency-base-{size}.db")
+    if not os.path.exists(base_path):
+        print(f"Seeding {size} thoughts into {base_path}", file=sys.stderr)
+        context = multiprocessing.get_context("spawn")
+        seeder = context.Process(target=seed_database, args=(base_path, size))
+        seeder.start()
+        seeder.join()
+        if seeder.exitcode:
+            return seeder.exitcode
+
+    print(
+        f"{'profile':<12} {'role':<8} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} "
+        f"{'errors':>7}"
+    )
+    for profile in args.profiles.split(","):
+        summary = run_profile(
+            profile,
+            base_path,
+            args.data_dir,
+            args.readers,
+            args.writers,
+            args.duration,
+        )
+        for role, r in summary.items():
+            print(
+                f"{profile:<12} {role:<8} {r['ops_per_s']:>9.1f} "
+                f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
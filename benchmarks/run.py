@@ -0,0 +1,260 @@
+"""
+Benchmark suite for the repository helpers and routes.
+
+Seeds (or reuses) a SQLite database per data size, times every case and
+reports p50/p99 latency, SQL statements per call and peak traced memory per
+call. Results can be saved as a baseline and later runs compared against it.
+
+Usage:
+    python -m benchmarks.run [--sizes 1k,100k,1m] [--iterations 50]
+        [--filter search] [--save-baseline benchmarks/baseline.json]
+        [--compare benchmarks/baseline.json --threshold 0.2]
+
+Comparing against a baseline file that does not exist yet saves the run there
+instead.
+
+Each size runs in its own interpreter because the database URL is read when
+the configuration is imported. Seeded databases are kept in ``--data-dir``
+(default ``benchmarks/.data``).
+"""
+
+import argparse
+import json
+import os
+import subprocess  # nosec B404
+import sys
+import time
+import tracemalloc
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), ".data")
+# Latency changes below this many milliseconds are treated as noise
+NOISE_FLOOR_MS = 1.0
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_size(name):
+    """Turn '1k', '100k', '1m' or a plain number into a row count"""
+    name = name.lower()
+    return SIZES.get(name) or int(name)
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(case, iterations, warmup, engine):
+    """Time a case and count its queries and allocations"""
+    import sqlalchemy as sa
+
+    for _ in range(warmup):
+        case.run()
+
+    timings = []
+    for _ in range(case.iterations or iterations):
+        started = time.perf_counter()
+        case.run()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    sa.event.listen(engine, "before_cursor_execute", count)
+    try:
+        case.run()
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", count)
+
+    tracemalloc.start()
+    try:
+        case.run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "kind": case.kind,
+        "iterations": len(timings),
+        "p50_ms": round(percentile(timings, 0.5), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "queries": len(statements),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_size(size_name, data_dir, iterations, warmup, name_filter, processes=1):
+    """Benchmark one data size in this process and return its results"""
+    size = parse_size(size_name)
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.abspath(os.path.join(data_dir, f"thoughts_{size}.db"))
+    # Must be set before anything imports the application configuration
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app import create_app
+    from app.config import config
+    from app.models import db
+    from benchmarks.cases import Fixtures, helper_cases, route_cases
+    from benchmarks.seed import seed, seed_shape, seeded_size
+
+    # Measure rendering rather than response cache hits, and every call
+    # rather than rate limit rejections; the test client posts forms without
+    # CSRF tokens
+    config["benchmark"] = type(
+        "BenchmarkConfig",
+        (config[os.environ.get("BENCHMARK_CONFIG", "default")],),
+        {
+            "RESPONSE_CACHE_TYPE": "null",
+            "RATE_LIMIT_ENABLED": False,
+            "WTF_CSRF_ENABLED": False,
+        },
+    )
+    app = create_app("benchmark", bootstrap=False)
+
+    users, thoughts_per_user = seed_shape(size)
+    with app.app_context():
+        if seeded_size() != users * thoughts_per_user:
+            db.session.remove()
+            db.engine.dispose()
+            if os.path.exists(path):
+                os.remove(path)
+            print(f"Seeding {size} thoughts into {path} ...", file=sys.stderr)
+            started = time.perf_counter()
+            seed(size, processes=processes)
+            print(f"Seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        fixtures = Fixtures()
+        cases = helper_cases(fixtures)
+        engine = db.engine
+
+    cases += route_cases(app, fixtures)
+    results = {}
+    for case in cases:
+        if name_filter and name_filter not in case.name:
+            continue
+        if case.kind == "helper":
+            with app.app_context():
+                results[case.name] = measure(case, iterations, warmup, engine)
+        else:
+            results[case.name] = measure(case, iterations, warmup, engine)
+        print(f"  {size_name:>5} {case.name}", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """List regressions of ``results`` against ``baseline``"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        limit = previous["p50_ms"] * (1 + threshold)
+        if current["p50_ms"] > max(limit, previous["p50_ms"] + NOISE_FLOOR_MS):
+            regressions.append(
+                f"{key}: p50 {previous['p50_ms']:.2f} -> {current['p50_ms']:.2f} ms"
+            )
+        if current["queries"] > previous["queries"]:
+            regressions.append(
+                f"{key}: queries {previous['queries']} -> {current['queries']}"
+            )
+    return regressions
+
+
+def print_table(results, baseline):
+    print(
+        f"{'case':<52} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8} "
+        f"{'peak KiB':>9} {'p50 vs base':>12}"
+    )
+    for key, r in results.items():
+        change = ""
+        if key in baseline and baseline[key]["p50_ms"]:
+            change = f"{(r['p50_ms'] / baseline[key]['p50_ms'] - 1) * 100:+.0f}%"
+        print(
+            f"{key:<52} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r['queries']:>8} {r['peak_kib']:>9.1f} {change:>12}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1k,100k,1m")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--filter", default="", help="Only cases containing this")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed p50 slowdown as a fraction of the baseline (default 0.2)",
+    )
+    parser.add_argument(
+        "--seed-processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes generating data when seeding a database",
+    )
+    parser.add_argument("--size-worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size_worker:
+        results = run_size(
+            args.size_worker,
+            args.data_dir,
+            args.iterations,
+            args.warmup,
+            args.filter,
+            args.seed_processes,
+        )
+        json.dump(results, sys.stdout)
+        return 0
+
+    results = {}
+    for size_name in args.sizes.split(","):
+        command = [sys.executable, "-m", "benchmarks.run", "--size-worker", size_name]
+        command += ["--iterations", str(args.iterations), "--warmup", str(args.warmup)]
+        command += ["--data-dir", args.data_dir, "--filter", args.filter]
+        command += ["--seed-processes", str(args.seed_processes)]
+        output = subprocess.run(  # nosec B603
+            command, stdout=subprocess.PIPE, check=True, text=True
+        ).stdout
+        for name, result in json.loads(output).items():
+            results[f"{size_name}:{name}"] = result
+
+    baseline = {}
+    if args.compare and not os.path.exists(args.compare):
+        print(f"No baseline at {args.compare}; this run becomes the baseline.")
+        args.save_baseline = args.save_baseline or args.compare
+        args.compare = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(
+                {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions (threshold {args.threshold:.0%}):")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Deterministic benchmark databases.
+
+Databases are filled by the synthetic data generator (``app/synthetic.py``)
+with one user per 1000 thoughts (at least 10) and are kept on disk so later
+runs at the same size reuse them. The benchmark user is the one with the most
+thoughts.
+"""
+
+import sqlalchemy as sa
+
+from app.models import Thought, bootstrap_database, db
+from app.synthetic import generate
+
+BENCH_PREFIX = "bench"
+BENCH_USERNAME = f"{BENCH_PREFIX}0"
+BENCH_PASSWORD = "bench-password"  # nosec B105
+
+
+def seed_shape(size):
+    """Number of users and thoughts per user for about ``size`` thoughts"""
+    users = max(10, size // 1000)
+    return users, size // users
+
+
+def seeded_size():
+    """Number of thoughts in the current database, or None if not seeded"""
+    if not sa.inspect(db.engine).has_table("thoughts"):
+        return None
+    return db.session.execute(sa.select(sa.func.count()).select_from(Thought)).scalar()
+
+
+def seed(size, seed=1234, processes=1):
+    """Fill an empty database with about ``size`` thoughts"""
+    bootstrap_database(create_schema=True)
+    users, thoughts_per_user = seed_shape(size)
+    generate(
+        users=users,
+        thoughts_per_user=thoughts_per_user,
+        seed=seed,
+        username_prefix=BENCH_PREFIX,
+        password=BENCH_PASSWORD,
+        batch_size=10_000,
+        processes=processes,
+    )
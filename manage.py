@@ -6,15 +6,25 @@ This script provides commands for database operations like migrations,
 seeding, and maintenance.
 """
 
+import json
+import re
+import subprocess  # nosec B404
+import sys
+
 import click
+from flask.cli import FlaskGroup
 
 from app import create_app
 from app.models import User, db
 
-app = create_app()
+# Commands set up the database explicitly (init-db, bootstrap, db upgrade)
+app = create_app(bootstrap=False)
+
+# Commands get this app, not one the Flask CLI would build with create_app()
+cli = FlaskGroup(create_app=lambda: app, help=__doc__)
 
 
-@app.cli.command()
+@cli.command()
 def init_db():
     """Initialize the database."""
     with app.app_context():
@@ -22,7 +32,25 @@ def init_db():
         click.echo("Database initialized!")
 
 
-@app.cli.command()
+@cli.command()
+@click.option(
+    "--create-schema",
+    is_flag=True,
+    help="Also create missing tables (for databases not managed by migrations).",
+)
+def bootstrap(create_schema):
+    """Create the default admin user if no users exist."""
+    with app.app_context():
+        from app.models import bootstrap_database
+
+        user = bootstrap_database(create_schema=create_schema)
+        if user is not None:
+            click.echo(f"Created default admin user: {user.username}")
+        else:
+            click.echo("Users already exist; nothing to do.")
+
+
+@cli.command()
 def seed_db():
     """Seed the database with initial data."""
     with app.app_context():
@@ -38,7 +66,7 @@ def seed_db():
         click.echo("Database seeded!")
 
 
-@app.cli.command()
+@cli.command()
 def list_users():
     """List all users in the database."""
     with app.app_context():
@@ -53,7 +81,7 @@ def list_users():
             click.echo("No users found in database.")
 
 
-@app.cli.command()
+@cli.command()
 @click.argument("username")
 def delete_user(username):
     """Delete a user by username."""
@@ -67,5 +95,267 @@ def delete_user(username):
             click.echo(f"User not found: {username}")
 
 
+@cli.command()
+def rebuild_search_index():
+    """Rebuild the full-text search index for thoughts."""
+    with app.app_context():
+        from app.models import rebuild_search_index as rebuild_index
+        from app.models import search_index_enabled
+
+        if not search_index_enabled():
+            click.echo("Full-text search index requires SQLite; nothing to do.")
+            return
+
+        indexed = rebuild_index()
+        click.echo(f"Search index rebuilt: {indexed} thoughts indexed.")
+
+
+@cli.command()
+def rebuild_tag_counts():
+    """Recompute the tag frequency aggregates from the tag links."""
+    with app.app_context():
+        from app.models import rebuild_tag_counts as rebuild_counts
+
+        rows = rebuild_counts()
+        click.echo(f"Tag counts rebuilt: {rows} rows.")
+
+
+@cli.command()
+def rebuild_daily_counts():
+    """Recompute the per-user daily thought counts from the thoughts."""
+    with app.app_context():
+        from app.models import rebuild_daily_counts as rebuild_counts
+
+        rows = rebuild_counts()
+        click.echo(f"Daily thought counts rebuilt: {rows} rows.")
+
+
+@cli.command()
+@click.option(
+    "--vacuum-pages",
+    type=int,
+    help="Free pages to return to the file system (default: all).",
+)
+@click.option(
+    "--enable-incremental-vacuum",
+    is_flag=True,
+    help="Switch the database to incremental auto-vacuum with a full VACUUM.",
+)
+def maintain_db(vacuum_pages, enable_incremental_vacuum):
+    """Analyze, vacuum and checkpoint the SQLite database."""
+    with app.app_context():
+        from app.database import maintain_database
+
+        try:
+            result = maintain_database(
+                db.engine, vacuum_pages, enable_incremental_vacuum
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        click.echo("Statistics refreshed (ANALYZE, PRAGMA optimize).")
+        if result["incremental_vacuum"]:
+            click.echo(
+                f"Incremental vacuum: {result['freed_pages']} pages freed, "
+                f"{result['free_pages']} free pages left."
+            )
+        else:
+            click.echo(
+                f"Incremental vacuum is off ({result['free_pages']} free pages); "
+                "use --enable-incremental-vacuum to turn it on."
+            )
+        checkpoint = result.get("checkpoint")
+        if checkpoint:
+            state = "busy, partial" if checkpoint["busy"] else "complete"
+            click.echo(
+                f"WAL checkpoint ({state}): {checkpoint['checkpointed_pages']} of "
+                f"{checkpoint['wal_pages']} pages written back."
+            )
+        else:
+            click.echo(f"Journal mode is {result['journal_mode']}; no checkpoint.")
+
+
+@cli.command()
+def warm_templates():
+    """Compile every template into the shared bytecode cache."""
+    import time
+
+    from app.templating import warm_templates as run_warmup
+
+    started = time.perf_counter()
+    count = run_warmup(app)
+    click.echo(
+        f"Compiled {count} templates in {(time.perf_counter() - started) * 1000:.0f} ms."
+    )
+
+
+@cli.command()
+@click.option("--clean", is_flag=True, help="Remove files of earlier builds.")
+def build_assets(clean):
+    """Minify, fingerprint and precompress the static assets."""
+    import os
+
+    from app.assets import build_assets as run_build
+
+    output_dir = app.config.get("ASSETS_DIR") or os.path.join(app.static_folder, "dist")
+    manifest = run_build(app.static_folder, output_dir, clean=clean)
+    for name, entry in sorted(manifest.items()):
+        encodings = ", ".join(entry["encodings"]) or "uncompressed"
+        click.echo(f"  {name} -> {entry['path']} ({entry['size']} bytes; {encodings})")
+    click.echo(f"Built {len(manifest)} assets into {output_dir}.")
+
+
+@cli.command()
+@click.option("--threads", default=1, show_default=True, type=int)
+@click.option("--burst", is_flag=True, help="Exit once no job is due.")
+def worker(threads, burst):
+    """Run stored background jobs until interrupted."""
+    import signal
+    import threading
+
+    from app.jobs import JobWorker
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+
+    workers = [
+        threading.Thread(target=JobWorker(app).run, args=(stop, None, burst))
+        for _ in range(threads)
+    ]
+    click.echo(f"Job worker running with {threads} threads.")
+    for thread in workers:
+        thread.start()
+    # Joined with a timeout so the main thread keeps handling signals
+    while any(thread.is_alive() for thread in workers):
+        for thread in workers:
+            thread.join(0.5)
+    click.echo("Job worker stopped.")
+
+
+@cli.command()
+@click.argument("username")
+@click.argument("source", type=click.File("rb"))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["ndjson", "csv"]),
+    help="Input format (default: guessed from the file name).",
+)
+@click.option("--batch-size", default=500, show_default=True, type=int)
+def import_thoughts(username, source, fmt, batch_size):
+    """Import thoughts for a user from an NDJSON or CSV file ('-' for stdin)."""
+    with app.app_context():
+        from app.importer import import_thoughts as run_import
+
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            click.echo(f"User not found: {username}")
+            return
+
+        if fmt is None:
+            fmt = "csv" if source.name.lower().endswith(".csv") else "ndjson"
+        result = run_import(user.id, source, fmt, batch_size=batch_size)
+
+        for error in result.errors:
+            click.echo(f"  line {error['line']}: {error['error']}", err=True)
+        if result.failed > len(result.errors):
+            click.echo(
+                f"  ... {result.failed - len(result.errors)} more errors", err=True
+            )
+        click.echo(
+            f"Imported {result.imported} thoughts for {username}; "
+            f"{result.failed} rows failed."
+        )
+
+
+@cli.command()
+@click.argument("username")
+@click.argument("output", type=click.File("wb"), default="-")
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["ndjson", "csv"]),
+    default="ndjson",
+    show_default=True,
+)
+@click.option("--gzip", "compress", is_flag=True, help="Gzip the output.")
+@click.option("--batch-size", default=1000, show_default=True, type=int)
+def export_thoughts(username, output, fmt, compress, batch_size):
+    """Export a user's thoughts as NDJSON or CSV ('-' writes to stdout)."""
+    with app.app_context():
+        from app.exporter import export_thoughts as run_export
+
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            click.echo(f"User not found: {username}", err=True)
+            return
+
+        for chunk in run_export(user.id, fmt, compress, batch_size=batch_size):
+            output.write(chunk)
+
+
+# Measured in a fresh interpreter, so imports are not already cached
+STARTUP_PROFILE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app(sys.argv[1], bootstrap=sys.argv[2] == "1")
+finished = time.perf_counter()
+print(json.dumps({"import": imported - started, "factory": finished - imported}))
+"""
+
+
+def _slowest_imports(importtime_output, top):
+    """Top-level modules with the highest cumulative import time (us)"""
+    totals = {}
+    for line in importtime_output.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match and "." not in match.group(3):
+            name = match.group(3)
+            totals[name] = max(totals.get(name, 0), int(match.group(1)))
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+@cli.command()
+@click.option("--config", "config_name", default="default", show_default=True)
+@click.option("--runs", default=5, show_default=True, type=int)
+@click.option("--top", default=10, show_default=True, type=int)
+@click.option(
+    "--bootstrap/--no-bootstrap",
+    default=False,
+    show_default=True,
+    help="Include schema creation and the default user in the factory time.",
+)
+def startup_profile(config_name, runs, top, bootstrap):
+    """Report cold-start import and app-factory time."""
+    timings = []
+    importtime = ""
+    for run in range(runs):
+        command = [sys.executable]
+        if run == 0:
+            command += ["-X", "importtime"]
+        command += ["-c", STARTUP_PROFILE_SCRIPT, config_name, str(int(bootstrap))]
+        result = subprocess.run(  # nosec B603
+            command, capture_output=True, text=True, check=True
+        )
+        timings.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        if run == 0:
+            importtime = result.stderr
+
+    def median(key):
+        values = sorted(t[key] for t in timings[1:] or timings)
+        return values[len(values) // 2] * 1000
+
+    click.echo(f"Cold start over {runs} runs (median, first run excluded):")
+    click.echo(f"  import app:     {median('import'):8.1f} ms")
+    click.echo(f"  create_app():   {median('factory'):8.1f} ms")
+    click.echo(f"  total:          {median('import') + median('factory'):8.1f} ms")
+    click.echo("Slowest top-level imports (first run):")
+    for name, micros in _slowest_imports(importtime, top):
+        click.echo(f"  {name:<24} {micros / 1000:8.1f} ms")
+
+
 if __name__ == "__main__":
-    app.cli()
+    cli()
@@ -49,6 +49,20 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the FTS5 search index out of autogenerate.
+
+    ``thoughts_fts`` is a virtual table created with raw DDL by its
+    migration, and SQLite reflects it and its ``thoughts_fts_*`` shadow tables
+    as plain tables missing from the metadata, which autogenerate would drop.
+    """
+    if type_ == "table" and (
+        name == "thoughts_fts" or name.startswith("thoughts_fts_")
+    ):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -62,7 +76,12 @@ def run_migrations_offline():
 
     """
     url = config.get_main_option("sqlalchemy.url")
-    context.configure(url=url, target_metadata=get_metadata(), literal_binds=True)
+    context.configure(
+        url=url,
+        target_metadata=get_metadata(),
+        literal_binds=True,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -89,6 +108,7 @@ def run_migrations_online():
     conf_args = current_app.extensions["migrate"].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
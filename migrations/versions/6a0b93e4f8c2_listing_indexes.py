@@ -0,0 +1,84 @@
+"""composite indexes for listing and lookup queries
+
+Revision ID: 6a0b93e4f8c2
+Revises: d5e7f21c9a44
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "6a0b93e4f8c2"
+down_revision = "d5e7f21c9a44"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_users_oauth_provider_oauth_id",
+        "users",
+        ["oauth_provider", "oauth_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_thoughts_user_id_created_at",
+        "thoughts",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_thoughts_is_public_created_at",
+        "thoughts",
+        ["is_public", "created_at", "id"],
+        unique=False,
+    )
+
+    # Copy the listing sort keys onto thought_tags so tag pages are read in
+    # index order instead of being sorted per request
+    with op.batch_alter_table("thought_tags") as batch_op:
+        batch_op.add_column(sa.Column("user_id", sa.String(length=36), nullable=True))
+        batch_op.add_column(sa.Column("is_public", sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column("created_at", sa.DateTime(), nullable=True))
+
+    op.execute(
+        "UPDATE thought_tags SET "
+        "user_id = (SELECT user_id FROM thoughts WHERE thoughts.id = thought_tags.thought_id), "
+        "is_public = (SELECT COALESCE(is_public, 0) FROM thoughts "
+        "WHERE thoughts.id = thought_tags.thought_id), "
+        "created_at = (SELECT COALESCE(created_at, CURRENT_TIMESTAMP) FROM thoughts "
+        "WHERE thoughts.id = thought_tags.thought_id)"
+    )
+
+    with op.batch_alter_table("thought_tags") as batch_op:
+        batch_op.alter_column("user_id", existing_type=sa.String(36), nullable=False)
+        batch_op.alter_column("is_public", existing_type=sa.Boolean(), nullable=False)
+        batch_op.alter_column("created_at", existing_type=sa.DateTime(), nullable=False)
+        batch_op.drop_index("ix_thought_tags_tag_id_thought_id")
+        batch_op.create_index(
+            "ix_thought_tags_tag_user_created",
+            ["tag_id", "user_id", "created_at", "thought_id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_thought_tags_tag_public_created",
+            ["tag_id", "is_public", "created_at", "thought_id"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("thought_tags") as batch_op:
+        batch_op.drop_index("ix_thought_tags_tag_public_created")
+        batch_op.drop_index("ix_thought_tags_tag_user_created")
+        batch_op.create_index(
+            "ix_thought_tags_tag_id_thought_id", ["tag_id", "thought_id"], unique=False
+        )
+        batch_op.drop_column("created_at")
+        batch_op.drop_column("is_public")
+        batch_op.drop_column("user_id")
+
+    op.drop_index("ix_thoughts_is_public_created_at", table_name="thoughts")
+    op.drop_index("ix_thoughts_user_id_created_at", table_name="thoughts")
+    op.drop_index("ix_users_oauth_provider_oauth_id", table_name="users")
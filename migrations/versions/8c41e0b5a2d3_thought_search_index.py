@@ -0,0 +1,37 @@
+"""thought full-text search index
+
+Revision ID: 8c41e0b5a2d3
+Revises: 3f2a9c1d7b10
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8c41e0b5a2d3"
+down_revision = "3f2a9c1d7b10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS thoughts_fts USING fts5("
+        "thought_id UNINDEXED, user_id UNINDEXED, title, content, tags, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "INSERT INTO thoughts_fts (thought_id, user_id, title, content, tags) "
+        "SELECT id, user_id, title, content, COALESCE(tags, '') FROM thoughts"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    op.execute("DROP TABLE IF EXISTS thoughts_fts")
@@ -0,0 +1,62 @@
+"""tag frequency aggregates
+
+Revision ID: b7c3d9e2f415
+Revises: 6a0b93e4f8c2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7c3d9e2f415"
+down_revision = "6a0b93e4f8c2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tag_counts = op.create_table(
+        "tag_counts",
+        sa.Column("scope", sa.String(length=36), nullable=False),
+        sa.Column("tag_id", sa.Integer(), nullable=False),
+        sa.Column("thought_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["tag_id"], ["tags.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("scope", "tag_id"),
+    )
+    op.create_index(
+        "ix_tag_counts_scope_thought_count",
+        "tag_counts",
+        ["scope", "thought_count", "tag_id"],
+        unique=False,
+    )
+
+    # Backfill from the existing tag links: per user, then public
+    thought_tags = sa.table(
+        "thought_tags",
+        sa.column("tag_id"),
+        sa.column("user_id"),
+        sa.column("is_public"),
+    )
+    count = sa.func.count()
+    op.execute(
+        sa.insert(tag_counts).from_select(
+            ["scope", "tag_id", "thought_count"],
+            sa.select(thought_tags.c.user_id, thought_tags.c.tag_id, count).group_by(
+                thought_tags.c.user_id, thought_tags.c.tag_id
+            ),
+        )
+    )
+    op.execute(
+        sa.insert(tag_counts).from_select(
+            ["scope", "tag_id", "thought_count"],
+            sa.select(sa.literal("public"), thought_tags.c.tag_id, count)
+            .where(thought_tags.c.is_public.is_(True))
+            .group_by(thought_tags.c.tag_id),
+        )
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tag_counts_scope_thought_count", table_name="tag_counts")
+    op.drop_table("tag_counts")
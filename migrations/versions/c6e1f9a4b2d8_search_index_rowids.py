@@ -0,0 +1,40 @@
+"""key search index entries by a rowid derived from the thought id
+
+Revision ID: c6e1f9a4b2d8
+Revises: a9d2c5f7e311
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+import hashlib
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c6e1f9a4b2d8"
+down_revision = "a9d2c5f7e311"
+branch_labels = None
+depends_on = None
+
+
+def _search_rowid(thought_id):
+    # Same as app.models.search_rowid at the time of this migration
+    digest = hashlib.sha256(thought_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+
+    rows = bind.exec_driver_sql("SELECT rowid, thought_id FROM thoughts_fts").all()
+    for rowid, thought_id in rows:
+        bind.exec_driver_sql(
+            "UPDATE thoughts_fts SET rowid = ? WHERE rowid = ?",
+            (_search_rowid(thought_id), rowid),
+        )
+
+
+def downgrade():
+    # Earlier revisions find entries by thought_id and ignore their rowids
+    pass
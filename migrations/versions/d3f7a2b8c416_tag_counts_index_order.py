@@ -0,0 +1,35 @@
+"""order the tag_counts index like the top tags query
+
+Revision ID: d3f7a2b8c416
+Revises: c6e1f9a4b2d8
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d3f7a2b8c416"
+down_revision = "c6e1f9a4b2d8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_tag_counts_scope_thought_count", table_name="tag_counts")
+    op.create_index(
+        "ix_tag_counts_scope_thought_count",
+        "tag_counts",
+        ["scope", sa.text("thought_count DESC"), "tag_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tag_counts_scope_thought_count", table_name="tag_counts")
+    op.create_index(
+        "ix_tag_counts_scope_thought_count",
+        "tag_counts",
+        ["scope", "thought_count", "tag_id"],
+        unique=False,
+    )
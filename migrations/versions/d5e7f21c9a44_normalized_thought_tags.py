@@ -0,0 +1,76 @@
+"""normalized thought tags
+
+Revision ID: d5e7f21c9a44
+Revises: 8c41e0b5a2d3
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d5e7f21c9a44"
+down_revision = "8c41e0b5a2d3"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _tag_names(tags):
+    names = []
+    for raw in (tags or "").split(","):
+        name = raw.strip()[:100].lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    tags = op.create_table(
+        "tags",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    thought_tags = op.create_table(
+        "thought_tags",
+        sa.Column("thought_id", sa.String(length=36), nullable=False),
+        sa.Column("tag_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["tag_id"], ["tags.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["thought_id"], ["thoughts.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("thought_id", "tag_id"),
+    )
+    op.create_index(
+        "ix_thought_tags_tag_id_thought_id",
+        "thought_tags",
+        ["tag_id", "thought_id"],
+        unique=False,
+    )
+
+    # Backfill from the comma-separated thoughts.tags column
+    bind = op.get_bind()
+    thoughts = sa.table("thoughts", sa.column("id"), sa.column("tags"))
+    tag_ids = {}
+    links = []
+    rows = bind.execute(
+        sa.select(thoughts.c.id, thoughts.c.tags).where(thoughts.c.tags.isnot(None))
+    ).all()
+    for thought_id, raw_tags in rows:
+        for name in _tag_names(raw_tags):
+            if name not in tag_ids:
+                result = bind.execute(sa.insert(tags).values(name=name))
+                tag_ids[name] = result.inserted_primary_key[0]
+            links.append({"thought_id": thought_id, "tag_id": tag_ids[name]})
+            if len(links) >= BATCH_SIZE:
+                bind.execute(sa.insert(thought_tags), links)
+                links = []
+    if links:
+        bind.execute(sa.insert(thought_tags), links)
+
+
+def downgrade():
+    op.drop_index("ix_thought_tags_tag_id_thought_id", table_name="thought_tags")
+    op.drop_table("thought_tags")
+    op.drop_table("tags")
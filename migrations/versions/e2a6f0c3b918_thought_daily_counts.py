@@ -0,0 +1,52 @@
+"""per-user daily thought counts
+
+Revision ID: e2a6f0c3b918
+Revises: b7c3d9e2f415
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e2a6f0c3b918"
+down_revision = "b7c3d9e2f415"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    thought_daily_counts = op.create_table(
+        "thought_daily_counts",
+        sa.Column("user_id", sa.String(length=36), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("category", sa.String(length=50), nullable=False),
+        sa.Column("thought_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "day", "category"),
+    )
+
+    # Backfill from the existing thoughts
+    thoughts = sa.table(
+        "thoughts",
+        sa.column("user_id"),
+        sa.column("created_at"),
+        sa.column("category"),
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        day = sa.func.date(thoughts.c.created_at)
+    else:
+        day = sa.cast(thoughts.c.created_at, sa.Date)
+    category = sa.func.coalesce(thoughts.c.category, "")
+    op.execute(
+        sa.insert(thought_daily_counts).from_select(
+            ["user_id", "day", "category", "thought_count"],
+            sa.select(thoughts.c.user_id, day, category, sa.func.count()).group_by(
+                thoughts.c.user_id, day, category
+            ),
+        )
+    )
+
+
+def downgrade():
+    op.drop_table("thought_daily_counts")
@@ -0,0 +1,48 @@
+"""stored thought excerpts for list pages
+
+Revision ID: f4b8d1e6a207
+Revises: e2a6f0c3b918
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f4b8d1e6a207"
+down_revision = "e2a6f0c3b918"
+branch_labels = None
+depends_on = None
+
+EXCERPT_LENGTH = 100
+
+
+def upgrade():
+    with op.batch_alter_table("thoughts") as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "excerpt",
+                sa.String(length=EXCERPT_LENGTH + 3),
+                server_default="",
+                nullable=False,
+            )
+        )
+
+    # Backfill: the first characters of the content, with "..." if cut
+    thoughts = sa.table("thoughts", sa.column("content"), sa.column("excerpt"))
+    op.execute(
+        sa.update(thoughts).values(
+            excerpt=sa.case(
+                (
+                    sa.func.length(thoughts.c.content) > EXCERPT_LENGTH,
+                    sa.func.substr(thoughts.c.content, 1, EXCERPT_LENGTH).concat("..."),
+                ),
+                else_=thoughts.c.content,
+            )
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("thoughts") as batch_op:
+        batch_op.drop_column("excerpt")
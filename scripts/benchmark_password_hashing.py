@@ -0,0 +1,73 @@
+"""
+Benchmark password verification throughput (logins/sec) per hash cost.
+
+For each hash method, a number of concurrent "login" threads verify a
+password through the PasswordHasher, once hashing inline on the calling
+threads and once through the process pool.
+
+Usage:
+    python scripts/benchmark_password_hashing.py [--logins 64] [--threads 8]
+        [--workers 4] [--method pbkdf2:sha256:600000 ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+)  # nosec
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app.passwords import PasswordHasher  # noqa: E402
+
+DEFAULT_METHODS = [
+    "pbkdf2:sha256:260000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+    "scrypt:32768:8:1",
+]
+
+
+def run(hasher, pwhash, logins, threads):
+    """Return logins/sec for ``logins`` verifications on ``threads`` threads"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(
+            pool.map(lambda _: hasher.verify(pwhash, "secret"), range(logins))
+        )
+    assert all(results)
+    return logins / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--method", action="append", dest="methods")
+    args = parser.parse_args()
+
+    inline = PasswordHasher(workers=0, max_pending=args.threads)
+    pooled = PasswordHasher(workers=args.workers, max_pending=args.threads)
+    pooled.verify(generate_password_hash("secret", "pbkdf2:sha256:1"), "secret")
+
+    print(f"{args.logins} logins on {args.threads} threads, {args.workers} workers")
+    print(f"{'method':<24} {'inline/s':>10} {'pool/s':>10}")
+    try:
+        for method in args.methods or DEFAULT_METHODS:
+            pwhash = generate_password_hash("secret", method)
+            print(
+                f"{method:<24} "
+                f"{run(inline, pwhash, args.logins, args.threads):>10.1f} "
+                f"{run(pooled, pwhash, args.logins, args.threads):>10.1f}"
+            )
+    finally:
+        pooled.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,100 @@
+"""
+Generate synthetic users and thoughts shaped like production data.
+
+Thoughts per user and tags follow Zipf distributions, content lengths are
+log-normal, and the output is the same for the same seed and options,
+however many processes generate it.
+
+Usage:
+    python scripts/generate_sample_thoughts.py [--users 100]
+        [--thoughts-per-user 100] [--user-skew 1.0] [--content-words 40]
+        [--tags 200] [--tag-skew 1.1] [--public-ratio 0.3] [--days 730]
+        [--seed 1234] [--processes 4]
+"""
+
+import argparse
 import os
-import random
 import sys
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 )  # nosec
 
 from app import create_app  # noqa: E402
-from app.models import Thought, User, db  # noqa: E402
-
-app = create_app()
-
-sample_categories = ["idea", "note", "inspiration", "todo", "question", "project"]
-sample_tags = [
-    "python",
-    "flask",
-    "web",
-    "ai",
-    "ml",
-    "fun",
-    "test",
-    "sample",
-    "public",
-    "demo",
-]
-
-sample_titles = [f"Sample Thought #{i+1}" for i in range(25)]
-sample_contents = [
-    f"This is the content for sample thought number {i+1}.\nIt is public and generated for pagination testing."
-    for i in range(25)
-]
-
-
-def get_or_create_test_user():
-    user = User.query.first()
-    if not user:
-        user = User(
-            username="testuser", email="testuser@example.com", password="test1234"
-        )
-        db.session.add(user)
-        db.session.commit()
-    return user
+from app.synthetic import DEFAULT_END, generate  # noqa: E402
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--thoughts-per-user", type=int, default=100)
+    parser.add_argument(
+        "--user-skew",
+        type=float,
+        default=1.0,
+        help="Zipf exponent of thoughts per user (0: same for every user)",
+    )
+    parser.add_argument(
+        "--content-words", type=int, default=40, help="Median words per thought"
+    )
+    parser.add_argument(
+        "--content-sigma",
+        type=float,
+        default=0.8,
+        help="Spread of the log-normal content length",
+    )
+    parser.add_argument("--tags", type=int, default=200, help="Tag vocabulary size")
+    parser.add_argument("--tag-skew", type=float, default=1.1)
+    parser.add_argument("--max-tags", type=int, default=4)
+    parser.add_argument("--public-ratio", type=float, default=0.3)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        default=DEFAULT_END,
+        help=f"End of the date span (default {DEFAULT_END.date()})",
+    )
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--username-prefix", default="user")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+
+    app = create_app()
     with app.app_context():
-        user = get_or_create_test_user()
-        # Remove existing sample thoughts for a clean test
-        Thought.query.filter(Thought.title.like("Sample Thought #%")).delete(
-            synchronize_session=False
-        )
-        db.session.commit()
-        for i in range(25):
-            thought = Thought(
-                title=sample_titles[i],
-                content=sample_contents[i],
-                user_id=user.id,
-                category=random.choice(sample_categories),
-                tags=", ".join(random.sample(sample_tags, k=3)),
-                is_public=True,
+        started = time.perf_counter()
+        try:
+            created = generate(
+                users=args.users,
+                thoughts_per_user=args.thoughts_per_user,
+                user_skew=args.user_skew,
+                content_words=args.content_words,
+                content_sigma=args.content_sigma,
+                tag_vocabulary_size=args.tags,
+                tag_skew=args.tag_skew,
+                max_tags=args.max_tags,
+                public_ratio=args.public_ratio,
+                days=args.days,
+                end=args.end,
+                seed=args.seed,
+                username_prefix=args.username_prefix,
+                password=args.password,
+                batch_size=args.batch_size,
+                processes=args.processes,
             )
-            thought.created_at = datetime.utcnow() - timedelta(days=25 - i)
-            thought.updated_at = datetime.utcnow() - timedelta(days=25 - i)
-            db.session.add(thought)
-        db.session.commit()
-        print("25 sample public thoughts created for user:", user.username)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - started
+    print(
+        f"Created {created['users']} users and {created['thoughts']} thoughts "
+        f"in {elapsed:.1f}s ({created['thoughts'] / elapsed:,.0f} thoughts/s)"
+    )
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
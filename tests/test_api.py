@@ -0,0 +1,133 @@
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.models import User, create_thought, create_user, db
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    return client
+
+
+@pytest.fixture
+def admin(app):
+    return User.query.filter_by(username="admin").first()
+
+
+def test_requires_login_with_json_401(app):
+    response = app.test_client().get("/api/thoughts")
+
+    assert response.status_code == 401
+    assert response.get_json()["status"] == "error"
+
+
+def test_crud_round_trip(client):
+    response = client.post(
+        "/api/thoughts",
+        json={"title": "API", "content": "body", "tags": ["a", "b"]},
+    )
+    assert response.status_code == 201
+    thought = response.get_json()["data"]
+    assert thought["tags"] == ["a", "b"]
+    url = response.headers["Location"]
+
+    response = client.patch(url, json={"title": "Renamed", "is_public": True})
+    assert response.get_json()["data"]["title"] == "Renamed"
+    assert response.get_json()["data"]["content"] == "body"
+
+    assert client.put(url, json={"title": "No content"}).status_code == 400
+    assert client.get(url).get_json()["data"]["is_public"] is True
+
+    assert client.delete(url).status_code == 200
+    assert client.get(url).status_code == 404
+
+
+def test_cannot_modify_other_users_thoughts(client):
+    other = create_user("other", "other@example.com", "secret123")
+    shared = create_thought("Shared", "...", other.id, is_public=True)
+    private = create_thought("Private", "...", other.id)
+
+    assert client.get(f"/api/thoughts/{shared.id}").status_code == 200
+    assert client.get(f"/api/thoughts/{private.id}").status_code == 404
+    assert client.delete(f"/api/thoughts/{shared.id}").status_code == 403
+
+
+def test_list_uses_cursor_pagination_and_sparse_fields(client, admin):
+    for i in range(5):
+        create_thought(f"T{i}", "long content", admin.id, tags="x")
+
+    response = client.get("/api/thoughts?per_page=2&fields=title")
+    body = response.get_json()
+    assert [t for t in body["data"]] == [{"title": "T4"}, {"title": "T3"}]
+    assert body["pagination"]["total"] == 5
+
+    cursor = body["pagination"]["next_cursor"]
+    body = client.get(f"/api/thoughts?per_page=2&fields=title&after={cursor}")
+    assert [t["title"] for t in body.get_json()["data"]] == ["T2", "T1"]
+
+    body = client.get("/api/thoughts?tag=x&per_page=10").get_json()
+    assert len(body["data"]) == 5
+    assert client.get("/api/thoughts?fields=secret").status_code == 400
+
+
+def test_batch_fetch_resolves_ids_in_one_query(app, client, admin):
+    ids = [create_thought(f"B{i}", "...", admin.id).id for i in range(3)]
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if "FROM thoughts" in statement:
+            statements.append(statement)
+
+    sa.event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        response = client.get(
+            f"/api/thoughts?ids={ids[2]},missing,{ids[0]}&fields=id,title"
+        )
+    finally:
+        sa.event.remove(db.engine, "before_cursor_execute", record)
+
+    body = response.get_json()
+    assert [t["title"] for t in body["data"]] == ["B2", "B0"]
+    assert body["missing"] == ["missing"]
+    assert len(statements) == 1
+    assert "content" not in statements[0].split("FROM")[0]
+
+
+def test_search(client, admin):
+    create_thought("Flask tips", "blueprints", admin.id)
+    create_thought("Other", "nothing", admin.id)
+
+    body = client.get("/api/thoughts/search?q=blueprint").get_json()
+
+    assert [t["title"] for t in body["data"]] == ["Flask tips"]
+    assert client.get("/api/thoughts/search").status_code == 400
+
+
+def test_search_loads_only_requested_fields(client, admin):
+    create_thought("Flask tips", "blueprints", admin.id)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if "bm25" in statement and "count(" not in statement:
+            statements.append(statement)
+
+    sa.event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/thoughts/search?q=blueprint&fields=title")
+    finally:
+        sa.event.remove(db.engine, "before_cursor_execute", record)
+
+    assert response.get_json()["data"] == [{"title": "Flask tips"}]
+    page_query = statements[0].split("FROM")[0]
+    assert "thoughts.title" in page_query
+    assert "thoughts.content" not in page_query
@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+
+from app import create_app
+from app.assets import build_assets, minify_css, minify_js
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+def test_minifiers_keep_literals():
+    assert (
+        minify_css(
+            "/* note */\na > b ,  c {\n  content: ' /* x */ ';\n  color: red;\n}"
+        )
+        == "a>b,c{content:' /* x */ ';color:red}"
+    )
+    source = (
+        "// header\nconst a = 'http://x'; /* block */\n"
+        "    el.innerHTML = `\n    ${a}\n    `;\n\n    run(a); // done\n"
+    )
+    assert minify_js(source) == (
+        "const a = 'http://x';\nel.innerHTML = `\n    ${a}\n    `;\nrun(a);\n"
+    )
+
+
+def test_built_assets_are_fingerprinted_and_cached_forever(app, tmp_path):
+    manifest = build_assets(app.static_folder, tmp_path)
+    app.config.update(ASSETS_DIR=str(tmp_path), ASSETS_ENABLED=True)
+    client = app.test_client()
+
+    css = manifest["css/style.css"]
+    assert f"/assets/{css['path']}" in client.get("/about").get_data(as_text=True)
+
+    plain = client.get(f"/assets/{css['path']}")
+    assert plain.status_code == 200
+    assert plain.mimetype == "text/css"
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert "Accept-Encoding" in plain.vary
+    assert len(plain.data) == css["size"]
+
+    compressed = client.get(
+        f"/assets/{css['path']}", headers={"Accept-Encoding": "gzip, deflate"}
+    )
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+
+    assert client.get("/assets/css/style.css").status_code == 404
+    assert client.get(f"/assets/{css['path']}.gz").status_code == 404
+
+
+def test_asset_url_falls_back_to_static_files(app, tmp_path):
+    app.config.update(ASSETS_DIR=str(tmp_path))
+    page = app.test_client().get("/about").get_data(as_text=True)
+    assert "/static/css/style.css" in page
+    assert "/static/js/main.js" in page
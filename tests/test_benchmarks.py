@@ -0,0 +1,26 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_benchmark_size_runs_end_to_end(tmp_path):
+    # More iterations than the login budget allows, so the suite would fail
+    # if rate limiting or caching leaked into the measured app
+    baseline = tmp_path / "baseline.json"
+    command = [sys.executable, "-m", "benchmarks.run", "--sizes", "200"]
+    command += ["--iterations", "12", "--warmup", "0", "--seed-processes", "1"]
+    command += ["--data-dir", str(tmp_path), "--compare", str(baseline)]
+    result = subprocess.run(
+        command, cwd=ROOT, capture_output=True, text=True, check=False
+    )
+
+    # Without a baseline to compare against, the run is saved as one
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert f"No baseline at {baseline}" in result.stdout
+    with open(baseline) as f:
+        results = json.load(f)["results"]
+    assert results["200:GET /thoughts/search"]["iterations"] == 12
+    assert "200:POST /login + GET /logout" in results
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+
+import pytest
+from werkzeug.http import http_date
+
+from app import create_app
+from app.models import create_thought, create_user, delete_thought, update_thought
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def thought(app):
+    user = create_user("etagger", "etagger@example.com", "secret123")
+    return create_thought("Versioned", "...", user.id, is_public=True)
+
+
+def test_detail_answers_304_for_matching_etag(client, thought):
+    first = client.get(f"/thoughts/{thought.id}")
+    assert first.status_code == 200
+    assert first.headers["ETag"].startswith('W/"')
+    assert "Last-Modified" in first.headers
+
+    again = client.get(
+        f"/thoughts/{thought.id}", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_detail_etag_changes_after_update(client, thought):
+    etag = client.get(f"/thoughts/{thought.id}").headers["ETag"]
+
+    update_thought(thought.id, content="edited")
+
+    response = client.get(f"/thoughts/{thought.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_detail_checks_visibility_before_validators(client, thought):
+    update_thought(thought.id, is_public=False)
+
+    response = client.get(f"/thoughts/{thought.id}", headers={"If-None-Match": "*"})
+    assert response.status_code == 302
+
+
+def test_public_listing_revalidates_by_etag(client, thought):
+    first = client.get("/thoughts/public")
+    assert "Last-Modified" not in first.headers
+
+    response = client.get(
+        "/thoughts/public", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+
+def test_public_listing_changes_after_delete(client, thought):
+    create_thought("Older", "...", thought.user_id, is_public=True)
+    first = client.get("/thoughts/public")
+    assert b"Versioned" in first.data
+
+    delete_thought(thought.id)
+
+    since = http_date(datetime.now(timezone.utc))
+    response = client.get(
+        "/thoughts/public",
+        headers={"If-None-Match": first.headers["ETag"], "If-Modified-Since": since},
+    )
+    assert response.status_code == 200
+    assert b"Versioned" not in response.data
+    response = client.get("/thoughts/public", headers={"If-Modified-Since": since})
+    assert response.status_code == 200
@@ -0,0 +1,92 @@
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from app.database import init_database, maintain_database
+
+
+def make_app(uri, **config):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=uri, **config)
+    db = SQLAlchemy()
+    init_database(app, db)
+    return app, db
+
+
+def pragmas(engine, *names):
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+def test_production_profile_tunes_file_databases(tmp_path):
+    app, db = make_app(
+        f"sqlite:///{tmp_path / 'ideas.db'}",
+        SQLITE_PROFILE="production",
+        SQLITE_PRAGMAS={"mmap_size": 0},
+        SQLITE_POOL_SIZE=4,
+    )
+
+    with app.app_context():
+        assert pragmas(
+            db.engine,
+            "journal_mode",
+            "busy_timeout",
+            "synchronous",
+            "foreign_keys",
+            "auto_vacuum",
+            "mmap_size",
+        ) == {
+            "journal_mode": "wal",
+            "busy_timeout": 5000,
+            "synchronous": 1,
+            "foreign_keys": 1,
+            "auto_vacuum": 2,
+            "mmap_size": 0,
+        }
+        assert isinstance(db.engine.pool, sa.pool.QueuePool)
+        assert db.engine.pool.size() == 4
+
+
+def test_databases_are_left_alone_without_a_profile(tmp_path):
+    app, db = make_app(f"sqlite:///{tmp_path / 'ideas.db'}")
+    with app.app_context():
+        assert pragmas(db.engine, "journal_mode")["journal_mode"] == "delete"
+
+    # In-memory databases cannot use WAL and keep their single connection
+    app, db = make_app("sqlite://", SQLITE_PROFILE="production")
+    with app.app_context():
+        assert pragmas(db.engine, "journal_mode")["journal_mode"] == "memory"
+
+    with pytest.raises(ValueError):
+        make_app("sqlite://", SQLITE_PROFILE="fastest")
+
+
+def test_maintenance_vacuums_and_checkpoints(tmp_path):
+    app, db = make_app(f"sqlite:///{tmp_path / 'ideas.db'}")
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE blobs (data BLOB)")
+            conn.exec_driver_sql(
+                "INSERT INTO blobs SELECT randomblob(4000) FROM "
+                "(WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+                "WHERE i < 200) SELECT i FROM n)"
+            )
+            conn.exec_driver_sql("DELETE FROM blobs")
+
+        result = maintain_database(db.engine)
+        assert not result["incremental_vacuum"]
+        assert result["free_pages"] > 0
+        assert "checkpoint" not in result
+
+        result = maintain_database(db.engine, enable_incremental_vacuum=True)
+        assert result["incremental_vacuum"]
+        assert result["free_pages"] == 0
+
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            conn.exec_driver_sql("INSERT INTO blobs VALUES (randomblob(4000))")
+        result = maintain_database(db.engine)
+        assert result["journal_mode"] == "wal"
+        assert result["checkpoint"]["busy"] is False
+        assert (tmp_path / "ideas.db-wal").stat().st_size == 0
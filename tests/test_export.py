@@ -0,0 +1,68 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from app import create_app
+from app.exporter import export_thoughts
+from app.importer import import_thoughts
+from app.models import User, create_thought, create_user, get_user_thoughts
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def user(app):
+    return create_user("exporter", "exporter@example.com", "secret123")
+
+
+def test_export_ndjson_round_trips_through_import(user):
+    create_thought("One", "first", user.id, tags="a, B", is_public=True)
+    create_thought("Two", "second\nline", user.id, category="idea")
+    other = create_user("other", "other@example.com", "secret123")
+    create_thought("Not mine", "...", other.id)
+
+    data = b"".join(export_thoughts(user.id, batch_size=1))
+    records = [json.loads(line) for line in data.decode().splitlines()]
+
+    assert [r["title"] for r in records] == ["One", "Two"]
+    assert records[0]["tags"] == ["a", "B"]
+    assert records[0]["is_public"] is True
+
+    result = import_thoughts(other.id, io.BytesIO(data))
+    assert result.imported == 2 and result.failed == 0
+    assert get_user_thoughts(other.id).total == 3
+
+
+def test_export_gzipped_csv(user):
+    create_thought("Quoted", 'has "quotes", commas', user.id, tags="x")
+
+    data = gzip.decompress(b"".join(export_thoughts(user.id, "csv", compress=True)))
+    rows = list(csv.DictReader(io.StringIO(data.decode())))
+
+    assert len(rows) == 1
+    assert rows[0]["content"] == 'has "quotes", commas'
+    assert rows[0]["is_public"] == "false"
+
+
+def test_export_endpoint_streams_attachment(app):
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    admin = User.query.filter_by(username="admin").first()
+    create_thought("Exported", "...", admin.id)
+
+    response = client.get("/api/thoughts/export?format=csv&compress=gzip")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/gzip"
+    assert 'filename="thoughts.csv.gz"' in response.headers["Content-Disposition"]
+    assert b"Exported" in gzip.decompress(response.get_data())
+    assert client.get("/api/thoughts/export?format=xml").status_code == 400
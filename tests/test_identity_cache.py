@@ -0,0 +1,108 @@
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.cache import FileSystemCache
+from app.identity import UserIdentityCache, user_identity_cache
+from app.models import create_user, db, get_user_by_username, update_user_password
+
+
+@pytest.fixture
+def app():
+    # No app context is kept pushed, so every request resolves current_user
+    return create_app("testing")
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    return client
+
+
+def _count_user_queries(func):
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    sa.event.listen(db.engine, "before_cursor_execute", before_execute)
+    try:
+        func()
+    finally:
+        sa.event.remove(db.engine, "before_cursor_execute", before_execute)
+    return len(statements)
+
+
+def test_authenticated_requests_reuse_cached_identity(app, client):
+    client.get("/about")
+    with app.app_context():
+        cache = user_identity_cache()
+        hits = cache.stats()["hits"]
+
+        assert _count_user_queries(lambda: client.get("/about")) == 0
+        assert cache.stats()["hits"] == hits + 1
+
+
+def test_password_change_invalidates_cached_identity(app, client):
+    client.get("/about")
+    with app.app_context():
+        cache = user_identity_cache()
+        misses = cache.stats()["misses"]
+        update_user_password(get_user_by_username("admin"), "changed123")
+
+    client.get("/about")
+    assert cache.stats()["misses"] == misses + 1
+    assert cache.stats()["invalidations"] >= 1
+
+
+def test_cached_user_can_be_modified(app, client):
+    client.get("/about")
+
+    response = client.post(
+        "/change-password",
+        data={
+            "current_password": "admin123",
+            "new_password": "newpass123",
+            "confirm_new_password": "newpass123",
+        },
+    )
+
+    assert response.status_code == 302
+    with app.app_context():
+        assert get_user_by_username("admin").check_password("newpass123")
+
+
+def test_shared_stamp_invalidates_user_in_other_processes(app, tmp_path):
+    # Two caches stand in for two worker processes sharing the directory
+    caches = [
+        UserIdentityCache(shared=FileSystemCache(str(tmp_path))) for _ in range(2)
+    ]
+    with app.app_context():
+        user_id = get_user_by_username("admin").id
+        other_id = create_user("bystander", "bystander@example.com", "secret123").id
+        for cache in caches:
+            for loaded_id in (user_id, other_id, user_id, other_id):
+                cache.load(loaded_id)
+            assert cache.stats()["hits"] == 2
+
+        caches[0].invalidate(user_id)
+
+        assert caches[1].load(user_id).id == user_id
+        assert caches[1].load(other_id).id == other_id
+        assert caches[1].stats()["misses"] == 3
+
+
+def test_committed_user_change_is_shared_once(app, tmp_path, monkeypatch):
+    shared = FileSystemCache(str(tmp_path))
+    writes = []
+    monkeypatch.setattr(shared, "set", lambda key, *args: writes.append(key))
+    with app.app_context():
+        app.extensions["user_identity_cache"] = UserIdentityCache(shared=shared)
+        user = get_user_by_username("admin")
+        user_id = user.id
+
+        update_user_password(user, "changed123")
+
+    assert writes == [f"user:{user_id}"]
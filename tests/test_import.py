@@ -0,0 +1,154 @@
+import io
+import json
+
+import pytest
+
+from app import create_app
+from app.exporter import export_thoughts
+from app.importer import import_thoughts
+from app.models import (
+    User,
+    create_thought,
+    create_user,
+    get_thoughts_by_tag,
+    get_user_thoughts,
+    search_thoughts,
+)
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def user(app):
+    return create_user("importer", "importer@example.com", "secret123")
+
+
+def ndjson(*rows):
+    return io.BytesIO("".join(json.dumps(row) + "\n" for row in rows).encode())
+
+
+def test_import_ndjson_in_batches_with_row_errors(user):
+    stream = ndjson(
+        {"title": "First", "content": "alpha", "tags": ["Flask", "web"]},
+        {"title": "", "content": "no title"},
+        {"title": "Second", "content": "beta", "tags": "flask", "is_public": True},
+        {"title": "Third", "content": "gamma", "created_at": "2020-01-02T03:04:05Z"},
+        {"title": "Long", "content": "x" * 500},
+    )
+    stream = io.BytesIO(stream.getvalue() + b"not json\n")
+
+    result = import_thoughts(user.id, stream, batch_size=2)
+
+    assert result.imported == 4
+    assert [e["line"] for e in result.errors] == [2, 6]
+    assert get_user_thoughts(user.id).total == 4
+    assert {t.title for t in get_thoughts_by_tag(user.id, "flask").items} == {
+        "First",
+        "Second",
+    }
+    assert [t.title for t in search_thoughts(user.id, "gamma").items] == ["Third"]
+    third = get_user_thoughts(user.id).items[-1]
+    assert third.created_at.isoformat() == "2020-01-02T03:04:05"
+    # Excerpts for list pages are stored along with the rows
+    excerpts = {
+        t.title: t.excerpt for t in get_user_thoughts(user.id, per_page=10).items
+    }
+    assert excerpts["First"] == "alpha"
+    assert excerpts["Long"] == "x" * 100 + "..."
+
+
+def test_import_csv(user):
+    stream = io.BytesIO(
+        b"title,content,category,tags,is_public\n"
+        b'Note,"multi\nline",idea,"a, b",yes\n'
+        b"Bad,text,,,maybe\n"
+    )
+
+    result = import_thoughts(user.id, stream, "csv")
+
+    assert result.imported == 1
+    assert result.errors == [{"line": 4, "error": "'is_public' must be a boolean"}]
+    thought = get_user_thoughts(user.id).items[0]
+    assert (thought.content, thought.tags, thought.is_public) == (
+        "multi\nline",
+        "a, b",
+        True,
+    )
+
+
+def test_import_csv_continues_after_malformed_record(user):
+    stream = io.BytesIO(
+        b"title,content\n" b"First,one\n" b"Broken,x\ry\n" b"Last,three\n"
+    )
+
+    result = import_thoughts(user.id, stream, "csv")
+
+    assert result.imported == 2
+    assert result.failed == 1
+    assert result.errors[0]["line"] == 3
+    assert result.errors[0]["error"].startswith("Invalid CSV")
+
+
+def test_csv_export_of_long_thought_imports_again(user):
+    content = "long " * 60000
+    create_thought("Long", content, user.id, tags="essay")
+    exported = b"".join(export_thoughts(user.id, "csv"))
+    other = create_user("reimporter", "reimporter@example.com", "secret123")
+
+    result = import_thoughts(other.id, io.BytesIO(exported), "csv")
+
+    assert (result.imported, result.failed) == (1, 0)
+    thought = get_user_thoughts(other.id).items[0]
+    assert (thought.title, thought.content, thought.tags) == (
+        "Long",
+        content.strip(),
+        "essay",
+    )
+
+
+def test_import_endpoint_requires_login_and_imports(app):
+    client = app.test_client()
+    body = '{"title": "Posted", "content": "via api"}\n'
+
+    response = client.post("/api/thoughts/import", data=body)
+    assert response.status_code == 401
+
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    response = client.post(
+        "/api/thoughts/import", data=body, content_type="application/x-ndjson"
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["data"]["imported"] == 1
+    admin = User.query.filter_by(username="admin").first()
+    assert [t.title for t in get_user_thoughts(admin.id).items] == ["Posted"]
+
+
+def test_import_endpoint_rejects_form_content_types_and_checks_csrf(app):
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    body = '{"title": "Posted", "content": "cross-site"}\n'
+
+    response = client.post("/api/thoughts/import", data=body, content_type="text/plain")
+    assert response.status_code == 415
+
+    app.config["WTF_CSRF_ENABLED"] = True
+    response = client.post(
+        "/api/thoughts/import", data=body, content_type="application/x-ndjson"
+    )
+    assert response.status_code == 400
+
+    token = client.get("/api/csrf-token").get_json()["data"]["csrf_token"]
+    response = client.post(
+        "/api/thoughts/import",
+        data=body,
+        content_type="application/x-ndjson",
+        headers={"X-CSRFToken": token},
+    )
+    assert response.status_code == 200
+    assert response.get_json()["data"]["imported"] == 1
@@ -0,0 +1,146 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.jobs import JOB_HANDLERS, JobWorker, enqueue, job_queue, jobs_mode, retry_delay
+from app.models import (
+    create_thought,
+    create_user,
+    db,
+    get_top_tags,
+    get_user_stats,
+    jobs,
+    search_thoughts,
+)
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    app.config["JOBS_MODE"] = "external"
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def user(app):
+    return create_user("worker", "worker@example.com", "secret123")
+
+
+def stored_jobs():
+    return db.session.execute(sa.select(jobs).order_by(jobs.c.id)).all()
+
+
+def run_due_jobs(app):
+    JobWorker(app).run(threading.Event(), burst=True)
+
+
+def metric_lines(app, prefix):
+    body = app.test_client().get("/api/metrics").get_data(as_text=True)
+    return [line for line in body.splitlines() if line.startswith(prefix)]
+
+
+def test_thought_writes_defer_indexing_and_counts_to_workers(app, user):
+    create_thought("Garden", "plans", user.id, tags="plants")
+
+    assert [job.name for job in stored_jobs()] == [
+        "refresh_search_index",
+        "apply_count_changes",
+    ]
+    assert search_thoughts(user.id, "garden").items == []
+    assert get_top_tags(user.id) == []
+    assert metric_lines(app, "ideas_job_queue_depth") == [
+        'ideas_job_queue_depth{job="apply_count_changes",status="pending"} 1',
+        'ideas_job_queue_depth{job="refresh_search_index",status="pending"} 1',
+    ]
+
+    run_due_jobs(app)
+
+    assert {job.status for job in stored_jobs()} == {"done"}
+    assert [t.title for t in search_thoughts(user.id, "garden").items] == ["Garden"]
+    assert get_top_tags(user.id) == [("plants", 1)]
+    assert get_user_stats(user.id, days=1)["total"] == 1
+    assert metric_lines(app, "ideas_job_queue_depth") == []
+    assert (
+        'ideas_jobs_total{job="apply_count_changes",result="done"} 1'
+        in metric_lines(app, "ideas_jobs_total")
+    )
+
+
+def test_failing_jobs_are_retried_with_backoff(app, user, monkeypatch):
+    def fail(payload):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setitem(JOB_HANDLERS, "refresh_search_index", fail)
+    enqueue("refresh_search_index", {"thought_id": "missing"}, max_attempts=2)
+    db.session.commit()
+    worker = JobWorker(app)
+
+    assert worker.run_once()
+    job = stored_jobs()[0]
+    assert (job.status, job.attempts) == ("pending", 1)
+    assert job.last_error == "RuntimeError: index unavailable"
+    assert job.run_at > datetime.utcnow() + timedelta(seconds=4)
+    # Not due again until the backoff has passed
+    assert not worker.run_once()
+
+    db.session.execute(sa.update(jobs).values(run_at=datetime.utcnow()))
+    db.session.commit()
+    assert worker.run_once()
+    job = stored_jobs()[0]
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert [retry_delay(n) for n in (1, 2, 3, 9)] == [5, 10, 20, 600]
+
+
+def test_idempotency_keys_and_abandoned_jobs(app, user):
+    assert enqueue("refresh_search_index", {"thought_id": "a"}, key="index:a:1")
+    assert not enqueue("refresh_search_index", {"thought_id": "a"}, key="index:a:1")
+    db.session.commit()
+    assert len(stored_jobs()) == 1
+
+    # A job claimed by a worker that died is claimed again after the timeout
+    locked_at = datetime.utcnow() - timedelta(seconds=60)
+    db.session.execute(
+        sa.update(jobs).values(status="running", locked_at=locked_at, locked_by="x")
+    )
+    db.session.commit()
+    assert not JobWorker(app).run_once()
+    app.config["JOBS_LOCK_TIMEOUT"] = 30
+    assert JobWorker(app).run_once()
+    job = stored_jobs()[0]
+    assert (job.status, job.attempts, job.locked_by) == ("done", 1, None)
+
+
+def test_thread_mode_runs_jobs_after_the_commit(app, user, monkeypatch):
+    app.config.update(JOBS_MODE="thread", JOBS_WORKERS=1)
+    ran = threading.Event()
+    threads = []
+    index = JOB_HANDLERS["refresh_search_index"]
+
+    def refresh(payload):
+        index(payload)
+        threads.append(threading.current_thread().name)
+        ran.set()
+
+    monkeypatch.setitem(JOB_HANDLERS, "refresh_search_index", refresh)
+    create_thought("Threaded", "...", user.id)
+    try:
+        assert ran.wait(5)
+    finally:
+        job_queue().stop(5)
+    assert threads == ["job-worker-0"]
+    assert [t.title for t in search_thoughts(user.id, "threaded").items] == ["Threaded"]
+
+
+def test_jobs_run_in_threads_unless_testing():
+    app = create_app("testing", bootstrap=False)
+    assert jobs_mode(app) == "inline"
+
+    app.config["TESTING"] = False
+    assert jobs_mode(app) == "thread"
+
+    app.config["JOBS_MODE"] = "external"
+    assert jobs_mode(app) == "external"
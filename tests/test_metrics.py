@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app
+from app.models import create_thought, create_user
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def metric_lines(client, prefix):
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    return [
+        line
+        for line in response.get_data(as_text=True).splitlines()
+        if line.startswith(prefix)
+    ]
+
+
+def test_requests_statements_and_templates_are_recorded(app, client):
+    user = create_user("metrics", "metrics@example.com", "secret123")
+    create_thought("Shared", "content", user.id, is_public=True)
+
+    client.get("/thoughts/public")
+    client.get("/thoughts/public")
+
+    assert (
+        'ideas_http_requests_total{endpoint="main.public_thoughts",method="GET",'
+        'status="200"} 2'
+    ) in metric_lines(client, "ideas_http_requests_total")
+    assert (
+        'ideas_http_request_duration_seconds_count{endpoint="main.public_thoughts"} 2'
+        in metric_lines(client, "ideas_http_request_duration_seconds_count")
+    )
+    statements = metric_lines(client, "ideas_db_statements_total")
+    assert any('endpoint="main.public_thoughts"' in line for line in statements)
+    # The second request is answered from the response cache
+    assert (
+        'ideas_template_render_seconds_count{template="main/thoughts/public.html"} 1'
+        in metric_lines(client, "ideas_template_render_seconds_count")
+    )
+    assert 'ideas_response_cache_requests_total{result="hit"} 1' in metric_lines(
+        client, "ideas_response_cache_requests_total"
+    )
+
+
+def test_slow_queries_are_sampled(app, client):
+    app.extensions["metrics"].slow_query_seconds = 0
+
+    client.get("/thoughts/public")
+
+    assert metric_lines(client, 'ideas_db_slow_queries_total{endpoint="main.public')
+    samples = metric_lines(client, "ideas_db_slow_query_seconds{")
+    assert any("SELECT" in line for line in samples)
+
+
+def test_snapshots_of_other_processes_are_summed(app, client, tmp_path):
+    metrics = app.extensions["metrics"]
+    metrics.directory = str(tmp_path)
+    client.get("/")
+
+    def write_snapshot(pid):
+        snapshot = {
+            "pid": pid,
+            "counters": [
+                [
+                    "ideas_http_requests_total",
+                    [["endpoint", "main.index"], ["method", "GET"], ["status", "200"]],
+                    4,
+                ]
+            ],
+            "histograms": [],
+            "gauges": [["ideas_password_hash_in_flight", [], 3]],
+            "slow_queries": [],
+        }
+        with open(tmp_path / f"metrics-{pid}.json", "w") as f:
+            json.dump(snapshot, f)
+
+    write_snapshot(os.getppid())
+    # A process that has exited: its counters count, its gauges do not
+    finished = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    write_snapshot(int(finished.stdout))
+
+    assert (
+        'ideas_http_requests_total{endpoint="main.index",method="GET",status="200"} 9'
+        in metric_lines(client, "ideas_http_requests_total")
+    )
+    assert metric_lines(client, "ideas_password_hash_in_flight ") == [
+        "ideas_password_hash_in_flight 3"
+    ]
+
+
+def test_worker_processes_flush_their_metrics(client, app, tmp_path):
+    app.extensions["metrics"].directory = str(tmp_path)
+    script = (
+        "from app import create_app\n"
+        "app = create_app('testing')\n"
+        f"app.extensions['metrics'].directory = {str(tmp_path)!r}\n"
+        "client = app.test_client()\n"
+        "for _ in range(3):\n"
+        "    client.get('/about')\n"
+        "app.extensions['metrics'].flush(force=True)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, capture_output=True)
+    client.get("/about")
+
+    assert (
+        'ideas_http_requests_total{endpoint="main.about",method="GET",status="200"} 4'
+        in metric_lines(client, "ideas_http_requests_total")
+    )
+
+
+def test_metrics_token_is_required_when_configured(app, client):
+    app.config["METRICS_TOKEN"] = "scrape-secret"
+
+    assert client.get("/api/metrics").status_code == 401
+    response = client.get(
+        "/api/metrics", headers={"Authorization": "Bearer scrape-secret"}
+    )
+    assert response.status_code == 200
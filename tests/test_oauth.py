@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from app import create_app
+from app.models import get_user_by_oauth
+from app.oauth_config import (
+    OAuthError,
+    document_cache,
+    get_google_identity,
+    verify_google_id_token,
+)
+
+jwt = pytest.importorskip("jwt")
+rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+
+CLIENT_ID = "client-id"
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+class StubOAuthServer(ThreadingHTTPServer):
+    """Local stand-in for Google's discovery, JWKS, token and userinfo APIs"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubOAuthHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.requests = []
+        self.connections = set()
+
+    def id_token(self, **overrides):
+        now = int(time.time())
+        claims = {
+            "iss": self.base_url,
+            "sub": "google-123",
+            "aud": CLIENT_ID,
+            "iat": now,
+            "exp": now + 3600,
+            "email": "stub@example.com",
+            "email_verified": True,
+            "name": "stubuser",
+            **overrides,
+        }
+        return jwt.encode(claims, PRIVATE_KEY, "RS256", headers={"kid": "k1"})
+
+
+class StubOAuthHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, document=None, headers=()):
+        body = json.dumps(document).encode() if document is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.connections.add(self.client_address)
+        base = self.server.base_url
+        if self.path == "/.well-known/openid-configuration":
+            self._send(
+                200,
+                {
+                    "issuer": base,
+                    "authorization_endpoint": f"{base}/auth",
+                    "token_endpoint": f"{base}/token",
+                    "userinfo_endpoint": f"{base}/userinfo",
+                    "jwks_uri": f"{base}/certs",
+                },
+                [("Cache-Control", "public, max-age=3600")],
+            )
+        elif self.path == "/certs":
+            key = json.loads(
+                jwt.algorithms.RSAAlgorithm.to_jwk(PRIVATE_KEY.public_key())
+            )
+            key.update(kid="k1", alg="RS256", use="sig")
+            self._send(200, {"keys": [key]}, [("Cache-Control", "max-age=600")])
+        else:
+            self._send(404, {"error": "not_found"})
+
+    def do_POST(self):
+        self.server.requests.append(self.path)
+        self.server.connections.add(self.client_address)
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if self.path == "/token" and form.get("code") == ["good-code"]:
+            self._send(200, {"access_token": "at", "id_token": self.server.id_token()})
+        else:
+            self._send(400, {"error": "invalid_grant"})
+
+
+@pytest.fixture
+def stub():
+    server = StubOAuthServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    document_cache.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+    document_cache.clear()
+
+
+@pytest.fixture
+def app(stub):
+    app = create_app("testing")
+    app.config.update(
+        GOOGLE_CLIENT_ID=CLIENT_ID,
+        GOOGLE_CLIENT_SECRET="secret",
+        GOOGLE_DISCOVERY_URL=f"{stub.base_url}/.well-known/openid-configuration",
+    )
+    with app.app_context():
+        yield app
+
+
+def test_login_verifies_id_token_without_userinfo(app, stub):
+    client = app.test_client()
+
+    response = client.get("/login/google")
+    assert response.location.startswith(f"{stub.base_url}/auth?")
+
+    for _ in range(2):
+        response = client.get("/login/google/callback?code=good-code")
+        assert response.status_code == 302
+        client.get("/logout")
+
+    user = get_user_by_oauth("google", "google-123")
+    assert user.email == "stub@example.com"
+    assert "/userinfo" not in stub.requests
+    # Discovery and keys are fetched once and then served from the cache
+    assert stub.requests.count("/.well-known/openid-configuration") == 1
+    assert stub.requests.count("/certs") == 1
+    # Requests reuse keep-alive connections
+    assert len(stub.connections) < len(stub.requests)
+
+
+def test_rejects_tokens_for_another_audience(app, stub):
+    with pytest.raises(OAuthError):
+        verify_google_id_token(stub.id_token(aud="someone-else"))
+    with pytest.raises(OAuthError):
+        verify_google_id_token(stub.id_token(iss="https://evil.example.com"))
+    assert verify_google_id_token(stub.id_token())["sub"] == "google-123"
+
+
+def test_unknown_key_ids_refetch_keys_at_most_once_per_interval(app, stub):
+    forged = jwt.encode({"sub": "x"}, PRIVATE_KEY, "RS256", headers={"kid": "made-up"})
+    verify_google_id_token(stub.id_token())
+    for _ in range(3):
+        with pytest.raises(OAuthError):
+            verify_google_id_token(forged)
+    assert stub.requests.count("/certs") == 1
+
+    app.config["OAUTH_JWKS_REFRESH_INTERVAL"] = 0
+    with pytest.raises(OAuthError):
+        verify_google_id_token(forged)
+    assert stub.requests.count("/certs") == 2
+
+
+def test_rejects_accounts_without_verified_email(app, stub):
+    for claims in ({"email_verified": False}, {"email_verified": None}):
+        with pytest.raises(OAuthError):
+            get_google_identity({"id_token": stub.id_token(**claims)})
+    with pytest.raises(OAuthError):
+        get_google_identity({"id_token": stub.id_token(email=None)})
+    identity = get_google_identity({"id_token": stub.id_token()})
+    assert identity["email"] == "stub@example.com"
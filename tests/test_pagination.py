@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from app.models import Thought, create_thought, create_user, db, get_public_thoughts
+from app.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def thoughts(app):
+    user = create_user("pager", "pager@example.com", "secret123")
+    created = []
+    start = datetime(2024, 1, 1)
+    for i in range(12):
+        thought = create_thought(f"Thought {i}", "...", user.id, is_public=True)
+        # Two thoughts share a timestamp to exercise the id tie-breaker
+        thought.created_at = start + timedelta(days=min(i, 10))
+        created.append(thought)
+    db.session.commit()
+    return created
+
+
+def test_cursor_round_trip(thoughts):
+    assert decode_cursor(encode_cursor(thoughts[0])) == (
+        thoughts[0].created_at,
+        thoughts[0].id,
+    )
+    assert decode_cursor("not-a-cursor") is None
+
+
+def test_walk_forward_and_back(thoughts):
+    expected = [
+        t.id for t in sorted(thoughts, key=lambda t: (t.created_at, t.id), reverse=True)
+    ]
+
+    first = get_public_thoughts(per_page=5)
+    second = get_public_thoughts(per_page=5, after=first.next_cursor)
+    third = get_public_thoughts(per_page=5, after=second.next_cursor)
+
+    assert [t.id for t in first.items + second.items + third.items] == expected
+    assert not first.has_prev and first.has_next
+    assert not third.has_next and third.has_prev
+    assert first.total == 12
+
+    back = get_public_thoughts(per_page=5, before=second.prev_cursor)
+    assert [t.id for t in back.items] == [t.id for t in first.items]
+    assert not back.has_prev
+
+
+def test_offset_mode_still_available(thoughts):
+    pagination = get_public_thoughts(page=2, per_page=5)
+
+    assert pagination.page == 2
+    assert len(pagination.items) == 5
+
+
+def test_public_listing_links(app, thoughts):
+    client = app.test_client()
+
+    response = client.get("/thoughts/public")
+    assert response.status_code == 200
+    assert b"after=" in response.data
+
+    cursor = get_public_thoughts(per_page=10).next_cursor
+    response = client.get(f"/thoughts/public?after={cursor}")
+    assert response.status_code == 200
+    assert b"before=" in response.data
@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.models import User, authenticate_user, create_user, db, get_user_by_username
+from app.passwords import PasswordHasher, PasswordHasherBusy, needs_rehash
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:2000"
+    with app.app_context():
+        yield app
+
+
+def test_login_upgrades_outdated_hash(app):
+    user = create_user("legacy", "legacy@example.com")
+    user.password_hash = generate_password_hash("secret123", "pbkdf2:sha256:1000")
+    db.session.commit()
+    assert needs_rehash(user.password_hash)
+
+    assert authenticate_user("legacy", "wrong") is None
+    assert user.password_hash.startswith("pbkdf2:sha256:1000$")
+
+    assert authenticate_user("legacy", "secret123") is not None
+    stored = db.session.get(User, user.id).password_hash
+    assert stored.startswith("pbkdf2:sha256:2000$")
+    assert not needs_rehash(stored)
+    assert authenticate_user("legacy", "secret123") is not None
+
+
+def test_process_pool_hashes_and_verifies():
+    hasher = PasswordHasher(workers=1)
+    try:
+        pwhash = hasher.hash("secret", "pbkdf2:sha256:1000")
+        assert hasher.verify(pwhash, "secret")
+        assert not hasher.verify(pwhash, "other")
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["in_flight"] == 0
+
+
+def test_full_queue_rejects_instead_of_waiting_forever():
+    hasher = PasswordHasher(workers=0, max_pending=1, queue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=hasher._run, args=(slow_hash,))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash("secret", "pbkdf2:sha256:1000")
+    finally:
+        release.set()
+        worker.join()
+
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["peak_in_flight"] == 1
+
+
+@pytest.fixture
+def saturated(app, monkeypatch):
+    """Make every hash and verification find the hashing queue full"""
+
+    def busy(*args):
+        raise PasswordHasherBusy("queue full")
+
+    def saturate():
+        hasher = app.extensions["password_hasher"]
+        monkeypatch.setattr(hasher, "hash", busy)
+        monkeypatch.setattr(hasher, "verify", busy)
+
+    return saturate
+
+
+def test_register_answers_503_when_hasher_is_saturated(app, saturated):
+    saturated()
+    response = app.test_client().post(
+        "/register",
+        data={
+            "username": "newcomer",
+            "email": "newcomer@example.com",
+            "password": "secret123",
+            "confirm_password": "secret123",
+        },
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert b"The server is busy" in response.data
+    assert get_user_by_username("newcomer") is None
+
+
+def test_change_password_answers_503_when_hasher_is_saturated(app, saturated):
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    saturated()
+
+    response = client.post(
+        "/change-password",
+        data={
+            "current_password": "admin123",
+            "new_password": "newpass123",
+            "confirm_new_password": "newpass123",
+        },
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert b"The server is busy" in response.data
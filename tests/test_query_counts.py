@@ -0,0 +1,103 @@
+"""
+Query count guard: a page must issue the same number of SQL statements
+whether it lists a few thoughts or a full page of them, so per-row queries
+(N+1) fail here instead of in production. List pages must not load the full
+content of the thoughts they show.
+"""
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.models import User, create_thought, create_user, db, make_excerpt
+
+PASSWORD = "secret123"  # nosec B105
+CONTENT = "garden notes " + "long " * 100
+
+
+def count_queries(url, thoughts, login=False):
+    """Number of statements issued by one request for a page listing
+    ``thoughts`` rows"""
+    return len(page_statements(url, thoughts, login)[0])
+
+
+def page_statements(url, thoughts, login=False):
+    """Statements issued by one request for a page listing ``thoughts`` rows,
+    and the response body"""
+    app = create_app("testing")
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:2000"
+    with app.app_context():
+        owner = create_user("owner", "owner@example.com", PASSWORD)
+        first_id = None
+        for i in range(thoughts):
+            # Public thoughts by a different author each, owned ones by owner
+            author = User(f"author{i}", f"author{i}@example.com")
+            db.session.add(author)
+            db.session.commit()
+            for user_id, is_public in ((author.id, True), (owner.id, False)):
+                thought = create_thought(
+                    f"Garden {i}",
+                    CONTENT,
+                    user_id,
+                    tags="plants",
+                    is_public=is_public,
+                )
+                first_id = first_id or thought.id
+        db.session.remove()
+
+        client = app.test_client()
+        if login:
+            client.post("/login", data={"username": "owner", "password": PASSWORD})
+            client.get("/")
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            response = client.get(url.format(thought_id=first_id))
+        finally:
+            sa.event.remove(db.engine, "before_cursor_execute", count)
+        assert response.status_code == 200
+        return statements, response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize(
+    "url,login",
+    [
+        ("/thoughts/public", False),
+        ("/thoughts/public/tag/plants", False),
+        ("/thoughts/public", True),
+        ("/thoughts", True),
+        ("/thoughts/tag/plants", True),
+        ("/thoughts/search?q=garden", True),
+        ("/api/thoughts", True),
+        ("/api/thoughts/public", False),
+    ],
+)
+def test_listing_query_count_does_not_grow_with_page_size(url, login):
+    assert count_queries(url, 2, login) == count_queries(url, 8, login)
+
+
+def test_public_thought_detail_loads_its_author_with_the_thought():
+    assert count_queries("/thoughts/{thought_id}", 1) == 1
+
+
+@pytest.mark.parametrize(
+    "url,login,shown",
+    [
+        ("/thoughts/public", False, make_excerpt(CONTENT)),
+        ("/thoughts/public/tag/plants", False, make_excerpt(CONTENT)),
+        ("/thoughts", True, make_excerpt(CONTENT)),
+        ("/thoughts/tag/plants", True, make_excerpt(CONTENT)),
+        ("/thoughts/search?q=garden", True, "<mark>garden</mark> notes"),
+    ],
+)
+def test_list_pages_do_not_load_thought_content(url, login, shown):
+    statements, body = page_statements(url, 2, login)
+
+    assert not any("thoughts.content" in statement for statement in statements)
+    assert shown in body
+    assert "long " * 30 not in body
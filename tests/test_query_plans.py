@@ -0,0 +1,152 @@
+"""
+Query-plan regression tests.
+
+Every read helper in app/models.py is run against a seeded database while the
+SQL it emits is captured. Each captured SELECT is then passed through
+``EXPLAIN QUERY PLAN``; a full table scan or a temporary B-tree sort fails the
+test unless it is explicitly allowed for that helper below.
+"""
+
+import re
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.models import (
+    authenticate_user,
+    create_thought,
+    create_user,
+    db,
+    get_public_thoughts,
+    get_public_thoughts_by_tag,
+    get_thought_by_id,
+    get_thoughts_by_ids,
+    get_thoughts_by_tag,
+    get_top_tags,
+    get_user_by_email,
+    get_user_by_id,
+    get_user_by_oauth,
+    get_user_by_username,
+    get_user_stats,
+    get_user_thoughts,
+    init_default_user,
+    search_thoughts,
+)
+
+# Plan lines that are never a problem
+HARMLESS = [
+    re.compile(r"^SCAN CONSTANT ROW$"),
+    # FTS5 lookups are reported as a scan of the virtual table's own index
+    re.compile(r"^SCAN \w+ VIRTUAL TABLE INDEX"),
+]
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def seeded(app):
+    users = [
+        create_user(f"planner{i}", f"planner{i}@example.com", "secret123")
+        for i in range(3)
+    ]
+    for i in range(60):
+        create_thought(
+            f"Thought {i}",
+            "hello world " * 5,
+            users[i % 3].id,
+            tags="alpha, beta" if i % 2 else "gamma",
+            is_public=i % 3 == 0,
+        )
+    user = SimpleNamespace(
+        id=users[1].id, username=users[1].username, email=users[1].email
+    )
+    db.session.expunge_all()
+    return user
+
+
+def _capture_selects(func):
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    sa.event.listen(db.engine, "before_cursor_execute", before_execute)
+    try:
+        func()
+    finally:
+        sa.event.remove(db.engine, "before_cursor_execute", before_execute)
+    return statements
+
+
+def _plan(statement, parameters):
+    rows = db.session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    return [row[3] for row in rows]
+
+
+def _walk_pages(helper, *args):
+    first = helper(*args, per_page=4)
+    second = helper(*args, per_page=4, after=first.next_cursor)
+    helper(*args, per_page=4, before=second.prev_cursor)
+
+
+CASES = {
+    "get_user_by_id": (lambda u: get_user_by_id(u.id), []),
+    "get_user_by_username": (lambda u: get_user_by_username(u.username), []),
+    "get_user_by_email": (lambda u: get_user_by_email(u.email), []),
+    "get_user_by_oauth": (lambda u: get_user_by_oauth("google", "1234"), []),
+    "authenticate_user": (lambda u: authenticate_user(u.username, "nope"), []),
+    # EXISTS stops at the first row, so the index scan reads a single entry
+    "init_default_user": (lambda u: init_default_user(), [FULL_SCAN]),
+    "get_thought_by_id": (
+        lambda u: get_thought_by_id(get_user_thoughts(u.id).items[0].id),
+        [],
+    ),
+    "get_user_thoughts": (lambda u: _walk_pages(get_user_thoughts, u.id), []),
+    "get_public_thoughts": (lambda u: _walk_pages(get_public_thoughts), []),
+    "get_thoughts_by_tag": (
+        lambda u: _walk_pages(get_thoughts_by_tag, u.id, "alpha"),
+        [],
+    ),
+    "get_public_thoughts_by_tag": (
+        lambda u: _walk_pages(get_public_thoughts_by_tag, "gamma"),
+        [],
+    ),
+    "get_thoughts_by_ids": (
+        lambda u: get_thoughts_by_ids(
+            [t.id for t in get_user_thoughts(u.id).items], viewer_id=u.id
+        ),
+        [],
+    ),
+    "get_top_tags": (lambda u: get_top_tags(u.id), []),
+    "get_top_tags (public)": (lambda u: get_top_tags(), []),
+    # Per-category totals are grouped and ranked from the user's rollup rows
+    "get_user_stats": (lambda u: get_user_stats(u.id), [TEMP_SORT]),
+    # Relevance ordering has to sort the matching rows
+    "search_thoughts": (lambda u: search_thoughts(u.id, "hello"), [TEMP_SORT]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_helper_query_plans_use_indexes(seeded, name):
+    func, allowed = CASES[name]
+    statements = _capture_selects(lambda: func(seeded))
+
+    assert statements, f"{name} issued no SELECT statements"
+    for statement, parameters in statements:
+        for line in _plan(statement, parameters):
+            if any(pattern.search(line) for pattern in HARMLESS + allowed):
+                continue
+            assert not FULL_SCAN.search(line), f"{name}: {line}\n{statement}"
+            assert not TEMP_SORT.search(line), f"{name}: {line}\n{statement}"
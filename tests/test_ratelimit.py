@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from app import create_app
+from app.config import config
+from app.models import create_user
+from app.ratelimit import SQLiteBuckets
+
+
+@pytest.fixture
+def make_app(monkeypatch):
+    def make(**settings):
+        monkeypatch.setitem(
+            config,
+            "ratelimit-test",
+            type("RateLimitTestConfig", (config["testing"],), settings),
+        )
+        app = create_app("ratelimit-test")
+        app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:2000"
+        return app
+
+    return make
+
+
+def login(client, username, ip="10.0.0.1"):
+    return client.post(
+        "/login",
+        data={"username": username, "password": "wrong-password"},
+        environ_base={"REMOTE_ADDR": ip},
+    )
+
+
+def test_login_attempts_are_limited_per_user_and_ip(make_app):
+    app = make_app(
+        RATE_LIMITS={
+            "auth.login": {"methods": ("POST",), "ip": (4, 60), "user": (2, 60)}
+        }
+    )
+    client = app.test_client()
+
+    assert login(client, "alice").status_code == 200
+    assert login(client, "Alice").status_code == 200
+    limited = login(client, "alice")
+    assert limited.status_code == 429
+    assert 1 <= int(limited.headers["Retry-After"]) <= 30
+
+    # Other accounts have their own budget, but share the IP's
+    assert login(client, "bob").status_code == 200
+    assert login(client, "carol").status_code == 429
+    assert login(client, "carol", ip="10.0.0.2").status_code == 200
+    # Only the form submission is limited
+    assert (
+        client.get("/login", environ_base={"REMOTE_ADDR": "10.0.0.1"}).status_code
+        == 200
+    )
+
+    metrics = client.get("/api/metrics").get_data(as_text=True)
+    assert (
+        'ideas_rate_limit_checks_total{endpoint="auth.login",scope="user",'
+        'result="limited"} 1'
+    ) in metrics
+    assert (
+        'ideas_rate_limit_checks_total{endpoint="auth.login",scope="ip",'
+        'result="limited"} 1'
+    ) in metrics
+
+
+def test_api_search_answers_429_as_json(make_app):
+    app = make_app(
+        RATE_LIMITS={"api.search_thoughts_endpoint": {"user": (1, 60)}},
+    )
+    with app.app_context():
+        create_user("searcher", "searcher@example.com", "secret123")
+    client = app.test_client()
+    client.post("/login", data={"username": "searcher", "password": "secret123"})
+
+    assert client.get("/api/thoughts/search?q=x").status_code == 200
+    response = client.get("/api/thoughts/search?q=x")
+    assert response.status_code == 429
+    assert response.get_json() == {"message": "Too many requests", "status": "error"}
+    assert int(response.headers["Retry-After"]) == 60
+
+
+def test_sqlite_buckets_are_shared_and_refill(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    # Separate stores on one file behave like separate worker processes
+    first, second = SQLiteBuckets(path), SQLiteBuckets(path)
+
+    assert first.take("k", 2, 20) == 0
+    assert second.take("k", 2, 20) == 0
+    assert first.take("k", 2, 20) > 0
+    assert second.take("other", 2, 20) == 0
+
+    time.sleep(0.06)
+    assert second.take("k", 2, 20) == 0
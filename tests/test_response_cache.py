@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app.cache import FileSystemCache, MemoryCache, ResponseCache
+from app.models import create_thought, create_user, update_thought
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", b"1", ttl=60)
+    cache.set("b", b"2", ttl=60)
+    cache.get("a")
+    cache.set("c", b"3", ttl=60)
+
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"3"
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCache()
+    cache.set("a", b"1", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+
+
+def test_filesystem_cache_is_shared_between_instances(tmp_path):
+    writer = FileSystemCache(str(tmp_path))
+    reader = FileSystemCache(str(tmp_path))
+    writer.set("page:/", b"body", ttl=60)
+
+    assert reader.get("page:/") == b"body"
+
+    writer.bump_generation()
+    assert reader.get_generation() == 1
+
+
+def test_concurrent_misses_render_once():
+    cache = ResponseCache(MemoryCache(), ttl=60)
+    renders = []
+    start = threading.Barrier(8)
+
+    def render():
+        renders.append(1)
+        time.sleep(0.05)
+        return b"page"
+
+    def fetch(results):
+        start.wait()
+        results.append(cache.get_or_set("page:/", render))
+
+    results = []
+    threads = [threading.Thread(target=fetch, args=(results,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(renders) == 1
+    assert results == [b"page"] * 8
+
+
+def test_uncacheable_renders_are_not_serialized():
+    cache = ResponseCache(MemoryCache(), ttl=60)
+    cache.get_or_set("page:/missing", lambda: None)
+    running = []
+    overlapped = threading.Event()
+
+    def render():
+        running.append(1)
+        if len(running) > 1:
+            overlapped.set()
+        overlapped.wait(1)
+        return None
+
+    threads = [
+        threading.Thread(target=cache.get_or_set, args=("page:/missing", render))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlapped.is_set()
+    assert cache.stats() == {"hits": 0, "misses": 3, "uncacheable": 3}
+
+
+def test_public_page_cached_until_public_write(client):
+    user = create_user("cacher", "cacher@example.com", "secret123")
+    thought = create_thought("First", "...", user.id, is_public=True)
+
+    assert client.get("/thoughts/public").headers["X-Cache"] == "MISS"
+    assert client.get("/thoughts/public").headers["X-Cache"] == "HIT"
+
+    # Private writes leave the cache alone
+    create_thought("Hidden", "...", user.id)
+    assert client.get("/thoughts/public").headers["X-Cache"] == "HIT"
+
+    update_thought(thought.id, title="Renamed")
+    response = client.get("/thoughts/public")
+    assert response.headers["X-Cache"] == "MISS"
+    assert b"Renamed" in response.data
+
+
+def test_logged_in_users_bypass_cache(client):
+    client.get("/about")
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+
+    response = client.get("/about")
+    assert "X-Cache" not in response.headers
+
+
+def test_index_draws_a_quote_per_request(client, monkeypatch):
+    quotes = iter(["First quote", "Second quote"])
+    monkeypatch.setattr(
+        "app.main.routes.get_random_inspirational_quote",
+        lambda: {"text": next(quotes), "author": "Tester"},
+    )
+
+    assert b"First quote" in client.get("/").data
+    response = client.get("/")
+    assert "X-Cache" not in response.headers
+    assert b"Second quote" in response.data
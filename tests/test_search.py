@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.models import (
+    build_search_match,
+    create_thought,
+    create_user,
+    db,
+    delete_thought,
+    rebuild_search_index,
+    search_rowid,
+    search_thoughts,
+    update_thought,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def user(app):
+    return create_user("searcher", "searcher@example.com", "secret123")
+
+
+def test_build_search_match_quotes_terms():
+    assert build_search_match('flask AND "web" OR -x*') == (
+        '"flask"* "AND"* "web"* "OR"* "x"*'
+    )
+    assert build_search_match("  ()  ") == ""
+
+
+def test_search_ranks_title_matches_first(user):
+    create_thought("Groceries", "remember to buy python books", user.id)
+    create_thought("Python tricks", "list comprehensions", user.id)
+
+    pagination = search_thoughts(user.id, "python")
+
+    assert [t.title for t in pagination.items] == ["Python tricks", "Groceries"]
+    assert pagination.total == 2
+    assert "<mark>python</mark>" in pagination.items[1].search_snippet
+
+
+def test_search_is_scoped_to_user(user):
+    other = create_user("other", "other@example.com", "secret123")
+    create_thought("Shared word", "kumquat", other.id)
+
+    assert search_thoughts(user.id, "kumquat").total == 0
+    assert search_thoughts(other.id, "kumquat").total == 1
+
+
+def test_search_index_follows_updates_and_deletes(user):
+    thought = create_thought("Draft", "original wording", user.id, tags="misc")
+
+    update_thought(thought.id, content="rewritten text")
+    assert search_thoughts(user.id, "original").total == 0
+    assert search_thoughts(user.id, "rewritten").total == 1
+
+    delete_thought(thought.id)
+    assert search_thoughts(user.id, "rewritten").total == 0
+
+
+def test_snippet_escapes_html(user):
+    create_thought("Markup", "<script>alert(1)</script> needle", user.id)
+
+    snippet = search_thoughts(user.id, "needle").items[0].search_snippet
+
+    assert "<script>" not in snippet
+    assert "<mark>needle</mark>" in snippet
+
+
+def test_rebuild_search_index(user):
+    create_thought("One", "alpha", user.id)
+    create_thought("Two", "beta", user.id, tags="alpha")
+
+    assert rebuild_search_index() == 2
+    assert search_thoughts(user.id, "alpha").total == 2
+
+
+def test_search_index_entries_are_looked_up_by_rowid(user):
+    thought = create_thought("Indexed", "by rowid", user.id)
+    deletes = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE FROM thoughts_fts"):
+            deletes.append((statement, parameters))
+
+    sa.event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        update_thought(thought.id, content="still by rowid")
+    finally:
+        sa.event.remove(db.engine, "before_cursor_execute", record)
+
+    assert db.session.execute(
+        sa.text("SELECT rowid FROM thoughts_fts WHERE thoughts_fts MATCH 'still'")
+    ).scalar() == search_rowid(thought.id)
+    statement, parameters = deletes[0]
+    plan = db.session.execute(
+        sa.text(f"EXPLAIN QUERY PLAN {statement.replace('?', ':p')}"),
+        {"p": parameters[0]},
+    ).all()
+    # A rowid lookup, not a scan of the whole index
+    assert "INDEX 0:=" in plan[0][-1]
+
+
+def test_migrations_match_models_without_dropping_search_index(tmp_path):
+    # In a fresh interpreter: Alembic binds its output stream on first import
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'check.db'}")
+
+    def flask_db(command):
+        return subprocess.run(
+            [sys.executable, "manage.py", "db", command],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+    assert flask_db("upgrade").returncode == 0
+    result = flask_db("check")
+
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+import sqlalchemy as sa
+
+from app import create_app
+from app.models import User, bootstrap_database, db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_startup_without_bootstrap_leaves_database_alone():
+    app = create_app("testing", bootstrap=False)
+
+    with app.app_context():
+        assert not sa.inspect(db.engine).has_table("users")
+
+        assert bootstrap_database().username == "admin"
+        assert bootstrap_database() is None
+        assert User.query.count() == 1
+
+
+def test_heavy_modules_are_imported_lazily():
+    script = (
+        "import json, sys\n"
+        "from app import create_app\n"
+        "create_app('testing', bootstrap=False)\n"
+        "print(json.dumps(sorted(m for m in ('alembic', 'flask_migrate', "
+        "'requests', 'jwt') if m in sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert json.loads(result.stdout) == []
+
+
+def test_db_command_group_loads_flask_migrate_on_use():
+    app = create_app("testing", bootstrap=False)
+
+    result = app.test_cli_runner().invoke(args=["db", "heads"])
+
+    assert result.exit_code == 0, result.output
+    assert "(head)" in result.output
+
+
+def test_manage_commands_do_not_bootstrap(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'manage.db'}")
+
+    def manage(*args):
+        return subprocess.run(
+            [sys.executable, "manage.py", *args],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    manage("init-db")
+    assert "No users found" in manage("list-users")
+    assert "Created default admin user: admin" in manage("bootstrap")
@@ -0,0 +1,104 @@
+import io
+from datetime import date, datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.importer import import_thoughts
+from app.models import (
+    create_thought,
+    create_user,
+    db,
+    delete_thought,
+    get_user_stats,
+    rebuild_daily_counts,
+    thought_daily_counts,
+    update_thought,
+)
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def user(app):
+    return create_user("counter", "counter@example.com", "secret123")
+
+
+def all_daily_counts():
+    return db.session.execute(
+        sa.select(thought_daily_counts).order_by(*thought_daily_counts.primary_key)
+    ).all()
+
+
+def test_daily_counts_follow_thought_writes(user):
+    today = datetime.utcnow().date()
+    first = create_thought("One", "...", user.id, category="idea")
+    create_thought("Two", "...", user.id, category="idea")
+    create_thought("Three", "...", user.id)
+
+    stats = get_user_stats(user.id, days=7)
+    assert stats["total"] == 3
+    assert stats["categories"] == [("idea", 2), (None, 1)]
+    assert stats["daily"][-1] == (today, 3)
+    assert stats["daily"][0] == (today - timedelta(days=6), 0)
+    assert len(stats["daily"]) == 7
+
+    update_thought(first.id, category="todo")
+    update_thought(first.id, title="Renamed")
+    assert get_user_stats(user.id, days=1)["categories"] == [
+        (None, 1),
+        ("idea", 1),
+        ("todo", 1),
+    ]
+
+    delete_thought(first.id)
+    stats = get_user_stats(user.id, days=1)
+    assert stats["total"] == 2
+    assert stats["categories"] == [(None, 1), ("idea", 1)]
+    # Rows are removed when their count reaches zero
+    assert len(all_daily_counts()) == 2
+
+
+def test_imports_update_daily_counts_and_rebuild_matches(user):
+    rows = (
+        b'{"title": "A", "content": "x", "category": "note",'
+        b' "created_at": "2024-03-01T23:30:00Z"}\n'
+        b'{"title": "B", "content": "x", "created_at": "2024-03-02T08:00:00"}\n'
+    ) * 2
+    import_thoughts(user.id, io.BytesIO(rows))
+    create_thought("C", "...", user.id, category="note")
+
+    stats = get_user_stats(user.id, days=2, today=date(2024, 3, 2))
+    assert stats["total"] == 5
+    assert stats["daily"] == [(date(2024, 3, 1), 2), (date(2024, 3, 2), 2)]
+
+    incremental = all_daily_counts()
+    db.session.execute(thought_daily_counts.delete())
+    db.session.commit()
+    assert rebuild_daily_counts() == len(incremental)
+    assert all_daily_counts() == incremental
+
+
+def test_stats_endpoint_and_profile_page(app, user):
+    create_thought("One", "...", user.id, category="idea")
+    client = app.test_client()
+
+    assert client.get("/api/stats").status_code == 401
+
+    client.post("/login", data={"username": "counter", "password": "secret123"})
+    data = client.get("/api/stats?days=3").get_json()["data"]
+    assert data["total"] == 1
+    assert data["categories"] == [{"category": "idea", "count": 1}]
+    assert [day["count"] for day in data["daily"]] == [0, 0, 1]
+    assert data["daily"][-1]["date"] == datetime.utcnow().date().isoformat()
+    assert len(client.get("/api/stats?days=100000").get_json()["data"]["daily"]) == 366
+
+    page = client.get("/profile").get_data(as_text=True)
+    assert "activity-level-4" in page
+    assert "Idea" in page
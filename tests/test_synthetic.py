@@ -0,0 +1,74 @@
+from collections import Counter
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app
+from app.models import Thought, User, db, get_thoughts_by_tag, search_thoughts
+from app.synthetic import CHUNK_SIZE, allocate, generate, zipf_weights
+
+
+def generated_rows(**kwargs):
+    app = create_app("testing")
+    with app.app_context():
+        created = generate(**kwargs)
+        rows = db.session.execute(
+            sa.select(
+                Thought.id,
+                Thought.title,
+                Thought.tags,
+                Thought.is_public,
+                Thought.created_at,
+                User.username,
+            )
+            .join(User)
+            .order_by(Thought.id)
+        ).all()
+    return created, rows
+
+
+def test_allocate_is_exact_and_skewed():
+    counts = allocate(1000, zipf_weights(10, 1.0))
+
+    assert sum(counts) == 1000
+    assert counts == sorted(counts, reverse=True)
+    assert counts[0] > 3 * counts[-1]
+    assert allocate(1000, zipf_weights(10, 0)) == [100] * 10
+
+
+def test_generate_is_deterministic_across_processes():
+    shape = {"users": 3, "thoughts_per_user": CHUNK_SIZE // 2 + 10, "seed": 7}
+
+    created, inline = generated_rows(processes=1, **shape)
+    _, pooled = generated_rows(processes=2, **shape)
+    _, other_seed = generated_rows(processes=1, **{**shape, "seed": 8})
+
+    assert created == {"users": 3, "thoughts": 3 * (CHUNK_SIZE // 2 + 10)}
+    assert inline == pooled
+    assert inline != other_seed
+
+
+def test_generated_data_has_production_shape():
+    app = create_app("testing")
+    with app.app_context():
+        generate(users=5, thoughts_per_user=200, tag_vocabulary_size=20)
+
+        per_user = Counter(t.user.username for t in Thought.query.all())
+        assert per_user["user0"] > per_user["user4"]
+        tags = Counter(
+            tag.strip()
+            for (value,) in db.session.query(Thought.tags)
+            for tag in (value or "").split(",")
+            if tag
+        )
+        assert tags.most_common(1)[0][0] == "tag0"
+        public = Thought.query.filter_by(is_public=True).count()
+        assert 0.2 < public / 1000 < 0.4
+
+        # Tag links and the search index are written along with the rows
+        user = User.query.filter_by(username="user0").first()
+        assert get_thoughts_by_tag(user.id, "tag0").total > 0
+        assert search_thoughts(user.id, "garden").total > 0
+
+        with pytest.raises(ValueError):
+            generate(users=1)
@@ -0,0 +1,124 @@
+import io
+
+import pytest
+
+from app import create_app
+from app.importer import import_thoughts
+from app.models import (
+    Tag,
+    create_thought,
+    create_user,
+    db,
+    delete_thought,
+    get_public_thoughts_by_tag,
+    get_thoughts_by_tag,
+    get_top_tags,
+    parse_tags,
+    rebuild_tag_counts,
+    tag_counts,
+    update_thought,
+)
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def user(app):
+    return create_user("tagger", "tagger@example.com", "secret123")
+
+
+def test_parse_tags_strips_and_dedupes():
+    assert parse_tags(" Python, flask,,python , ML ") == ["Python", "flask", "ML"]
+    assert parse_tags(None) == []
+
+
+def test_tag_lookup_matches_whole_tags_only(user):
+    create_thought("Markup", "...", user.id, tags="html, web")
+    create_thought("Models", "...", user.id, tags="ML")
+
+    pagination = get_thoughts_by_tag(user.id, "ml")
+
+    assert [t.title for t in pagination.items] == ["Models"]
+
+
+def test_public_tag_lookup_skips_private_thoughts(user):
+    create_thought("Shared", "...", user.id, tags="flask", is_public=True)
+    create_thought("Private", "...", user.id, tags="flask")
+
+    pagination = get_public_thoughts_by_tag("Flask")
+
+    assert [t.title for t in pagination.items] == ["Shared"]
+
+
+def test_update_thought_relinks_tags(user):
+    thought = create_thought("Retag", "...", user.id, tags="old")
+
+    update_thought(thought.id, tags="new, Newer")
+
+    assert thought.tags == "new, Newer"
+    assert sorted(tag.name for tag in thought.tag_objects) == ["new", "newer"]
+    assert get_thoughts_by_tag(user.id, "old").total == 0
+    assert Tag.query.filter_by(name="new").count() == 1
+
+
+def all_tag_counts():
+    return sorted(tuple(row) for row in db.session.execute(tag_counts.select()))
+
+
+def test_tag_counts_follow_thought_writes(user):
+    other = create_user("other", "other@example.com", "secret123")
+    first = create_thought("One", "...", user.id, tags="flask, web", is_public=True)
+    create_thought("Two", "...", user.id, tags="Flask")
+    create_thought("Three", "...", other.id, tags="flask", is_public=True)
+
+    assert get_top_tags(user.id) == [("flask", 2), ("web", 1)]
+    assert get_top_tags() == [("flask", 2), ("web", 1)]
+
+    update_thought(first.id, tags="web, sqlite", is_public=False)
+    # Ties keep the order in which the tags were first created
+    assert get_top_tags(user.id) == [("flask", 1), ("web", 1), ("sqlite", 1)]
+    assert get_top_tags() == [("flask", 1)]
+
+    delete_thought(first.id)
+    assert get_top_tags(user.id) == [("flask", 1)]
+    assert get_top_tags(limit=0) == []
+
+
+def test_imports_update_tag_counts_and_rebuild_matches(user):
+    rows = b'{"title": "A", "content": "x", "tags": "bulk", "is_public": true}\n' * 3
+    import_thoughts(user.id, io.BytesIO(rows))
+    create_thought("B", "...", user.id, tags="bulk, single")
+
+    assert get_top_tags(user.id) == [("bulk", 4), ("single", 1)]
+    assert get_top_tags() == [("bulk", 3)]
+
+    incremental = all_tag_counts()
+    db.session.execute(tag_counts.delete())
+    db.session.commit()
+    assert rebuild_tag_counts() == len(incremental)
+    assert all_tag_counts() == incremental
+
+
+def test_tags_endpoint_returns_top_tags(app, user):
+    create_thought("One", "...", user.id, tags="flask, web", is_public=True)
+    create_thought("Two", "...", user.id, tags="flask, private")
+    client = app.test_client()
+
+    response = client.get("/api/tags?limit=1")
+    assert response.get_json() == {
+        "data": [{"name": "flask", "count": 1}],
+        "status": "success",
+    }
+    assert client.get("/api/tags?scope=mine").status_code == 401
+    assert client.get("/api/tags?scope=everyone").status_code == 400
+
+    client.post("/login", data={"username": "tagger", "password": "secret123"})
+    names = [
+        tag["name"] for tag in client.get("/api/tags?scope=mine").get_json()["data"]
+    ]
+    assert names == ["flask", "web", "private"]
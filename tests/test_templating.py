@@ -0,0 +1,48 @@
+import pytest
+
+from app import create_app
+from app.config import config
+from app.templating import warm_templates
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    def make(**settings):
+        monkeypatch.setitem(
+            config,
+            "templating-test",
+            type(
+                "TemplatingTestConfig",
+                (config["testing"],),
+                {"TEMPLATE_CACHE_DIR": str(tmp_path / "jinja"), **settings},
+            ),
+        )
+        return create_app("templating-test")
+
+    return make
+
+
+def test_warmed_templates_are_shared_through_the_bytecode_cache(make_app, tmp_path):
+    app = make_app(TEMPLATE_WARMUP=True)
+    names = app.jinja_env.list_templates()
+    assert "main/thoughts/list.html" in names
+    # Compiled in create_app, and written to the shared cache
+    assert len(app.jinja_env.cache) == len(names)
+    assert len(list((tmp_path / "jinja").iterdir())) == len(names)
+
+    other = make_app()
+
+    def compile_source(*args, **kwargs):
+        raise AssertionError("template compiled despite cached bytecode")
+
+    other.jinja_env.compile = compile_source
+    assert warm_templates(other) == len(names)
+
+
+def test_template_load_time_is_recorded(make_app):
+    app = make_app()
+    app.test_client().get("/about")
+
+    body = app.test_client().get("/api/metrics").get_data(as_text=True)
+    assert 'ideas_template_load_seconds_count{template="main/about.html"} 1' in body
+    assert 'ideas_template_load_seconds_count{template="base.html"} 1' in body